@@ -5,12 +5,64 @@ The Akai AKP file format is a non-standard twist on the RIFF format.
 This implementation goes from scratch so we consider these quirks as just plain.
 """
 
+import mmap
 import struct
+from collections.abc import Sequence
 from .data_maps import *
+from . import patch
 import logging
 
 logger = logging.getLogger(__name__)
 
+KEYGROUP_SECTION_LENGTHS = {
+    "kloc": KLocClass.LENGTH,
+    "env ": EnvelopeClass.LENGTH,
+    "filt": FilterClass.LENGTH,
+    "zone": ZoneClass.LENGTH,
+}
+
+
+class KeygroupList(Sequence):
+    """keygroups of an AKP file, decoded on first access and cached
+
+    list_sections only records where each kgrp chunk and its sub-chunks live;
+    items added with append() are kept as they are.
+    """
+
+    def __init__(self, decode):
+        self._decode = decode
+        self._items = []
+        self.index = []
+
+    def add_indexed(self, offset: int, length: int, entries: list):
+        self._items.append(None)
+        self.index.append((offset, length, entries))
+
+    def append(self, kg: KeygroupClass):
+        self._items.append(kg)
+        self.index.append(None)
+
+    def is_decoded(self, idx: int) -> bool:
+        return self._items[idx] is not None
+
+    def invalidate(self):
+        """forget decoded keygroups that are backed by the file buffer"""
+        for idx, entry in enumerate(self.index):
+            if entry is not None:
+                self._items[idx] = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        kg = self._items[idx]
+        if kg is None:
+            kg = self._items[idx] = self._decode(idx)
+        return kg
+
+
 class AkaiAKPFile:
     @property
     def file_name(self) -> str:
@@ -19,9 +71,14 @@ class AkaiAKPFile:
     def riff(self) -> RIFFClass:
         return self._riff
     @property
-    def keygroups(self) -> list:
+    def keygroups(self) -> "KeygroupList":
         return self._keygroups
 
+    @property
+    def sections(self) -> list[tuple[str, int, int]]:
+        """(name, offset, length) of every top-level section, as found by list_sections"""
+        return self._sections
+
     @property
     def tune(self) -> TuneClass:
         return self._tune
@@ -50,12 +107,27 @@ class AkaiAKPFile:
     def envelopes(self):
         return self._envelopes
 
-    def __init__(self, path):
+    @property
+    def buffer(self) -> memoryview:
+        """zero-copy view over the raw file contents"""
+        if self._mmap is not None:
+            return memoryview(self._mmap)
+        if self._use_mmap:
+            # keygroups not decoded yet lived in the map
+            raise ValueError(f"{self._file} is closed")
+        return memoryview(self._as_bytes)
+
+    def __init__(self, path, use_mmap: bool = False, data=None):
+        """data, when given, is the file contents already read and path only names it"""
         self._file = path
+        self._use_mmap = use_mmap
+        self._mmap = None
         self._mpn = None
-        self._keygroups = []
-        self._sections = {}
+        self._keygroups = KeygroupList(self._decode_indexed_keygroup)
+        self._sections = []
         self._as_bytes = bytearray()
+        # the buffer as read, kept once keygroup_array() lets callers edit it
+        self._original = None
         self._akp_length = 0
         self._riff = RIFFClass()
         self._prg = PrgClass()
@@ -66,127 +138,123 @@ class AkaiAKPFile:
         self._lfo = [LFO1Class(), LFO2Class()]
         self._mods = ModsClass()
 
-        self.readbytes()
+        if data is None:
+            self.readbytes()
+        else:
+            self._as_bytes[:] = data
+            self._akp_length = len(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getstate__(self):
+        # a memory map cannot be pickled, take its contents instead
+        state = self.__dict__.copy()
+        if self._mmap is not None:
+            state["_as_bytes"] = bytearray(self._mmap)
+        state["_mmap"] = None
+        state["_use_mmap"] = False
+        return state
 
     def readbytes(self):
-        """read the file"""
+        """read the file, or memory-map it when use_mmap is set"""
+        if self._use_mmap:
+            with open(self._file, "rb") as fh:
+                self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            self._akp_length = len(self._mmap)
+            return
         with open(self._file, "rb") as fh:
             bs = fh.read()
             self._as_bytes[:] = bs
             self._akp_length = len(bs)
 
+    def make_writable(self):
+        """copy a memory-mapped file into memory so its buffer can be edited in place"""
+        if self._mmap is not None:
+            self._as_bytes[:] = self._mmap
+            self._use_mmap = False
+            self.close()
+
+    def track_buffer_edits(self):
+        """keep a copy of the buffer so changed_ranges() also finds edits made to it directly"""
+        if self._original is None:
+            self._original = bytes(self.buffer)
+
+    def keygroup_array(self):
+        """all keygroups as a numpy structured array over the file buffer, see arrays.py"""
+        from .arrays import keygroup_array
+        return keygroup_array(self)
+
+    def close(self):
+        """release the memory map, if any
+
+        keygroups decoded so far stay usable; the buffer and any keygroup not
+        decoded yet raise ValueError from then on.
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
     def parse_prg(self, data: bytes):
-        self._prg = PrgClass(*data)
+        self._prg = PrgClass.from_bytes(data)
 
     def parse_tune(self, data: bytes):
-        up = {
-            "u_0": data[0],
-            "semitone_tune": data[1],
-            "fine_tune": data[2],
-            "c_detune": data[3],
-            "cs_detune": data[4],
-            "d_detune": data[5],
-            "ds_detune": data[6],
-            "e_detune": data[7],
-            "f_detune": data[8],
-            "fs_detune": data[9],
-            "g_detune": data[10],
-            "gs_detune": data[11],
-            "a_detune": data[12],
-            "bb_detune": data[13],
-            "b_detune": data[14],
-            "pitchbend_up": data[15],
-            "pitchbend_down": data[16],
-            "bend_mode": data[17],
-            "aftertouch": data[18],
-            "u_19": data[19],
-            "u_20": data[20],
-            "u_21": data[21],
-            "u_22": data[22],
-            "u_23": data[23],
-        }
-        for k, v in up.items():
-            setattr(self._tune, k, v)
+        self._tune = TuneClass.from_bytes(data)
 
     def parse_kg_kloc(self, data: bytes):
-        return KLocClass(*data)
+        return KLocClass.from_bytes(data)
 
     def parse_kg_envelope(self, data: bytes, env: type) -> dict:
-        # up = {
-        #        "u_0": data[0],
-        #        "rate_1": data[1],
-        #        "rate_2": data[2],
-        #        "rate_3": data[3],
-        #        "rate_4": data[4],
-        #        "level_1": data[5],
-        #        "level_2": data[6],
-        #        "level_3": data[7],
-        #        "level_4": data[8],
-        #        "u_9": data[9],
-        #        "vel_rate_1": data[10],
-        #        "u_11": data[11],
-        #        "keyboard_r2_r4": data[12],
-        #        "u_13": data[13],
-        #        "vel_rate_4": data[14],
-        #        "off_vel_rate_4": data[15],
-        #        "vel_out_level_0": data[16],
-        #        "u_17": data[17],
-        #    }
-        return env(*data)
+        return env.from_bytes(data)
 
     def parse_kg_zone(self, data: bytes) -> dict:
-        len_sample_name = data[1]
-        sample_name = bytes(data[2 : 22])
-        parm_off = 22
-        remainder = data[parm_off:]
-        return ZoneClass(
-            data[0], len_sample_name, sample_name, *remainder
-        )
+        return ZoneClass.from_bytes(data)
 
     def parse_kg_filter(self, data: bytes):
-        return FilterClass(*data)
+        return FilterClass.from_bytes(data)
 
-    def parse_keygroup(self, data: bytes):
+    def index_keygroup(self, data, offset: int = 0, length: int = None) -> list:
+        """record (name, offset, length) of every sub-chunk of a kgrp payload without decoding it"""
+        end = len(data) if length is None else offset + length
+        entries = []
+        while offset < end:
+            section_name, section_length = struct.unpack_from("<4sI", data, offset)
+            section_name = section_name.decode("ascii")
+            assert section_length % 2 == 0
+            if section_name in KEYGROUP_SECTION_LENGTHS:
+                assert section_length == KEYGROUP_SECTION_LENGTHS[section_name]
+            entries.append((section_name, offset + 8, section_length))
+            offset += section_length + 8
+        return entries
+
+    def decode_keygroup(self, data, entries: list) -> KeygroupClass:
+        """build a KeygroupClass from the sub-chunks recorded by index_keygroup"""
         # a keygroup is a nested collection of sections
         # keyboard location, amplitude envelope, filter envelope, auxiliary envelope, filter settings, zone 1, zone2, zone3, zone4
         envelope_counter = 0
         zone_counter = 0
-        offset = 0
-
-        zones = [
-            "zone1",
-            "zone2",
-            "zone3",
-            "zone4",
-        ]
         kloc = None
         filter = None
         zones = [None, None, None, None]
         envelopes = [None, None, None]
-        while offset < len(data):
-            section_name = data[offset : offset + 4].decode("ascii")
-            section_length = struct.unpack_from("<I", data[offset + 4 : offset + 8])[0]
-            sections = data[offset + 8 : offset + 8 + section_length]
-            assert section_length % 2 == 0
+        for section_name, offset, section_length in entries:
+            sections = data[offset : offset + section_length]
             if section_name == "kloc":
-                assert section_length == 16
                 kloc = self.parse_kg_kloc(sections)
             elif section_name == "env ":
-                assert section_length == 18
                 envelopes[envelope_counter] = self.parse_kg_envelope(
                     sections,
                     EnvelopeClass if envelope_counter < 2 else AuxEnvelopeClass,
                 )
-                # envelopes[envelope_counter].update(self.parse_kg_envelope(sections))
                 envelope_counter += 1
             elif section_name == "filt":
-                assert section_length == 10
                 filter = self.parse_kg_filter(sections)
             elif section_name == "zone":
-                assert section_length == 48
                 zones[zone_counter] = self.parse_kg_zone(sections)
                 zone_counter += 1
-            offset += section_length + 8
         return KeygroupClass(
             kloc=kloc,
             amp_envelope=envelopes[0],
@@ -199,72 +267,58 @@ class AkaiAKPFile:
             zone4=zones[3],
         )
 
+    def parse_keygroup(self, data: bytes):
+        data = memoryview(data)
+        return self.decode_keygroup(data, self.index_keygroup(data))
+
+    def _decode_indexed_keygroup(self, idx: int) -> KeygroupClass:
+        return self.decode_keygroup(self.buffer, self._keygroups.index[idx][2])
+
+    def key_ranges(self) -> list[tuple[int, int]]:
+        """(low note, high note) of every keygroup, decoding only the kloc sub-chunks"""
+        ranges = []
+        buf = self.buffer
+        for idx in range(len(self._keygroups)):
+            if self._keygroups.is_decoded(idx):
+                kloc = self._keygroups[idx].kloc
+            else:
+                kloc_offset = next(o for n, o, _ in self._keygroups.index[idx][2] if n == "kloc")
+                kloc = KLocClass.from_bytes(buf, kloc_offset)
+            ranges.append((kloc.low_note, kloc.high_note))
+        return ranges
+
     def parse_out(self, data: bytes):
-        self._out = OutClass(*data)
+        self._out = OutClass.from_bytes(data)
 
     def parse_lfo(self, data: bytes, lfoclass: type) -> object:
-        return lfoclass(*data)
+        return lfoclass.from_bytes(data)
 
     def parse_mods(self, data: bytes):
-        up = {
-            "u_0": data[0],
-            "u_1": data[1],
-            "u_2": data[2],
-            "u_3": data[3],
-            "u_4": data[4],
-            "amp_mod_1_src": data[5],
-            "u_6": data[6],
-            "amp_mod_2_src": data[7],
-            "u_8": data[8],
-            "pan_mod_1_src": data[9],
-            "u_10": data[10],
-            "pan_mod_2_src": data[11],
-            "u_12": data[12],
-            "pan_mod_3_src": data[13],
-            "u_14": data[14],
-            "lfo_1_rate_mod_src": data[15],
-            "u_16": data[16],
-            "lfo_1_delay_mod_src": data[17],
-            "u_18": data[18],
-            "lfo_1_depth_mod_src": data[19],
-            "u_20": data[20],
-            "lfo_2_rate_mod_src": data[21],
-            "u_22": data[22],
-            "lfo_2_delay_mod_src": data[23],
-            "u_24": data[24],
-            "lfo_2_depth_mod_src": data[25],
-            "u_26": data[26],
-        }
-        for k, v in up.items():
-            setattr(self._mods, k, v)
-        self._mods.u_remainder = b"".join([data[27:]])
+        self._mods = ModsClass.from_bytes(data)
 
     def list_sections(self):
         offset = 0
         o_secname = 0
-        l_secname = 4
-        o_attrlen = 4
-        l_attrlen = 4
         o_attribs = 8
         l_attribs = 1
         section_counter = 0
         keygroup_counter = 0
         lfo_counter = 0
+        self._sections = []
+        self._keygroups = KeygroupList(self._decode_indexed_keygroup)
+        # sections are handed to the parsers as memoryview slices, no copies
+        buf = self.buffer
         while offset < self._akp_length:
             ro_secname = offset + o_secname
-            ro_attrlen = offset + o_attrlen
             ro_attribs = offset + o_attribs
-            section_name = self._as_bytes[ro_secname : ro_secname + l_secname].decode(
-                "ascii"
-            )
-            # little endian decoding of the integer
-            section_length = struct.unpack_from(
-                "<I", self._as_bytes[ro_attrlen : ro_attrlen + l_attrlen]
-            )[0]
-            sections = self._as_bytes[
+            # little endian decoding of the length integer
+            section_name, section_length = struct.unpack_from("<4sI", buf, ro_secname)
+            section_name = section_name.decode("ascii")
+            sections = buf[
                 ro_attribs : ro_attribs + l_attribs * section_length
             ]
             assert section_length % 2 == 0
+            self._sections.append((section_name, offset, section_length))
             if section_name == "RIFF":
                 # skip the garbage of the RIFF file for good hey
                 sections = b"\0\0\0\0"
@@ -284,8 +338,9 @@ class AkaiAKPFile:
                 assert section_length == 38
                 self.parse_mods(sections)
             elif section_name == "kgrp":
-                kg = self.parse_keygroup(sections)
-                self._keygroups.append(kg)
+                # only index the keygroup, it gets decoded on first access
+                entries = self.index_keygroup(buf, ro_attribs, section_length)
+                self._keygroups.add_indexed(offset, o_attribs + section_length, entries)
                 keygroup_counter += 1
             elif section_name == "out ":
                 assert section_length == 8
@@ -296,6 +351,87 @@ class AkaiAKPFile:
             section_counter += 1
             logger.info(f"Read {offset}/{self._akp_length}")
 
+    def decoded_sections(self) -> list[tuple[int, ToBytesAble]]:
+        """(file offset of the attributes, object) of every decoded section read from the file"""
+        found = []
+        lfo_counter = 0
+        top = {"prg ": self._prg, "out ": self._out, "tune": self._tune, "mods": self._mods}
+        for name, offset, _ in self._sections:
+            if name in top:
+                found.append((offset + 8, top[name]))
+            elif name == "lfo ":
+                found.append((offset + 8, self._lfo[lfo_counter]))
+                lfo_counter += 1
+        for idx, entry in enumerate(self._keygroups.index):
+            if entry is None or not self._keygroups.is_decoded(idx):
+                continue
+            kg = self._keygroups[idx]
+            envelopes = [kg.amp_envelope, kg.filter_envelope, kg.aux_envelope]
+            envelope_counter = 0
+            zone_counter = 0
+            for name, offset, _ in entry[2]:
+                if name == "kloc":
+                    found.append((offset, kg.kloc))
+                elif name == "env ":
+                    found.append((offset, envelopes[envelope_counter]))
+                    envelope_counter += 1
+                elif name == "filt":
+                    found.append((offset, kg.filter))
+                elif name == "zone":
+                    found.append((offset, kg.zones[zone_counter]))
+                    zone_counter += 1
+        return found
+
+    def field_offsets(self) -> list[tuple[ToBytesAble, str, int, int]]:
+        """(object, field name, absolute file offset, size) of every decoded field"""
+        return [
+            (obj, name, base + offset, size)
+            for base, obj in self.decoded_sections()
+            for name, offset, size in obj.field_layout()
+        ]
+
+    def changed_ranges(self) -> list[tuple[int, bytes]]:
+        """(file offset, new bytes) of every decoded field that differs from the file buffer
+
+        once keygroup_array() has been handed out the buffer itself may have
+        been edited, and the decoded objects applied to it are diffed against
+        the buffer as it was read instead.
+        """
+        if any(entry is None for entry in self._keygroups.index):
+            raise ValueError("keygroups were added in memory, the file has to be rewritten with to_bytes")
+        buf = self.buffer
+        if self._original is not None:
+            image = bytearray(buf)
+            for base, obj in self.decoded_sections():
+                new = obj.attrs_as_bytes()
+                image[base : base + len(new)] = new
+            return patch.diff_ranges(self._original, image)
+        ranges = []
+        for base, obj in self.decoded_sections():
+            new = obj.attrs_as_bytes()
+            if new == buf[base : base + len(new)]:
+                continue
+            for _, offset, size in obj.field_layout():
+                field = new[offset : offset + size]
+                if field != buf[base + offset : base + offset + size]:
+                    ranges.append((base + offset, field))
+        return patch.merge_ranges(ranges)
+
+    def patch(self, fsync: bool = False) -> list[tuple[int, bytes]]:
+        """write only the changed fields back into the file, atomically, see patch.py
+
+        returns the ranges that were written
+        """
+        ranges = self.changed_ranges()
+        patch.write_ranges(self._file, ranges, fsync)
+        if self._mmap is None:
+            # a shared memory map sees the writes, the in-memory copy has to be updated
+            for offset, data in ranges:
+                self._as_bytes[offset : offset + len(data)] = data
+        if self._original is not None:
+            self._original = bytes(self.buffer)
+        return ranges
+
     def to_bytes(self):
         b = bytearray()
         c = bytearray()
@@ -305,8 +441,14 @@ class AkaiAKPFile:
         c.extend(self.lfo_1.as_riff_bytes())
         c.extend(self.lfo_2.as_riff_bytes())
         c.extend(self.mods.as_riff_bytes())
-        for k in self.keygroups:
-            c.extend(k.as_riff_bytes())
+        buf = self.buffer
+        for idx in range(len(self.keygroups)):
+            if self.keygroups.is_decoded(idx):
+                c.extend(self.keygroups[idx].as_riff_bytes())
+            else:
+                # never decoded, hence never modified: copy the source bytes
+                kg_offset, kg_length, _ = self.keygroups.index[idx]
+                c.extend(buf[kg_offset : kg_offset + kg_length])
         self.riff.LENGTH = len(c) + 4
         b.extend(self.riff.as_riff_bytes())
         b.extend(c)
@@ -0,0 +1,109 @@
+"""NumPy structured-array view over the keygroups of an AKP file
+
+The kgrp chunks of an AKP file are fixed-size and stored back to back, so all
+of them can be viewed as one structured array laid out exactly like the file:
+editing the array edits the file buffer, and AkaiAKPFile.to_bytes copies the
+edited bytes out without building any KeygroupClass.
+
+    arr = akp.keygroup_array()
+    arr["zones"]["semitone_tune"] += 12
+    arr["filter"]["cutoff_freq"] //= 2
+
+Requires numpy.
+"""
+import numpy as np
+
+from .data_maps import (
+    AuxEnvelopeClass,
+    EnvelopeClass,
+    FilterClass,
+    KLocClass,
+    ZoneClass,
+)
+
+STRUCT_TO_DTYPE = {"b": "i1", "B": "u1"}
+
+# sub-chunks of a kgrp, in file order
+KEYGROUP_LAYOUT = [
+    ("kloc", KLocClass),
+    ("amp_envelope", EnvelopeClass),
+    ("filter_envelope", EnvelopeClass),
+    ("aux_envelope", AuxEnvelopeClass),
+    ("filter", FilterClass),
+    ("zone1", ZoneClass),
+    ("zone2", ZoneClass),
+    ("zone3", ZoneClass),
+    ("zone4", ZoneClass),
+]
+
+
+def section_dtype(cls) -> np.dtype:
+    """dtype of a whole section: name, length and attributes"""
+    descr = [("section_name", "S4"), ("section_length", "<u4")]
+    for name, fmt in cls.field_formats():
+        descr.append((name, STRUCT_TO_DTYPE.get(fmt, "S" + fmt[:-1])))
+    return np.dtype(descr)
+
+
+KEYGROUP_DTYPE = np.dtype(
+    [("section_name", "S4"), ("section_length", "<u4")]
+    + [(name, section_dtype(cls)) for name, cls in KEYGROUP_LAYOUT[:5]]
+    + [("zones", section_dtype(ZoneClass), (4,))]
+)
+
+
+def keygroup_array(akp) -> np.ndarray:
+    """all keygroups of a listed AkaiAKPFile as a writable structured array over its buffer
+
+    Keygroups already decoded into objects are written back to the buffer first
+    and dropped from the cache, so the array and later accesses agree.
+    """
+    kgs = akp.keygroups
+    if len(kgs) == 0:
+        return np.empty(0, dtype=KEYGROUP_DTYPE)
+    expected = [(cls.SECTION_NAME.decode("ascii"), cls.LENGTH) for _, cls in KEYGROUP_LAYOUT]
+    first_offset = None
+    for idx, entry in enumerate(kgs.index):
+        if entry is None:
+            raise ValueError(f"keygroup {idx} was added in memory and is not part of the file buffer")
+        offset, length, subchunks = entry
+        if first_offset is None:
+            first_offset = offset
+        if offset != first_offset + idx * KEYGROUP_DTYPE.itemsize or length != KEYGROUP_DTYPE.itemsize:
+            raise ValueError(f"keygroup {idx} is not laid out contiguously")
+        if [(name, length) for name, _, length in subchunks] != expected:
+            raise ValueError(f"keygroup {idx} has a non-standard set of sub-chunks")
+    akp.make_writable()
+    # patch() has to see the edits made through the array, and these packed objects
+    akp.track_buffer_edits()
+    buf = akp.buffer
+    for idx in range(len(kgs)):
+        if kgs.is_decoded(idx):
+            kgs[idx].pack_into(buf, kgs.index[idx][0])
+    kgs.invalidate()
+    return np.frombuffer(buf, dtype=KEYGROUP_DTYPE, count=len(kgs), offset=first_offset)
+
+
+def _clamped(values, low: int, high: int, dtype) -> np.ndarray:
+    return np.clip(values, low, high).astype(dtype)
+
+
+def transpose(arr: np.ndarray, semitones: int):
+    """shift every zone by a number of semitones, clamped to -36 -> 36"""
+    zones = arr["zones"]
+    zones["semitone_tune"] = _clamped(
+        zones["semitone_tune"].astype(np.int16) + semitones, -36, 36, np.int8
+    )
+
+
+def scale_cutoff(arr: np.ndarray, factor: float):
+    """scale the filter cutoff of every keygroup, clamped to 0 -> 100"""
+    flt = arr["filter"]
+    flt["cutoff_freq"] = _clamped(np.rint(flt["cutoff_freq"] * factor), 0, 100, np.uint8)
+
+
+def clamp_velocities(arr: np.ndarray, low: int = 0, high: int = 127):
+    """restrict the velocity range of every zone to low -> high"""
+    zones = arr["zones"]
+    zones["low_velocity"] = _clamped(zones["low_velocity"], low, high, np.uint8)
+    zones["high_velocity"] = _clamped(zones["high_velocity"], low, high, np.uint8)
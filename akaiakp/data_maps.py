@@ -1,33 +1,111 @@
-from dataclasses import dataclass, astuple
+from dataclasses import dataclass, fields
+from operator import attrgetter
 from typing import ClassVar
-from struct import pack
+from struct import error as StructError, pack, Struct
 import logging
 
 logger = logging.getLogger(__name__)
 
+RIFF_HEADER = Struct("<4sI")
+
+
 class ToBytesAble:
     LENGTH: ClassVar[int]
     SECTION_NAME: ClassVar[bytes]
     SKIP_FIELDS: ClassVar[list[str]] = []
-    
-    def attrs_as_bytes(self) -> bytes:
-        to_concat = []
-        for el in astuple(self):
-            if isinstance(el, bytes):
-                to_concat.append(el)
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset()
+
+    @classmethod
+    def field_formats(cls) -> list[tuple[str, str]]:
+        """(field name, struct format) for every attribute of the section
+
+        int fields are single bytes, signed (2's complement) if listed in
+        SIGNED_FIELDS; the (only) bytes field takes whatever is left of LENGTH.
+        """
+        flds = fields(cls)
+        int_count = sum(1 for f in flds if f.type is not bytes)
+        formats = []
+        for f in flds:
+            if f.type is bytes:
+                formats.append((f.name, f"{cls.LENGTH - int_count}s"))
+            elif f.name in cls.SIGNED_FIELDS:
+                formats.append((f.name, "b"))
             else:
-                if el < 0:
-                    assert el > -128 # ensure we don't set too low negative values before we truncate the 2's comp
-                    el = el % (1 << 8)
-                assert el & 0x000000ff == el # ensure you don't set out of range stuff
-                to_concat.append(bytes([el & 0x000000ff]))
-        return b"".join(to_concat)
+                formats.append((f.name, "B"))
+        return formats
+
+    @classmethod
+    def _build_codecs(cls):
+        """compile the field list into struct codecs, once per class"""
+        formats = cls.field_formats()
+        fmt = "".join(f for _, f in formats)
+        cls._codec = Struct("<" + fmt)
+        cls._chunk_codec = Struct("<4sI" + fmt)
+        cls._values = attrgetter(*(name for name, _ in formats))
+        assert cls._codec.size == cls.LENGTH
+
+    @classmethod
+    def codec(cls) -> Struct:
+        """struct codec for the attributes of a section"""
+        if "_codec" not in cls.__dict__:
+            cls._build_codecs()
+        return cls._codec
+
+    @classmethod
+    def chunk_codec(cls) -> Struct:
+        """struct codec for a whole section: name, length and attributes"""
+        if "_codec" not in cls.__dict__:
+            cls._build_codecs()
+        return cls._chunk_codec
+
+    @classmethod
+    def field_layout(cls) -> list[tuple[str, int, int]]:
+        """(field name, offset in the attributes, size) for every attribute of the section"""
+        if "_layout" not in cls.__dict__:
+            layout = []
+            offset = 0
+            for name, fmt in cls.field_formats():
+                size = Struct(fmt).size
+                layout.append((name, offset, size))
+                offset += size
+            cls._layout = layout
+        return cls._layout
+
+    @classmethod
+    def from_bytes(cls, data, offset: int = 0):
+        """decode the attributes of a section from a bytes-like object"""
+        return cls(*cls.codec().unpack_from(data, offset))
+
+    def attrs_as_bytes(self) -> bytes:
+        try:
+            return self.codec().pack(*self._values(self))
+        except StructError as e:
+            raise self._pack_error(e) from None
 
     def as_riff_bytes(self) -> bytes:
-        attrs_len = self.LENGTH
-        attrs_len_b = pack('<I', attrs_len)
-        as_bytes = self.attrs_as_bytes()
-        return b"".join([self.SECTION_NAME, attrs_len_b, as_bytes])
+        try:
+            return self.chunk_codec().pack(self.SECTION_NAME, self.LENGTH, *self._values(self))
+        except StructError as e:
+            raise self._pack_error(e) from None
+
+    def pack_into(self, buf, offset: int) -> int:
+        """write the whole section into buf at offset, return the offset past it"""
+        codec = self.chunk_codec()
+        try:
+            codec.pack_into(buf, offset, self.SECTION_NAME, self.LENGTH, *self._values(self))
+        except StructError as e:
+            raise self._pack_error(e) from None
+        return offset + codec.size
+
+    def _pack_error(self, error: StructError) -> ValueError:
+        """a ValueError naming the attribute that does not fit its byte"""
+        for (name, fmt), value in zip(self.field_formats(), self._values(self)):
+            if fmt not in ("b", "B"):
+                continue
+            low, high = (-128, 127) if fmt == "b" else (0, 255)
+            if not isinstance(value, int) or not low <= value <= high:
+                return ValueError(f"{type(self).__name__}.{name} is {value!r}, must be an int in {low}..{high}")
+        return ValueError(f"{type(self).__name__}: {error}")
 
 @dataclass
 class RIFFClass(ToBytesAble):
@@ -36,10 +114,20 @@ class RIFFClass(ToBytesAble):
     def attrs_as_bytes(self):
         return b'APRG'
 
+    def as_riff_bytes(self) -> bytes:
+        return RIFF_HEADER.pack(self.SECTION_NAME, self.LENGTH) + self.attrs_as_bytes()
+
 @dataclass
 class KLocClass(ToBytesAble):
     LENGTH: ClassVar[int] = 16
     SECTION_NAME: ClassVar[bytes] = b'kloc'
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "semitone_tune",
+        "fine_tune",
+        "pitch_mod_1",
+        "pitch_mod_2",
+        "amp_mod",
+    })
     u_0: int = 0x01
     u_1: int = 0x03
     u_2: int = 0x01
@@ -62,6 +150,23 @@ class KLocClass(ToBytesAble):
 class TuneClass(ToBytesAble):
     LENGTH: ClassVar[int] = 24
     SECTION_NAME: ClassVar[bytes] = b'tune'
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "semitone_tune",
+        "fine_tune",
+        "c_detune",
+        "cs_detune",
+        "d_detune",
+        "ds_detune",
+        "e_detune",
+        "f_detune",
+        "fs_detune",
+        "g_detune",
+        "gs_detune",
+        "a_detune",
+        "bb_detune",
+        "b_detune",
+        "aftertouch",
+    })
     u_0: int = 1
     semitone_tune: int = 0
     fine_tune: int = 0
@@ -92,6 +197,9 @@ class TuneClass(ToBytesAble):
 class OutClass(ToBytesAble):
     LENGTH: ClassVar[int] = 8
     SECTION_NAME: ClassVar[bytes] = b'out '
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "velocity_sens",
+    })
 
     u_0: int = 1
     loudness: int = 0x55
@@ -150,17 +258,16 @@ class ModsClass(ToBytesAble):
     u_26: int = 0
     u_remainder: bytes = b"\00"
 
-    def attrs_as_bytes(self):
-        the_tup = astuple(self)
-        res = b"".join(bytes([a]) for a in the_tup[0:-1])
-        res = res + the_tup[-1]
-        return res
-
 
 @dataclass
 class LFO1Class(ToBytesAble):
     LENGTH: ClassVar[int] = 14
     SECTION_NAME: ClassVar[bytes] = b'lfo '
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "rate_mod",
+        "delay_mod",
+        "depth_mod",
+    })
 
     u_0: int = 1
     waveform: int = 0x1
@@ -182,6 +289,11 @@ class LFO1Class(ToBytesAble):
 class LFO2Class(ToBytesAble):
     LENGTH: ClassVar[int] = 14
     SECTION_NAME: ClassVar[bytes] = b'lfo '
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "rate_mod",
+        "delay_mod",
+        "depth_mod",
+    })
 
     u_0: int = 1
     waveform: int = 0x1
@@ -203,6 +315,12 @@ class LFO2Class(ToBytesAble):
 class EnvelopeClass(ToBytesAble):
     LENGTH: ClassVar[int] = 18
     SECTION_NAME: ClassVar[bytes] = b'env '
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "vel_attack",
+        "keyscale",
+        "on_vel_release",
+        "off_vel_release",
+    })
 
     u_0: int = 1
     attack: int = 0
@@ -228,6 +346,13 @@ class EnvelopeClass(ToBytesAble):
 class AuxEnvelopeClass(ToBytesAble):
     LENGTH: ClassVar[int] = 18
     SECTION_NAME: ClassVar[bytes] = b'env '
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "vel_rate_1",
+        "keyboard_r2_r4",
+        "on_vel_rate_4",
+        "off_vel_rate_4",
+        "vel_out_level",
+    })
 
     u_0: int = 1
     rate_1: int = 0
@@ -253,6 +378,13 @@ class AuxEnvelopeClass(ToBytesAble):
 class ZoneClass(ToBytesAble):
     LENGTH: ClassVar[int] = 48
     SECTION_NAME: ClassVar[bytes] = b'zone'
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "fine_tune",
+        "semitone_tune",
+        "filter",
+        "pan_balance",
+        "zone_level",
+    })
 
     u_0: int = 1
     sample_char_len: int = 20
@@ -269,7 +401,6 @@ class ZoneClass(ToBytesAble):
     u_10: int = 0
     u_11: int = 0
     u_12: int = 0
-    u_13: int = 0
     low_velocity: int = 0
     high_velocity: int = 0x7F
     fine_tune: int = 0
@@ -283,11 +414,18 @@ class ZoneClass(ToBytesAble):
     velocity_start_lsb: int = 0
     velocity_start_msb: int = 0
     u_46: int = 0
+    u_47: int = 0
 
 @dataclass
 class FilterClass(ToBytesAble):
     LENGTH: ClassVar[int] = 10
     SECTION_NAME: ClassVar[bytes] = b'filt'
+    SIGNED_FIELDS: ClassVar[frozenset[str]] = frozenset({
+        "keyboard_track",
+        "mod_input_1",
+        "mod_input_2",
+        "mod_input_3",
+    })
 
     u_0: int = 1
     filter_mode: int = 0
@@ -327,16 +465,32 @@ class KeygroupClass(ToBytesAble):
             self.zone4,
         ]
 
+    @property
+    def sections(self):
+        return [
+            self.kloc,
+            self.amp_envelope,
+            self.filter_envelope,
+            self.aux_envelope,
+            self.filter,
+            self.zone1,
+            self.zone2,
+            self.zone3,
+            self.zone4,
+        ]
+
+    @property
+    def riff_length(self) -> int:
+        return sum(s.chunk_codec().size for s in self.sections)
+
+    def pack_into(self, buf, offset: int) -> int:
+        RIFF_HEADER.pack_into(buf, offset, self.SECTION_NAME, self.riff_length)
+        offset += RIFF_HEADER.size
+        for s in self.sections:
+            offset = s.pack_into(buf, offset)
+        return offset
+
     def as_riff_bytes(self) -> bytes:
-        sections = bytearray()
-        sections.extend(self.kloc.as_riff_bytes())
-        sections.extend(self.amp_envelope.as_riff_bytes())
-        sections.extend(self.filter_envelope.as_riff_bytes())
-        sections.extend(self.aux_envelope.as_riff_bytes())
-        sections.extend(self.filter.as_riff_bytes())
-        sections.extend(self.zone1.as_riff_bytes())
-        sections.extend(self.zone2.as_riff_bytes())
-        sections.extend(self.zone3.as_riff_bytes())
-        sections.extend(self.zone4.as_riff_bytes())
-        len_sections = pack('<I', len(sections))
-        return self.SECTION_NAME + len_sections + sections
+        buf = bytearray(RIFF_HEADER.size + self.riff_length)
+        self.pack_into(buf, 0)
+        return bytes(buf)
@@ -0,0 +1,130 @@
+"""write changed byte ranges back into an AKP file in place
+
+Every AKP section has a fixed length, so editing a decoded field never moves
+anything: only the bytes that changed need to reach the disk. Before they
+are written, the bytes they replace go to an undo journal next to the file;
+the journal is removed once the patch is complete. A journal left behind by
+a crash is rolled back by the next patch of the file, or by an explicit
+recover(), so the file ends up with either the whole patch or none of it.
+
+Patching and recovery hold an exclusive flock on the program file, which
+keeps a recovery from rolling back a patch that another process is still
+writing. Plain reads take no lock and never write: a reader that races a
+patch, or reads a file whose patch crashed, can see it half applied.
+"""
+import os
+import struct
+from contextlib import contextmanager
+
+JOURNAL_SUFFIX = ".patch-journal"
+JOURNAL_MAGIC = b"AKPJ"
+JOURNAL_HEADER = struct.Struct("<4sI")
+JOURNAL_ENTRY = struct.Struct("<QI")
+
+
+def journal_path(path: str) -> str:
+    return str(path) + JOURNAL_SUFFIX
+
+
+def merge_ranges(ranges: list[tuple[int, bytes]]) -> list[tuple[int, bytes]]:
+    """coalesce adjacent (offset, data) ranges so each run costs one write"""
+    merged = []
+    for offset, data in sorted(ranges, key=lambda r: r[0]):
+        if merged and merged[-1][0] + len(merged[-1][1]) == offset:
+            merged[-1] = (merged[-1][0], merged[-1][1] + data)
+        else:
+            merged.append((offset, bytes(data)))
+    return merged
+
+
+def _write_journal(path: str, fd: int, ranges: list[tuple[int, bytes]], fsync: bool):
+    parts = [JOURNAL_HEADER.pack(JOURNAL_MAGIC, len(ranges))]
+    for offset, data in ranges:
+        parts.append(JOURNAL_ENTRY.pack(offset, len(data)))
+        parts.append(os.pread(fd, len(data), offset))
+    # the trailing magic marks the journal as complete
+    parts.append(JOURNAL_MAGIC)
+    jpath = journal_path(path)
+    with open(jpath, "wb") as fh:
+        fh.write(b"".join(parts))
+        if fsync:
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+@contextmanager
+def _locked(path: str):
+    """an O_RDWR descriptor of path, held under an exclusive flock"""
+    import fcntl
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield fd
+    finally:
+        # closing the descriptor releases the lock
+        os.close(fd)
+
+
+def _roll_back(path: str, fd: int) -> bool:
+    """undo the patch recorded in the journal of path; the caller holds the lock"""
+    jpath = journal_path(path)
+    try:
+        with open(jpath, "rb") as fh:
+            journal = fh.read()
+    except FileNotFoundError:
+        return False
+    if journal.startswith(JOURNAL_MAGIC) and journal.endswith(JOURNAL_MAGIC):
+        _, count = JOURNAL_HEADER.unpack_from(journal, 0)
+        pos = JOURNAL_HEADER.size
+        for _ in range(count):
+            offset, length = JOURNAL_ENTRY.unpack_from(journal, pos)
+            pos += JOURNAL_ENTRY.size
+            os.pwrite(fd, journal[pos : pos + length], offset)
+            pos += length
+        os.fsync(fd)
+    # an incomplete journal means the file was never touched
+    os.unlink(jpath)
+    return True
+
+
+def write_ranges(path: str, ranges: list[tuple[int, bytes]], fsync: bool = False):
+    """pwrite every (offset, data) range into path, all or nothing
+
+    with fsync the journal and the file are flushed to stable storage, which
+    also makes the patch survive a power loss; without it a crashed process
+    still never leaves a half-patched file once it is recovered. A journal
+    left by an earlier crash is rolled back first.
+    """
+    ranges = merge_ranges(ranges)
+    if not ranges:
+        return
+    with _locked(path) as fd:
+        _roll_back(path, fd)
+        _write_journal(path, fd, ranges, fsync)
+        for offset, data in ranges:
+            os.pwrite(fd, data, offset)
+        if fsync:
+            os.fsync(fd)
+        os.unlink(journal_path(path))
+
+
+def recover(path: str) -> bool:
+    """roll back an interrupted patch of path, return True if there was one"""
+    if not os.path.exists(journal_path(path)):
+        return False
+    with _locked(path) as fd:
+        # the patch may have completed while we waited for the lock
+        return _roll_back(path, fd)
+
+
+def diff_ranges(old, new, block: int = 64) -> list[tuple[int, bytes]]:
+    """(offset, new bytes) of every run of bytes where new differs from old, of equal length"""
+    ranges = []
+    for start in range(0, len(new), block):
+        end = min(start + block, len(new))
+        if old[start:end] == new[start:end]:
+            continue
+        for offset in range(start, end):
+            if old[offset] != new[offset]:
+                ranges.append((offset, bytes(new[offset : offset + 1])))
+    return merge_ranges(ranges)
@@ -7,4 +7,4 @@ See https://lsnl.jp/~ohsaki/software/akaitools/S3000-format.html
 or a copy at https://docs.google.com/document/d/13h-ZlRHqs-B7J1OUHhy4CX5VUeDH27gNB0H_6wCyIEs/edit
 
 """
-from .akairaw import AkaiRAWProgramFile
+from .akairaw import AkaiRAWProgramFile, AkaiRAWSampleFile
@@ -1,8 +1,42 @@
 import sys
-from . import AkaiRAWProgramFile
+from . import AkaiRAWProgramFile, AkaiRAWSampleFile
 
 p_file = sys.argv[1]
 
+if p_file == "wav":
+    # python -m akairaw wav <sample.s or directory of .s files> <output directory>
+    import os
+    from .wav import export_directory, export_wav, wav_name
+    src, dst_dir = sys.argv[2], sys.argv[3]
+    if os.path.isdir(src):
+        written = export_directory(src, dst_dir)
+    else:
+        os.makedirs(dst_dir, exist_ok=True)
+        written = [os.path.join(dst_dir, wav_name(src))]
+        with AkaiRAWSampleFile(src) as s:
+            export_wav(s, written[0])
+    for path in written:
+        print(path)
+    sys.exit(0)
+
+if p_file == "disk":
+    # python -m akairaw disk <image>: list the volumes and files of a disk image
+    from .disk import AkaiDiskImage
+    with AkaiDiskImage(sys.argv[2]) as img:
+        for volume in img.volumes():
+            print(f"Partition {volume.partition.number} Volume {volume.number}: {volume.name}")
+            for entry in img.files(volume):
+                print(f"  {entry.name:<12} {entry.type_name:<14} {entry.size:>9}")
+    sys.exit(0)
+
+if p_file.lower().endswith(".s"):
+    with AkaiRAWSampleFile(p_file) as s:
+        print("Sample:", s.sample_name)
+        print(f"Rate: {s.sample_rate} Hz Length: {s.sample_count} samples ({s.duration:.2f}s)")
+        for loop in s.loops:
+            print(loop)
+    sys.exit(0)
+
 f = AkaiRAWProgramFile(p_file)
 f.parse_program()
 print("Program:", f.program_name)
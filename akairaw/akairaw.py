@@ -1,5 +1,9 @@
 from dataclasses import dataclass
 from typing import ClassVar
+import mmap
+import struct
+
+from .arrays import KEYGROUP_FIELDS, VELOCITY_ZONE_FIELDS
 
 
 _memoized_maps = {}
@@ -104,106 +108,109 @@ class AkaiRawProgramHeaderData:
     def from_bytes(cls, b: bytearray):
         return cls(b[0x00], *b[0x01:0x03], b[0x03:0x0f], *b[0x0f:0x47], b[0x47:])
 
-@dataclass
-class AkaiRawProgramKeygroupData:
+
+def _row_field(name: str, as_bytes: bool) -> property:
+    def get(self):
+        value = self._array[name][self._index]
+        return value.tobytes() if as_bytes else int(value)
+
+    def set(self, value):
+        self._array[name][self._index] = value
+
+    return property(get, set)
+
+
+class RecordView:
+    """one row of a structured array (see arrays.py) with its fields as attributes
+
+    reading converts the field to int (bytes for the names), assigning writes
+    through to the array and so to the program bytes it views.
+    """
+    __slots__ = ("_array", "_index")
+    fields: ClassVar[tuple] = ()
+
+    def __init__(self, array, index: int = 0):
+        self._array = array
+        self._index = index
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.fields:
+            setattr(cls, name, _row_field(name, name == "sample_name"))
+
+    def tobytes(self) -> bytes:
+        return self._array[self._index].tobytes()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.tobytes() == other.tobytes()
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.fields)
+        return f"{type(self).__name__}({values})"
+
+
+class AkaiRawProgramKeygroupData(RecordView):
     data_length: ClassVar[int] = 34
-    keygroup_block_id: int
-    next_keygroup_offset_lsb: int
-    next_keygroup_offset_msb: int
-    keyrange_low: int
-    keyrange_high: int
-    tune_offset_coarse: int
-    tune_offset_cents: int
-    filter_freq: int
-    key_to_filter_freq: int
-    velocity_to_filter_freq: int
-    pressure_to_filter_freq: int
-    envelope_to_filter_freq: int
-    amp_attack: int
-    amp_decay: int
-    amp_sustain: int
-    amp_release: int
-    velocity_to_amp_attack: int
-    velocity_to_amp_release: int
-    off_velocity_to_amp_release: int
-    key_to_amp_decay_and_release: int
-    filter_attack: int
-    filter_decay: int
-    filter_sustain: int
-    filter_release: int
-    velocity_to_filter_attack: int
-    velocity_to_filter_release: int
-    off_velocity_to_filter_release: int
-    key_to_filter_decay_and_release: int
-    velocity_to_filter_envelope_output: int
-    envelope_to_pitch: int
-    velocity_zone_crossfade: int
-    number_of_velocity_zones: int
-    internal_a: int
-    internal_b: int
-    remainder: bytes
+    __slots__ = ()
+    fields = KEYGROUP_FIELDS
 
     def __str__(self):
         return f"""#{self.keygroup_block_id} k: {self.keyrange_low} K: {self.keyrange_high}
 Filter: {self.filter_freq}
 """
-    
+
     @property
-    def velocity_zones(self):
-        if not hasattr(self, '_vlzs'):
-            self.remainder_to_velocity_zone_data()
-        return self._vlzs
+    def remainder(self) -> bytes:
+        """the bytes after the common keygroup data, velocity zones first"""
+        return self.tobytes()[self.data_length:]
+
+    @property
+    def velocity_zones(self) -> list["AkaiRawProgramKeygroupVelocityZoneData"]:
+        zones = self._array["zones"][self._index]
+        return [
+            AkaiRawProgramKeygroupVelocityZoneData(zones, idx)
+            for idx in range(min(self.number_of_velocity_zones, len(zones)))
+        ]
+
     @classmethod
     def from_bytes(cls, b: bytearray):
-        return cls(*b[0:cls.data_length], b[cls.data_length:])
-
-    def remainder_to_velocity_zone_data(self):
-        vlz_length = 0x39 - 0x22 + 1
-        vlzs = []
-        total_rem = len(self.remainder)
-        offset = 0
-        num_vlz = self.number_of_velocity_zones
-        while (offset < total_rem and num_vlz > 0):
-            ds = self.remainder[offset : offset + vlz_length]
-            vlzs.append(AkaiRawProgramKeygroupVelocityZoneData.from_bytes(ds))
-            offset += vlz_length
-            num_vlz -= 1
-        self._vlzs = vlzs
+        """a view over a copy of a single keygroup block"""
+        import numpy as np
+        from .arrays import KEYGROUP_DTYPE
+        block = bytearray(b[:KEYGROUP_DTYPE.itemsize]).ljust(KEYGROUP_DTYPE.itemsize, b"\0")
+        return cls(np.frombuffer(block, dtype=KEYGROUP_DTYPE), 0)
 
-@dataclass
-class AkaiRawProgramKeygroupVelocityZoneData:
-    sample_name: bytearray(12)
-    velocity_range_low: int
-    velocity_range_high: int
-    tune_offset_fine: int
-    tune_offset_coarse: int
-    loudness_offset: int
-    filter_freq_offset: int
-    pan_offset: int
-    playback_mode: int
-    low_velocity_xfade_factor_lsb: int
-    low_velocity_xfade_factor_msb: int
-    sample_address_lsb: int
-    sample_address_msb: int
+
+class AkaiRawProgramKeygroupVelocityZoneData(RecordView):
+    __slots__ = ()
+    fields = VELOCITY_ZONE_FIELDS
 
     def __str__(self):
         return f"""v: {self.velocity_range_low} V: {self.velocity_range_high}
 Sample: [{self.ascii_sample_name}] CTune:{a2psi(self.tune_offset_coarse)}/STune:{map_u_to_cents(self.tune_offset_fine)}
 Loudness: {a2psi(self.loudness_offset)} Pan: {a2psi(self.pan_offset)} Playback Mode: {self.playback_mode}
 """
-    
+
     @property
     def ascii_sample_name(self):
         return decode_akai_string(self.sample_name).decode('ascii')
 
     @classmethod
     def from_bytes(cls, b: bytearray):
-        return cls(b[0:12], *b[12:])
+        """a view over a copy of a single velocity zone"""
+        import numpy as np
+        from .arrays import VELOCITY_ZONE_DTYPE
+        zone = bytearray(b[:VELOCITY_ZONE_DTYPE.itemsize]).ljust(VELOCITY_ZONE_DTYPE.itemsize, b"\0")
+        return cls(np.frombuffer(zone, dtype=VELOCITY_ZONE_DTYPE), 0)
 
 
 
-FROM_STRING = b''.join(b'%c' % (a,) for a in range(10)) + b'\x0a' + b''.join(b'%c' % (a,) for a in range(11, 0x28))
-TO_STRING = b'0123456789 ABCDEFGHIJKLMNOPQRSTUVWXYZ#+.'
+# the Akai charset: byte 0x00 is '0', 0x0a is ' ', 0x27 is '-' and 0x28 is '.'
+AKAI_CHARS = b'0123456789 ABCDEFGHIJKLMNOPQRSTUVWXYZ#+-.'
+FROM_STRING = bytes(range(len(AKAI_CHARS)))
+TO_STRING = AKAI_CHARS
 
 trans_table = bytes.maketrans(FROM_STRING, TO_STRING)
 def decode_akai_string(b: bytes):
@@ -226,34 +233,221 @@ class AkaiRAWProgramFile:
     def keygroups(self) -> list[AkaiRawProgramKeygroupData]:
         return self._keygroups
 
-    def __init__(self, path):
+    @property
+    def keygroup_array(self):
+        """every keygroup as one numpy structured array, see arrays.py"""
+        return self._keygroup_array
+
+    def __init__(self, path, data=None):
+        """data, when given, is the program itself and path only names it, see disk.py"""
         self._file = path
         self.asbytes = bytearray()
         self._program_len = 0
         self._header = None
         self._keygroups = []
-        self.readbytes()
+        self._keygroup_array = None
+        if data is None:
+            self.readbytes()
+        else:
+            self.asbytes[:] = data
+            self._program_len = len(data)
 
     def readbytes(self):
         with open(self._file, "rb") as fh:
             bh = fh.read()
-            self.asbytes[:] = bh
+            # a new buffer, the keygroup array may still view the old one
+            self.asbytes = bytearray(bh)
             self._program_len = len(bh)
 
     def parse_program(self):
-        first_keygroup_offset = 0xc0
-        keygroup_length = 0x17f - 0x0c0
+        from .arrays import keygroup_array
         # read the header
         hd = AkaiRawProgramHeaderData.from_bytes(self.asbytes[0x00:0xbf])
         self._header = hd
         # make sanity checks
         assert self.header.header_id == 1
-        # now let's read the keygroups
-        keygroup_offset = 0xc0
-        keygroup_boundary = 0x180 - 0xc0
-        keygroups = []
-        while keygroup_offset < self._program_len:
-            kg = AkaiRawProgramKeygroupData.from_bytes(self.asbytes[keygroup_offset:keygroup_offset + keygroup_boundary])
-            keygroups.append(kg)
-            keygroup_offset += keygroup_boundary
-        self._keygroups = keygroups
+        # now decode every keygroup in one go, following the keygroup chain
+        self._keygroup_array = keygroup_array(self.asbytes)
+        self._keygroups = [
+            AkaiRawProgramKeygroupData(self._keygroup_array, idx) for idx in range(len(self._keygroup_array))
+        ]
+
+    def __getstate__(self):
+        # the views are rebuilt over the unpickled bytes
+        state = self.__dict__.copy()
+        state["_keygroup_array"] = None
+        state["_keygroups"] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self._header is not None:
+            self.parse_program()
+
+
+@dataclass
+class AkaiRawSampleLoopData:
+    data_length: ClassVar[int] = 12
+    _struct: ClassVar[struct.Struct] = struct.Struct("<IHIH")
+    loop_at: int
+    loop_length_fraction: int
+    loop_length: int
+    loop_time: int
+
+    @classmethod
+    def from_bytes(cls, b, offset: int = 0):
+        return cls(*cls._struct.unpack_from(b, offset))
+
+
+@dataclass
+class AkaiRawSampleHeaderData:
+    data_length: ClassVar[int] = 0xc0
+    loop_count: ClassVar[int] = 8
+    _head: ClassVar[struct.Struct] = struct.Struct("<BBB12sBBBBBBBIIII")
+    _tail: ClassVar[struct.Struct] = struct.Struct("<HHHB")
+    header_id: int
+    bandwidth: int
+    original_pitch: int
+    sample_name: bytes
+    sample_rate_valid: int
+    active_loop_count: int
+    first_active_loop: int
+    dummy: int
+    playback_type: int
+    pitch_offset_fraction: int
+    pitch_offset: int
+    data_absolute_start: int
+    sample_count: int
+    play_start: int
+    play_end: int
+    loops: list[AkaiRawSampleLoopData]
+    dummy_2: int
+    stereo_partner_address: int
+    sample_rate: int
+    hold_loop_tune_offset: int
+    remainder: bytes
+
+    @classmethod
+    def from_bytes(cls, b):
+        head = cls._head.unpack_from(b, 0)
+        offset = cls._head.size
+        loops = []
+        for _ in range(cls.loop_count):
+            loops.append(AkaiRawSampleLoopData.from_bytes(b, offset))
+            offset += AkaiRawSampleLoopData.data_length
+        tail = cls._tail.unpack_from(b, offset)
+        offset += cls._tail.size
+        # the S1000 header ends before data_length, its PCM body is not part of the header
+        end = SAMPLE_HEADER_LENGTHS.get(head[0], cls.data_length)
+        return cls(*head, loops, *tail, bytes(b[offset:end]))
+
+
+# the PCM body follows the header, which is shorter on the S1000
+SAMPLE_HEADER_LENGTHS = {1: 0x96, 3: 0xc0}
+
+
+class AkaiRAWSampleFile:
+    """an S1000/S3000 .s sample: the header is decoded, the PCM body stays memory-mapped
+
+    The body is 16 bit little-endian two's complement PCM, sample_count frames long.
+    A sample can also sit on top of a buffer cut from somewhere else, e.g. a
+    disk image (see disk.py); offset then tells where the sample starts in
+    path, or path is None if the sample is not stored contiguously there.
+    """
+
+    PCM_DTYPE: ClassVar[str] = "<i2"
+
+    @property
+    def file_name(self) -> str:
+        return self._file
+
+    @property
+    def header(self) -> AkaiRawSampleHeaderData:
+        return self._header
+
+    @property
+    def sample_name(self) -> str:
+        return decode_akai_string(self.header.sample_name).decode('ascii')
+
+    @property
+    def sample_rate(self) -> int:
+        return self.header.sample_rate
+
+    @property
+    def sample_count(self) -> int:
+        return self.header.sample_count
+
+    @property
+    def duration(self) -> float:
+        return self.sample_count / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def loops(self) -> list[AkaiRawSampleLoopData]:
+        """the loops that are actually set"""
+        return [lp for lp in self.header.loops if lp.loop_length or lp.loop_length_fraction]
+
+    @property
+    def pcm_offset(self) -> int:
+        return SAMPLE_HEADER_LENGTHS[self.header.header_id]
+
+    @property
+    def pcm_file_offset(self) -> int:
+        """where the PCM body starts in file_name"""
+        return self._offset + self.pcm_offset
+
+    @property
+    def pcm_bytes(self) -> memoryview:
+        """the raw PCM body, straight from the memory map"""
+        end = self.pcm_offset + 2 * self.sample_count
+        return self._buffer[self.pcm_offset:end]
+
+    def __init__(self, path, buffer=None, offset: int = 0):
+        self._file = path
+        self._offset = offset
+        self._mmap = None
+        self._buffer = None
+        self._header = None
+        if buffer is None:
+            self.readbytes()
+        else:
+            self._buffer = memoryview(buffer)
+            self.parse_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def readbytes(self):
+        with open(self._file, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._mmap)
+        self.parse_header()
+
+    def parse_header(self):
+        # the header id tells the format, and with it the length of the header
+        header_length = SAMPLE_HEADER_LENGTHS.get(self._buffer[0]) if len(self._buffer) else None
+        if header_length is None:
+            raise ValueError(f"{self._file} is not an S1000/S3000 sample")
+        if len(self._buffer) < header_length:
+            raise ValueError(f"{self._file} is too short for a sample header")
+        self._header = AkaiRawSampleHeaderData.from_bytes(self._buffer)
+        if self.pcm_offset + 2 * self.sample_count > len(self._buffer):
+            raise ValueError(f"{self._file} is shorter than its {self.sample_count} samples")
+
+    def samples(self):
+        """the PCM body as a read-only numpy array of int16, nothing is read up front"""
+        import numpy as np
+        if self._mmap is not None:
+            # a memmap of its own keeps the array valid after close()
+            return np.memmap(self._file, dtype=self.PCM_DTYPE, mode="r", offset=self.pcm_file_offset, shape=(self.sample_count,))
+        return np.frombuffer(self._buffer, dtype=self.PCM_DTYPE, count=self.sample_count, offset=self.pcm_offset)
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.release()
+            self._buffer = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
@@ -0,0 +1,190 @@
+"""NumPy structured-array view over the keygroups of an S1000/S3000 program
+
+Every keygroup is a 0xc0-byte block holding its four velocity zones, so all
+of them decode with one numpy.frombuffer into KEYGROUP_DTYPE. The blocks are
+found by following the keygroup chain: the header and every keygroup hold
+the sampler memory address of the (next) keygroup, in 16-byte units counted
+from the program header. AkaiRawProgramKeygroupData and
+AkaiRawProgramKeygroupVelocityZoneData are views over rows of the array.
+
+    arr = prog.keygroup_array
+    arr["zones"]["velocity_range_high"].max(axis=1)
+
+Requires numpy, which is only imported once a dtype or an array is needed:
+the field tables are shared with akairaw.py, which has to import without it.
+"""
+import logging
+import struct
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HEADER_LENGTH = 0xc0
+KEYGROUP_LENGTH = 0xc0
+KEYGROUP_BLOCK_ID = 2
+ADDRESS_UNIT = 16
+FIRST_KEYGROUP_ADDRESS = 0x01
+NEXT_KEYGROUP_ADDRESS = 0x01
+KEYGROUP_COUNT = 0x2a
+ADDRESS = struct.Struct("<H")
+SAMPLE_NAME_LENGTH = 12
+
+# the common keygroup data, single bytes; the four velocity zones follow
+KEYGROUP_FIELDS = (
+    "keygroup_block_id",
+    "next_keygroup_offset_lsb",
+    "next_keygroup_offset_msb",
+    "keyrange_low",
+    "keyrange_high",
+    "tune_offset_coarse",
+    "tune_offset_cents",
+    "filter_freq",
+    "key_to_filter_freq",
+    "velocity_to_filter_freq",
+    "pressure_to_filter_freq",
+    "envelope_to_filter_freq",
+    "amp_attack",
+    "amp_decay",
+    "amp_sustain",
+    "amp_release",
+    "velocity_to_amp_attack",
+    "velocity_to_amp_release",
+    "off_velocity_to_amp_release",
+    "key_to_amp_decay_and_release",
+    "filter_attack",
+    "filter_decay",
+    "filter_sustain",
+    "filter_release",
+    "velocity_to_filter_attack",
+    "velocity_to_filter_release",
+    "off_velocity_to_filter_release",
+    "key_to_filter_decay_and_release",
+    "velocity_to_filter_envelope_output",
+    "envelope_to_pitch",
+    "velocity_zone_crossfade",
+    "number_of_velocity_zones",
+    "internal_a",
+    "internal_b",
+)
+
+# sample_name is SAMPLE_NAME_LENGTH bytes, the rest single bytes
+VELOCITY_ZONE_FIELDS = (
+    "sample_name",
+    "velocity_range_low",
+    "velocity_range_high",
+    "tune_offset_fine",
+    "tune_offset_coarse",
+    "loudness_offset",
+    "filter_freq_offset",
+    "pan_offset",
+    "playback_mode",
+    "low_velocity_xfade_factor_lsb",
+    "low_velocity_xfade_factor_msb",
+    "sample_address_lsb",
+    "sample_address_msb",
+)
+
+_dtypes = {}
+
+
+def __getattr__(name: str):
+    # VELOCITY_ZONE_DTYPE and KEYGROUP_DTYPE are built on first use, the field tables come without numpy
+    if name in ("VELOCITY_ZONE_DTYPE", "KEYGROUP_DTYPE"):
+        return _dtype(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _dtype(name: str) -> "np.dtype":
+    if not _dtypes:
+        _build_dtypes()
+    return _dtypes[name]
+
+
+def _build_dtypes():
+    import numpy as np
+    zone = np.dtype([
+        (name, f"V{SAMPLE_NAME_LENGTH}" if name == "sample_name" else "u1")
+        for name in VELOCITY_ZONE_FIELDS
+    ])
+    tail = KEYGROUP_LENGTH - len(KEYGROUP_FIELDS) - 4 * zone.itemsize
+    keygroup = np.dtype(
+        [(name, "u1") for name in KEYGROUP_FIELDS]
+        + [("zones", zone, (4,))]
+        + [("tail", f"V{tail}")]
+    )
+    assert keygroup.itemsize == KEYGROUP_LENGTH
+    _dtypes.update(VELOCITY_ZONE_DTYPE=zone, KEYGROUP_DTYPE=keygroup)
+
+
+def walk_keygroup_chain(data) -> tuple[list[int], tuple[int, str]]:
+    """(file offsets of the keygroups in chain order, (file offset, message) of a problem or None)
+
+    the chain is followed for the keygroup count of the header; it is broken
+    where an address leaves the file or lands on something else than a
+    keygroup block, and cyclic where it comes back to a keygroup already seen.
+    """
+    count = data[KEYGROUP_COUNT]
+    first = ADDRESS.unpack_from(data, FIRST_KEYGROUP_ADDRESS)[0]
+    # the header sits HEADER_LENGTH bytes before the first keygroup
+    base = first - HEADER_LENGTH // ADDRESS_UNIT
+    offsets = []
+    seen = set()
+    address = first
+    # where the address being followed is stored
+    at = FIRST_KEYGROUP_ADDRESS
+    for idx in range(count):
+        offset = (address - base) * ADDRESS_UNIT
+        if not HEADER_LENGTH <= offset <= len(data) - KEYGROUP_LENGTH or data[offset] != KEYGROUP_BLOCK_ID:
+            return offsets, (at, f"keygroup {idx + 1} address {address:#x} is not a keygroup block")
+        if offset in seen:
+            return offsets, (at, f"keygroup chain loops back to keygroup {offsets.index(offset) + 1}")
+        seen.add(offset)
+        offsets.append(offset)
+        at = offset + NEXT_KEYGROUP_ADDRESS
+        address = ADDRESS.unpack_from(data, at)[0]
+    return offsets, None
+
+
+def keygroup_offsets(data) -> list[int]:
+    """file offsets of the keygroups, in chain order
+
+    a chain that is broken or cyclic falls back to the consecutive blocks
+    after the header, as does a keygroup count of 0.
+    """
+    count = data[KEYGROUP_COUNT]
+    if count == 0:
+        return consecutive_offsets(data)
+    offsets, problem = walk_keygroup_chain(data)
+    if problem is not None:
+        logger.warning("%s, reading consecutive blocks", problem[1])
+        return consecutive_offsets(data, count)
+    return offsets
+
+
+def consecutive_offsets(data, count: int = 0) -> list[int]:
+    """the blocks right after the header, count of them or up to the end of the file"""
+    available = (len(data) - HEADER_LENGTH) // KEYGROUP_LENGTH
+    count = min(count, available) if count else available
+    return [HEADER_LENGTH + idx * KEYGROUP_LENGTH for idx in range(count)]
+
+
+def keygroup_array(data) -> "np.ndarray":
+    """every keygroup of the program in data as a structured array
+
+    writable views into data when the keygroups are stored back to back, as
+    they nearly always are, a copy gathered in chain order otherwise.
+    """
+    import numpy as np
+    dtype = _dtype("KEYGROUP_DTYPE")
+    offsets = keygroup_offsets(data)
+    if not offsets:
+        return np.empty(0, dtype=dtype)
+    first = offsets[0]
+    if offsets == list(range(first, first + len(offsets) * KEYGROUP_LENGTH, KEYGROUP_LENGTH)):
+        return np.frombuffer(data, dtype=dtype, count=len(offsets), offset=first)
+    raw = np.frombuffer(data, dtype=np.uint8)
+    rows = raw[np.asarray(offsets)[:, None] + np.arange(KEYGROUP_LENGTH)]
+    return rows.view(dtype).reshape(len(offsets))
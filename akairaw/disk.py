@@ -0,0 +1,221 @@
+"""read S1000/S3000 hard disk and CD-ROM images in place
+
+The image is memory-mapped and the Akai file system walked directly, see
+S3000-format.html: an image holds one or more partitions, each starting with
+the disk information, a table of 100 volumes and a FAT of 16 bit block
+links. A volume points to its directory of file entries, a file entry to the
+first block of a FAT chain. Blocks are 0x2000 bytes.
+
+Programs and samples are handed out as AkaiRAWProgramFile/AkaiRAWSampleFile
+over slices of the map; only files whose blocks are scattered get copied.
+"""
+import mmap
+import struct
+from dataclasses import dataclass
+
+from .akairaw import AkaiRAWProgramFile, AkaiRAWSampleFile, decode_akai_string
+
+BLOCK_SIZE = 0x2000
+
+PARTITION_SIZE = struct.Struct("<H")
+VOLUME_TABLE_OFFSET = 0xca
+VOLUME_ENTRY = struct.Struct("<12sHH")
+VOLUME_COUNT = 100
+FAT_OFFSET = 0x70a
+FAT_ENTRY = struct.Struct("<H")
+FILE_ENTRY = struct.Struct("<12s4sB3sH2s")
+
+VOLUME_INACTIVE = 0
+VOLUME_S1000 = 1
+VOLUME_S3000 = 3
+# the S3000 directory runs over a second block
+DIRECTORY_ENTRIES = {VOLUME_S1000: 128, VOLUME_S3000: 512}
+
+# FAT values with one of the top bits set are markers, not block numbers:
+# 0x4000 reserved, 0x8000 second S3000 directory block, 0xc000 end of file
+FAT_FREE = 0x0000
+FAT_MARKER_MASK = 0xc000
+
+FILE_TYPES = {
+    0x64: "drum",
+    0x70: "S1000-program",
+    0x71: "QL",
+    0x73: "S1000-sample",
+    0x78: "effect",
+    0xf0: "S3000-program",
+    0xf3: "S3000-sample",
+}
+PROGRAM_TYPES = (0x70, 0xf0)
+SAMPLE_TYPES = (0x73, 0xf3)
+
+
+@dataclass
+class AkaiDiskPartition:
+    number: int
+    offset: int
+    blocks: int
+
+
+@dataclass
+class AkaiDiskVolume:
+    partition: AkaiDiskPartition
+    number: int
+    name: str
+    volume_type: int
+    start_block: int
+
+
+@dataclass
+class AkaiDiskFileEntry:
+    volume: AkaiDiskVolume
+    name: str
+    file_type: int
+    size: int
+    start_block: int
+
+    @property
+    def type_name(self) -> str:
+        return FILE_TYPES.get(self.file_type, f"unknown-{self.file_type:02x}")
+
+    @property
+    def is_program(self) -> bool:
+        return self.file_type in PROGRAM_TYPES
+
+    @property
+    def is_sample(self) -> bool:
+        return self.file_type in SAMPLE_TYPES
+
+
+class AkaiDiskImage:
+    @property
+    def file_name(self) -> str:
+        return self._file
+
+    @property
+    def partitions(self) -> list[AkaiDiskPartition]:
+        return self._partitions
+
+    def __init__(self, path):
+        self._file = path
+        self._mmap = None
+        self._partitions = []
+        self.readbytes()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def readbytes(self):
+        with open(self._file, "rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self.list_partitions()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def list_partitions(self):
+        """partitions follow each other, each starting with its size in blocks"""
+        self._partitions = []
+        offset = 0
+        while offset + FAT_OFFSET <= len(self._mmap):
+            (blocks,) = PARTITION_SIZE.unpack_from(self._mmap, offset)
+            if blocks == 0:
+                break
+            self._partitions.append(AkaiDiskPartition(len(self._partitions) + 1, offset, blocks))
+            offset += blocks * BLOCK_SIZE
+        if not self._partitions:
+            raise ValueError(f"{self._file} is not an Akai disk image")
+
+    def volumes(self, partition: AkaiDiskPartition = None) -> list[AkaiDiskVolume]:
+        """the active volumes of one or all partitions"""
+        found = []
+        for part in [partition] if partition else self._partitions:
+            for idx in range(VOLUME_COUNT):
+                name, volume_type, start = VOLUME_ENTRY.unpack_from(
+                    self._mmap, part.offset + VOLUME_TABLE_OFFSET + idx * VOLUME_ENTRY.size
+                )
+                if volume_type not in DIRECTORY_ENTRIES or start == 0:
+                    continue
+                found.append(AkaiDiskVolume(part, idx + 1, _akai_name(name), volume_type, start))
+        return found
+
+    def files(self, volume: AkaiDiskVolume = None) -> list[AkaiDiskFileEntry]:
+        """the file entries of one or all volumes"""
+        found = []
+        for vol in [volume] if volume else self.volumes():
+            base = vol.partition.offset + vol.start_block * BLOCK_SIZE
+            for idx in range(DIRECTORY_ENTRIES[vol.volume_type]):
+                offset = base + idx * FILE_ENTRY.size
+                if offset + FILE_ENTRY.size > len(self._mmap):
+                    break
+                name, _, file_type, size, start, _ = FILE_ENTRY.unpack_from(self._mmap, offset)
+                if file_type == 0 or start == 0:
+                    continue
+                found.append(AkaiDiskFileEntry(vol, _akai_name(name), file_type, int.from_bytes(size, "little"), start))
+        return found
+
+    def fat(self, partition: AkaiDiskPartition, block: int) -> int:
+        (value,) = FAT_ENTRY.unpack_from(self._mmap, partition.offset + FAT_OFFSET + 2 * block)
+        return value
+
+    def block_chain(self, entry: AkaiDiskFileEntry) -> list[int]:
+        """the blocks holding entry, in order"""
+        part = entry.volume.partition
+        needed = -(-entry.size // BLOCK_SIZE)
+        chain = []
+        block = entry.start_block
+        while len(chain) < needed:
+            if block == FAT_FREE or block & FAT_MARKER_MASK or block >= part.blocks:
+                raise ValueError(f"broken block chain for {entry.name} at block {block}")
+            chain.append(block)
+            block = self.fat(part, block)
+        return chain
+
+    def read(self, entry: AkaiDiskFileEntry) -> tuple[memoryview, int]:
+        """(contents of entry, offset in the image or None)
+
+        contiguous files, the usual case, are a slice of the memory map;
+        scattered ones are gathered into a new buffer.
+        """
+        chain = self.block_chain(entry)
+        part_offset = entry.volume.partition.offset
+        if chain == list(range(chain[0], chain[0] + len(chain))):
+            offset = part_offset + chain[0] * BLOCK_SIZE
+            return memoryview(self._mmap)[offset : offset + entry.size], offset
+        data = bytearray(entry.size)
+        pos = 0
+        for block in chain:
+            offset = part_offset + block * BLOCK_SIZE
+            length = min(BLOCK_SIZE, entry.size - pos)
+            data[pos : pos + length] = self._mmap[offset : offset + length]
+            pos += length
+        return memoryview(data), None
+
+    def open(self, entry: AkaiDiskFileEntry):
+        """the program or sample object for entry"""
+        data, offset = self.read(entry)
+        if entry.is_program:
+            return AkaiRAWProgramFile(entry.name, data=data)
+        elif entry.is_sample:
+            return AkaiRAWSampleFile(self._file if offset is not None else None, data, offset or 0)
+        raise ValueError(f"{entry.name} is a {entry.type_name}, not a program or a sample")
+
+    def programs(self):
+        """(entry, AkaiRAWProgramFile) of every program on the image"""
+        for entry in self.files():
+            if entry.is_program:
+                yield entry, self.open(entry)
+
+    def samples(self):
+        """(entry, AkaiRAWSampleFile) of every sample on the image"""
+        for entry in self.files():
+            if entry.is_sample:
+                yield entry, self.open(entry)
+
+
+def _akai_name(name: bytes) -> str:
+    return decode_akai_string(name).decode("ascii").rstrip()
@@ -0,0 +1,107 @@
+"""export raw S1000/S3000 .s samples to WAV
+
+The PCM body of a .s file is already 16 bit little-endian signed, which is
+exactly what a WAV data chunk holds, so the body is copied file to file by
+the kernel (copy_file_range, or sendfile) behind a freshly built RIFF/WAVE
+header. Any other source layout is converted with numpy, a chunk at a time.
+"""
+import os
+import struct
+
+from .akairaw import AkaiRAWSampleFile
+
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+WAV_PCM = 1
+WAV_DTYPE = "<i2"
+# frames converted per numpy chunk when the body is not already WAV data
+CONVERT_CHUNK = 1 << 18
+
+
+def wav_header(sample_rate: int, frames: int, channels: int = 1, bits: int = 16) -> bytes:
+    block_align = channels * bits // 8
+    data_length = frames * block_align
+    return WAV_HEADER.pack(
+        b"RIFF", 36 + data_length, b"WAVE",
+        b"fmt ", 16, WAV_PCM, channels, sample_rate, sample_rate * block_align, block_align, bits,
+        b"data", data_length,
+    )
+
+
+def _copy_range(src_fd: int, src_offset: int, dst_fd: int, dst_offset: int, count: int):
+    """copy count bytes between two file descriptors without going through Python buffers"""
+    if hasattr(os, "copy_file_range"):
+        try:
+            while count:
+                done = os.copy_file_range(src_fd, dst_fd, count, src_offset, dst_offset)
+                if done == 0:
+                    raise EOFError("source file ended early")
+                src_offset += done
+                dst_offset += done
+                count -= done
+            return
+        except OSError:
+            # cross-device or unsupported file system, sendfile takes the rest
+            pass
+    os.lseek(dst_fd, dst_offset, os.SEEK_SET)
+    while count:
+        done = os.sendfile(dst_fd, src_fd, src_offset, count)
+        if done == 0:
+            raise EOFError("source file ended early")
+        src_offset += done
+        count -= done
+
+
+def export_wav(sample: AkaiRAWSampleFile, dst: str, pcm_dtype: str = None):
+    """write sample as a mono 16 bit WAV file at dst
+
+    pcm_dtype describes the body of the source, the default being the .s
+    layout; a body that is not WAV-ready (8 bit, unsigned, big-endian) gets
+    converted by numpy in chunks.
+    Samples that are not stored contiguously in a file (see disk.py) are
+    written from their buffer.
+    """
+    import numpy as np
+
+    pcm_dtype = np.dtype(pcm_dtype or AkaiRAWSampleFile.PCM_DTYPE)
+    if pcm_dtype.itemsize > 2:
+        raise ValueError(f"cannot export {pcm_dtype} PCM, a .s body holds at most 16 bits per frame")
+    header = wav_header(sample.sample_rate, sample.sample_count)
+    with open(dst, "wb") as out:
+        out.write(header)
+        if pcm_dtype != np.dtype(WAV_DTYPE):
+            pcm = sample.pcm_bytes
+            body = np.frombuffer(pcm, dtype=pcm_dtype, count=sample.sample_count)
+            for start in range(0, sample.sample_count, CONVERT_CHUNK):
+                chunk = body[start:start + CONVERT_CHUNK].astype(np.int32)
+                if pcm_dtype.kind == "u":
+                    # offset binary to two's complement
+                    chunk -= 1 << (8 * pcm_dtype.itemsize - 1)
+                # 8 bit frames are scaled up to the full 16 bit range
+                chunk <<= 16 - 8 * pcm_dtype.itemsize
+                chunk.astype(WAV_DTYPE).tofile(out)
+            del body
+            pcm.release()
+        elif sample.file_name is None:
+            out.write(sample.pcm_bytes)
+        else:
+            out.flush()
+            with open(sample.file_name, "rb") as src:
+                _copy_range(src.fileno(), sample.pcm_file_offset, out.fileno(), len(header), 2 * sample.sample_count)
+
+
+def wav_name(sample_path: str) -> str:
+    return os.path.splitext(os.path.basename(sample_path))[0] + ".wav"
+
+
+def export_directory(src_dir: str, dst_dir: str) -> list[str]:
+    """export every .s file of src_dir to dst_dir, returning the WAV paths"""
+    os.makedirs(dst_dir, exist_ok=True)
+    written = []
+    for fn in sorted(os.listdir(src_dir)):
+        if not fn.lower().endswith(".s"):
+            continue
+        dst = os.path.join(dst_dir, wav_name(fn))
+        with AkaiRAWSampleFile(os.path.join(src_dir, fn)) as sample:
+            export_wav(sample, dst)
+        written.append(dst)
+    return written
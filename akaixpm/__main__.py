@@ -20,4 +20,4 @@ for item in filez:
         fh.write(x)
         logger.info("wrote %s bytes to test-out.xml", len(x))
     with open("program.json", "w", encoding="utf-8") as fh:
-        json.dump(item.program.program_pads, fh, indent=2)
+        json.dump(item.program.program_pads.decode(), fh, indent=2)
@@ -1,19 +1,34 @@
-import bs4
-from typing import ClassVar
-from dataclasses import dataclass, fields, asdict, field
+import io
+from typing import TYPE_CHECKING, ClassVar
+from dataclasses import dataclass, field
 import logging
-import json
-from html import escape
-import xml.dom.minidom
 
-from akaixpm.constants import DEFAULT_PROGRAMPADS_JSON
+from akaixpm.compression import open_xpm_bytes, open_xpm_read, open_xpm_write
+from akaixpm.pads import ProgramPads
+from akaixpm.raw import RawList, load_raw
+from akaixpm.sparse import SparseList, sparse_field
+from akaixpm.schema import (
+    ATTRIBUTE,
+    COLLECTION,
+    OBJECT,
+    PROGRAM_PADS,
+    PROGRAMPADS_TAG,
+    FieldSchema,
+    compile_schema,
+)
 
 
+if TYPE_CHECKING:
+    import xml.etree.ElementTree as ET
+
 logger = logging.getLogger(__name__)
 PT_KEYGROUP = "Keygroup"
 PT_DRUMS = "Drum"
 
-PROGRAMPADS_TAG = "ProgramPads-v2.10"
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n\n'
+XML_INDENT = "  "
+# the MPC writes these as <Tag></Tag> when empty, everything else as <Tag/>
+EXPANDED_EMPTY_TAGS = ("SampleName", "SampleFile")
 
 
 class AkaiXPMFile:
@@ -30,73 +45,143 @@ class AkaiXPMFile:
     def version(self):
         return self._mpcvobj.version
 
-    def __init__(self, path):
+    def __init__(self, path, data: bytes = None, lazy: bool = False):
+        """data, when given, is the file contents already read and path only names it
+
+        lazy is round-trip mode: instruments, pad maps and ProgramPads are only
+        decoded when accessed and written back verbatim when not, see raw.py
+        """
         self._file_path = path
         self._mpcvobj = None
-        with open(self._file_path, "r", encoding="utf-8") as fh:
-            self._xml_data = fh.read()
-        self._xml_tree = bs4.BeautifulSoup(self._xml_data, "xml")
-        self._parse()
+        # imported here, the CLIs that only write XPM files never need the parser
+        import xml.etree.ElementTree as ET
+
+        # gzip/zstd compressed files are decompressed on the fly
+        with open_xpm_read(self._file_path) if data is None else open_xpm_bytes(data) as fh:
+            if lazy:
+                self._mpcvobj = load_raw(AkaiXPMMPCVObject, fh.read().decode("utf-8"), ROUND_TRIP_COLLECTIONS)
+                return
+            tree = ET.parse(fh)
+        # only the parsed objects are kept, not the element tree
+        self._parse(tree.getroot())
 
-    def _parse_version(self, elem: bs4.element.Tag):
+    @classmethod
+    def from_mpcvobject(cls, mpcvobj: "AkaiXPMMPCVObject", path: str = None):
+        """wrap an in-memory MPCVObject, e.g. the result of a conversion, so it can be written"""
+        f = cls.__new__(cls)
+        f._file_path = path
+        f._mpcvobj = mpcvobj
+        return f
+
+    def write(self, path: str = None, compression: str = None):
+        """write the program as XPM to path, defaulting to the file it was loaded from
+
+        .xpm.gz and .xpm.zst paths are compressed as they are written, compression
+        ('gzip' or 'zstd') forces it regardless of the name.
+        """
+        path = path or self._file_path
+        with open_xpm_write(path, compression) as fh:
+            self.write_xml(fh)
+
+    def _parse_version(self, elem: "ET.Element"):
         self._version = AkaiXPMVersion.from_xml_element(elem)
 
-    def _parse_mpcvobject(self, elem: bs4.element.Tag):
+    def _parse_mpcvobject(self, elem: "ET.Element"):
         self._mpcvobj = AkaiXPMMPCVObject.from_xml_element(elem)
 
-    def _parse(self):
-        for tag in self._xml_tree.children:
-            if tag.name == "MPCVObject":
-                self._parse_mpcvobject(tag)
+    def _parse(self, root: "ET.Element"):
+        if root.tag == "MPCVObject":
+            self._parse_mpcvobject(root)
 
     def to_xml(self):
-        newsoup = bs4.BeautifulSoup("", "xml")
-        xmlstr = str(self._mpcvobj.to_xml_element(newsoup, self.program_type.lower()))
-        logger.info("xmlstr len %s", len(xmlstr))
-        dom = xml.dom.minidom.parseString(xmlstr)
-        # ewww
-        return (
-            dom.toprettyxml(indent="  ")
-            .replace(
-                '<?xml version="1.0" ?>', '<?xml version="1.0" encoding="UTF-8"?>\n'
-            )
-            .replace("<SampleName/>", "<SampleName></SampleName>")
-            .replace("<SampleFile/>", "<SampleFile></SampleFile>")
-        )
+        buf = io.StringIO()
+        self.write_xml(buf)
+        return buf.getvalue()
+
+    def write_xml(self, fh):
+        """stream the program as MPC-compatible XML to a text file handle"""
+        fh.write(XML_HEADER)
+        self._mpcvobj.write_xml_element(fh, 0)
 
 
 class XMLLoadable:
+    __slots__ = ()
     tag_name: ClassVar[str]
     collection_name: ClassVar[str] = None
 
     @classmethod
-    def from_xml_element(cls, e: bs4.element.Tag):
-        if e.name == cls.collection_name:
+    def schema(cls) -> tuple[list[FieldSchema], list[FieldSchema]]:
+        """(attributes, child elements) of the class, compiled on first use, see schema.py"""
+        if "_schema" not in cls.__dict__:
+            compiled = compile_schema(cls)
+            for fs in compiled:
+                if fs.kind == OBJECT:
+                    # programs are polymorphic, their factory picks the class
+                    fs.load = getattr(fs.cls, "factory", fs.cls.from_xml_element)
+                elif fs.kind == COLLECTION and fs.sparse is not None:
+                    fs.load = lambda elm, fs=fs: SparseList.from_list(fs.sparse, fs.cls.from_xml_element(elm))
+                elif fs.kind == COLLECTION:
+                    fs.load = fs.cls.from_xml_element
+            cls._schema = (
+                [fs for fs in compiled if fs.kind == ATTRIBUTE],
+                [fs for fs in compiled if fs.kind != ATTRIBUTE],
+            )
+        return cls._schema
+
+    @classmethod
+    def from_xml_element(cls, e: "ET.Element"):
+        if e.tag == cls.collection_name:
             # this is a collection, let's make a list
             r = []
-            for elm in e.children:
-                if elm.name is None:
-                    continue
-                assert elm.name == cls.tag_name
+            for elm in e:
+                assert elm.tag == cls.tag_name
                 r.append(cls.from_xml_element(elm))
             return r
-        else:
-            assert e.name == cls.tag_name
-            parms = {}
-            for tn in fields(cls):
-                t = juice_tags(e, tn.name)
-                parms[tn.name] = t
+        assert e.tag == cls.tag_name
+        attributes, elements = cls.schema()
+        parms = {}
+        for fs in attributes:
+            value = e.get(fs.tag)
+            parms[fs.name] = None if value is None else fs.load(value)
+        children = child_elements(e)
+        for fs in elements:
+            elm = children.get(fs.tag)
+            if elm is None:
+                logger.error("Cannot find %s in %s", fs.tag, e.tag)
+                raise ValueError(f"Ouch, failed for {fs.tag}")
+            if fs.kind in (OBJECT, COLLECTION):
+                parms[fs.name] = fs.load(elm)
+            else:
+                parms[fs.name] = fs.load(elm.text or "")
         return cls(**parms)
 
-    def to_xml_element(self, soup: bs4.BeautifulSoup, context_hint: str = None):
-        tag = soup.new_tag(self.tag_name)
-        properties = asdict(self)
-        for k in fields(self):
-            unjuice_tags(tag, k.name, getattr(self, k.name), soup, context_hint)
-        return tag
+    def write_xml_element(self, fh, level: int = 0):
+        """write this object as an indented element; attributes first, then one line per child"""
+        indent = XML_INDENT * level
+        attributes, elements = self.schema()
+        attrs = "".join(
+            f' {fs.tag}="{escape_xml(fs.dump(getattr(self, fs.name)))}"' for fs in attributes
+        )
+        fh.write(f"{indent}<{self.tag_name}{attrs}")
+        if not elements:
+            fh.write("/>\n")
+            return
+        fh.write(">\n")
+        child_indent = indent + XML_INDENT
+        for fs in elements:
+            value = getattr(self, fs.name)
+            if fs.kind == OBJECT:
+                value.write_xml_element(fh, level + 1)
+            elif fs.kind == COLLECTION:
+                write_collection(fh, fs.cls, value, level + 1)
+            elif fs.kind == PROGRAM_PADS and isinstance(value, ProgramPads) and value.source is not None:
+                fh.write(f"{child_indent}<{fs.tag}>{value.source}</{fs.tag}>\n")
+            else:
+                write_text_element(fh, fs.tag, "" if value is None else fs.dump(value), child_indent)
+        fh.write(f"{indent}</{self.tag_name}>\n")
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMVersion(XMLLoadable):
     tag_name: ClassVar[str] = "Version"
 
@@ -106,7 +191,7 @@ class AkaiXPMVersion(XMLLoadable):
     platform: str = "Linux"
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMAudioRoute(XMLLoadable):
     tag_name: ClassVar[str] = "AudioRoute"
     audio_route: int
@@ -130,7 +215,7 @@ class AkaiXPMAudioRoute(XMLLoadable):
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMLFO(XMLLoadable):
     tag_name: ClassVar[str] = "LFO"
     lfo_num: int
@@ -148,7 +233,7 @@ class AkaiXPMLFO(XMLLoadable):
         return cls(lfo_num=lfo_num, **kwargs)
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMInstrumentLayer(XMLLoadable):
     tag_name: ClassVar[str] = "Layer"
     collection_name: ClassVar[str] = "Layers"
@@ -188,11 +273,11 @@ class AkaiXPMInstrumentLayer(XMLLoadable):
     slice_tail_length: float = 0.0
 
     @classmethod
-    def default_layers(cls, num_layers: int = 4) -> list:
-        return [cls(number=a + 1) for a in range(num_layers)]
+    def default_layers(cls, num_layers: int = 4, **kwargs) -> list:
+        return [cls(number=a + 1, **kwargs) for a in range(num_layers)]
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMDrumPadEffect(XMLLoadable):
     tag_name: ClassVar[str] = "DrumPadEffect"
     collection_name: ClassVar[str] = "DrumPadEffects"
@@ -206,13 +291,13 @@ class AkaiXPMDrumPadEffect(XMLLoadable):
         return [cls(a, 0.0, b) for a, b in enumerate(parm_map)]
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMBaseInstrument(XMLLoadable):
     tag_name: ClassVar[str] = "Instrument"
     collection_name: ClassVar[str] = "Instruments"
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMKeygroupInstrument(AkaiXPMBaseInstrument):
     number: int
     cue_bus_enable: bool = False
@@ -298,8 +383,8 @@ class AkaiXPMKeygroupInstrument(AkaiXPMBaseInstrument):
     simult_target3: int = 0
     simult_target4: int = 0
     trigger_mode: int = 2
-    layers: list[AkaiXPMInstrumentLayer] = field(
-        default_factory=lambda: AkaiXPMInstrumentLayer.default_layers(4)
+    layers: list[AkaiXPMInstrumentLayer] = sparse_field(
+        "AkaiXPMKeygroupInstrument.layers", lambda: AkaiXPMInstrumentLayer.default_layers(4)
     )  # 4 layers
 
     @classmethod
@@ -307,7 +392,7 @@ class AkaiXPMKeygroupInstrument(AkaiXPMBaseInstrument):
         return [cls(number=a + 1) for a in range(num)]
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMDrumInstrument(AkaiXPMBaseInstrument):
     number: int
     cue_bus_enable: bool = False
@@ -374,8 +459,8 @@ class AkaiXPMDrumInstrument(AkaiXPMBaseInstrument):
     cutoff_random: float = 0.0
     resonance_random: float = 0.0
     lfo: AkaiXPMLFO = field(default_factory=lambda: AkaiXPMLFO.lfo(0))
-    drum_pad_effects: list[AkaiXPMDrumPadEffect] = field(
-        default_factory=AkaiXPMDrumPadEffect.drumpadeffect_default_list
+    drum_pad_effects: list[AkaiXPMDrumPadEffect] = sparse_field(
+        "AkaiXPMDrumInstrument.drum_pad_effects", AkaiXPMDrumPadEffect.drumpadeffect_default_list
     )
     tune_coarse: int = 0
     tune_fine: int = 0
@@ -399,16 +484,16 @@ class AkaiXPMDrumInstrument(AkaiXPMBaseInstrument):
     bpm_lock: bool = True
     warp_enable: bool = False
     stretch_percentage: int = 100
-    layers: list[AkaiXPMInstrumentLayer] = field(
-        default_factory=lambda: AkaiXPMInstrumentLayer.default_layers(4)
-    )  # 4 layers
+    layers: list[AkaiXPMInstrumentLayer] = sparse_field(
+        "AkaiXPMDrumInstrument.layers", lambda: AkaiXPMInstrumentLayer.default_layers(4, slice_index=128)
+    )  # 4 layers, the MPC gives drum layers slice index 128
 
     @classmethod
     def default_list(cls, num=128):
         return [cls(number=a + 1) for a in range(num)]
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMPadNote(XMLLoadable):
     tag_name: ClassVar[str] = "PadNote"
     collection_name: ClassVar[str] = "PadNoteMap"
@@ -425,7 +510,7 @@ class AkaiXPMPadNote(XMLLoadable):
         first_chunk = [cls(number=a-35, note=a) for a in range(36,128)]
         second_chunk = [cls(number=a+93, note=a) for a in range(0, 36)]
         return first_chunk + second_chunk
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMPadGroup(XMLLoadable):
     tag_name: ClassVar[str] = "PadGroup"
     collection_name: ClassVar[str] = "PadGroupMap"
@@ -437,7 +522,7 @@ class AkaiXPMPadGroup(XMLLoadable):
     def default_list(cls):
         return [cls(number=a + 1, group=0) for a in range(128)]
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMBaseProgram(XMLLoadable):
     """AkaiXPMBaseProgram is the parent for all <Program> entries in an Akai XPM file.
 
@@ -447,20 +532,21 @@ class AkaiXPMBaseProgram(XMLLoadable):
     tag_name: ClassVar[str] = "Program"
 
     @staticmethod
-    def factory(e: bs4.element.Tag) -> object:
+    def factory(e: "ET.Element") -> object:
         """return a AkaiXPMabcProgram of the right type based on the passed tag"""
-        assert e["type"] in ("Drum", "Keygroup", "MIDI", "Plugin")
-        if e["type"] == "Drum":
+        program_type = e.get("type")
+        assert program_type in ("Drum", "Keygroup", "MIDI", "Plugin")
+        if program_type == "Drum":
             return AkaiXPMDrumProgram.from_xml_element(e)
-        elif e["type"] == "Keygroup":
+        elif program_type == "Keygroup":
             return AkaiXPMKeygroupProgram.from_xml_element(e)
         else:
             raise NotImplementedError(
-                f"programs of type {e['type']} are not (yet) supported"
+                f"programs of type {program_type} are not (yet) supported"
             )
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMKeygroupProgram(AkaiXPMBaseProgram):
     """AkaiXPMKeygroupProgram represents the XML data in an XPM for the program.
 
@@ -469,7 +555,7 @@ class AkaiXPMKeygroupProgram(AkaiXPMBaseProgram):
 
     program_type: str = "Keygroup"
     program_name: str = "EmptyKGName-ChangeMe"
-    program_pads: str = DEFAULT_PROGRAMPADS_JSON
+    program_pads: ProgramPads = field(default_factory=ProgramPads.default)
     cue_bus_enable: bool = False
     audio_route: AkaiXPMAudioRoute = field(
         default_factory=lambda: AkaiXPMAudioRoute.audioroute(2)
@@ -495,8 +581,12 @@ class AkaiXPMKeygroupProgram(AkaiXPMBaseProgram):
     instruments: list[AkaiXPMKeygroupInstrument] = field(
         default_factory=lambda: AkaiXPMKeygroupInstrument.default_list(1)
     )  # a 128-item list of instruments, how stupid can you get?
-    pad_note_map: list[AkaiXPMPadNote] = field(default_factory=lambda: AkaiXPMPadNote.default_keygroup_list()) # same, 128
-    pad_group_map: list[AkaiXPMPadGroup] = field(default_factory=lambda: AkaiXPMPadGroup.default_list())
+    pad_note_map: list[AkaiXPMPadNote] = sparse_field(
+        "AkaiXPMKeygroupProgram.pad_note_map", AkaiXPMPadNote.default_keygroup_list
+    )  # same, 128
+    pad_group_map: list[AkaiXPMPadGroup] = sparse_field(
+        "AkaiXPMKeygroupProgram.pad_group_map", AkaiXPMPadGroup.default_list
+    )
     keygroup_master_transpose: float = 0.5
     keygroup_num_keygroups: int = 1
     keygroup_pitch_bend_range: float = 0.0
@@ -504,13 +594,13 @@ class AkaiXPMKeygroupProgram(AkaiXPMBaseProgram):
     keygroup_aftertouch_to_filter: float = 0.0
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMDrumProgram(AkaiXPMBaseProgram):
     tag_name: ClassVar[str] = "Program"
 
     program_type: str = "Drum"
     program_name: str = "DefaultProgramName-ChangeMe"
-    program_pads: str = DEFAULT_PROGRAMPADS_JSON
+    program_pads: ProgramPads = field(default_factory=ProgramPads.default)
     cue_bus_enable: bool = False
     audio_route: AkaiXPMAudioRoute = field(
         default_factory=lambda: AkaiXPMAudioRoute.audioroute(2)
@@ -533,18 +623,22 @@ class AkaiXPMDrumProgram(AkaiXPMBaseProgram):
     portamento_legato: bool = False
     portamento_quantized: bool = False
     program_xfader_route: int = 0
-    instruments: list[AkaiXPMDrumInstrument] = field(
-        default_factory=lambda: AkaiXPMDrumInstrument.default_list(128)
+    instruments: list[AkaiXPMDrumInstrument] = sparse_field(
+        "AkaiXPMDrumProgram.instruments", lambda: AkaiXPMDrumInstrument.default_list(128)
     )  # a 128-item list of instruments, how stupid can you get?
-    pad_note_map: list[AkaiXPMPadNote] = field(default_factory=AkaiXPMPadNote.default_drum_list) # same, 128
-    pad_group_map: list[AkaiXPMPadGroup] = field(default_factory=AkaiXPMPadGroup.default_list)
+    pad_note_map: list[AkaiXPMPadNote] = sparse_field(
+        "AkaiXPMDrumProgram.pad_note_map", AkaiXPMPadNote.default_drum_list
+    )  # same, 128
+    pad_group_map: list[AkaiXPMPadGroup] = sparse_field(
+        "AkaiXPMDrumProgram.pad_group_map", AkaiXPMPadGroup.default_list
+    )
     # warp_tempo: float = 120.0
     # bpm_lock: bool = True
     # warp_enable: bool = False
     # stretch_percentage: int = 100
 
 
-@dataclass
+@dataclass(slots=True)
 class AkaiXPMMPCVObject(XMLLoadable):
     tag_name: ClassVar[str] = "MPCVObject"
 
@@ -552,152 +646,46 @@ class AkaiXPMMPCVObject(XMLLoadable):
     program: AkaiXPMBaseProgram = field(default_factory=AkaiXPMDrumProgram)
 
 
-MAP_TAGS_CLASSES = {
-    "PadNoteMap": AkaiXPMPadNote,
-    "PadNote": AkaiXPMPadNote,
-    "PadGroupMap": AkaiXPMPadGroup,
-    "PadGroup": AkaiXPMPadGroup,
-#    "Instruments": AkaiXPMKeygroupInstrument,
-#    "Instrument": AkaiXPMKeygroupInstrument,
-    "Layers": AkaiXPMInstrumentLayer,
-    "Layer": AkaiXPMInstrumentLayer,
-    "AudioRoute": AkaiXPMAudioRoute,
-    "LFO": AkaiXPMLFO,
- #   "Program": AkaiXPMKeygroupProgram,
-    "Version": AkaiXPMVersion,
-    "DrumPadEffects": AkaiXPMDrumPadEffect,
-    "DrumPadEffect": AkaiXPMDrumPadEffect,
+# the program collections held as source text in round-trip mode, collection tag -> item tag
+ROUND_TRIP_COLLECTIONS = {
+    cls.collection_name: cls.tag_name for cls in (AkaiXPMBaseInstrument, AkaiXPMPadNote, AkaiXPMPadGroup)
 }
 
-PROPER_TAG_NAMES = {
-    "program_polyphony": "Program_Polyphony",
-    "program_xfader_route": "Program.Xfader.Route",
-    "lfo": "LFO",
-    "file_version": "File_Version",
-    "application_version": "Application_Version",
-}
 
-POLYMORPHIC_TAGS = [
-    'Program',
-    'Instrument',
-    'Instruments',
-]
-
-def juice_tags(e: bs4.element.Tag, wanted_field: str):
-    """find the right field from the tag, handling special cases, like you would juice a bad orange"""
-    pascal_case_name = "".join(f.capitalize() for f in wanted_field.split("_"))
-    if wanted_field == "program_type":
-        assert e.name == "Program"
-        return e["type"]
-    elif wanted_field == "number":
-        return e["number"]
-    elif wanted_field == "lfo_num":
-        assert e.name == "LFO"
-        return e["LfoNum"]
-    elif e.name == "DrumPadEffect":
-        assert wanted_field in ("num", "parameter", "type")
-        return e[pascal_case_name]
-        # if wanted_field == "num":
-        #     return e["Num"]
-        # elif wanted_field == "parameter":
-        #     return e["Parameter"]
-        # elif wanted_field == "type":
-        #     return e["Type"]
-
-    elif wanted_field == "program_pads":
-        return json.loads(e.find(PROGRAMPADS_TAG).text)
-    elif wanted_field in PROPER_TAG_NAMES:
-        pascal_case_name = PROPER_TAG_NAMES[wanted_field]
-    # special case: programs because they're highly polymorphic (why though? >.<)
-    elif wanted_field == "program":
-        prog_item = e.find("Program")
-        logger.info("loading program %s", prog_item["type"])
-        return AkaiXPMBaseProgram.factory(prog_item)
-    # general case: all the rest
-    elm = e.find(name=pascal_case_name)
-    if elm is None:
-        logging.error("Cannot find %s in %s", pascal_case_name, e.name)
-        raise ValueError(f"Ouch, failed for {pascal_case_name}")
-
-    elm_c = elm.findChildren()
-    if len(elm_c) == 0:
-        return elm.text
+def child_elements(e: "ET.Element") -> dict:
+    """direct children of an element by tag name, first one wins"""
+    children = {}
+    for c in e:
+        children.setdefault(c.tag, c)
+    return children
+
+
+def escape_xml(value: str) -> str:
+    return (
+        value.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace('"', "&quot;")
+        .replace(">", "&gt;")
+    )
+
+
+def write_text_element(fh, tag: str, text: str, indent: str):
+    """simply write a value as a one-line tag"""
+    if text == "" and tag not in EXPANDED_EMPTY_TAGS:
+        fh.write(f"{indent}<{tag}/>\n")
     else:
-        # special case for polymorphic stuff
-        if elm.name in POLYMORPHIC_TAGS:
-            if elm.name == 'Program':
-                return AkaiXPMBaseProgram.factory(elm)
-            elif elm.name == 'Instruments':
-                assert e.name == 'Program'
-                assert e['type'] in ('Drum', 'Keygroup')
-                if e['type'] == 'Drum':
-                    return AkaiXPMDrumInstrument.from_xml_element(elm)
-                elif e['type'] == 'Keygroup':
-                    return AkaiXPMKeygroupInstrument.from_xml_element(elm)
-        else:
-            assert elm.name in MAP_TAGS_CLASSES
-            return MAP_TAGS_CLASSES[elm.name].from_xml_element(elm)
-
-
-def unjuice_normal_tag(
-    e: bs4.element.Tag, field_name: str, value: str, soup: bs4.BeautifulSoup
-):
-    """simply set a value for a tag"""
-    t = soup.new_tag(field_name)
-    t.string = value
-    e.append(t)
-    return
-
-
-def unjuice_tags(e: bs4.element.Tag, wanted_field: str, value, soup: bs4.BeautifulSoup, context_hint: str = None):
-    if value is None:
-        value = ""
-    if wanted_field == "program_type":
-        assert e.name == "Program"
-        e["type"] = value
-    elif wanted_field == "number":
-        e["number"] = value
-    elif wanted_field == "program_pads":
-        f = soup.new_tag(PROGRAMPADS_TAG)
-        f.string = json.dumps(value, indent=4)
-        e.append(f)
-    elif wanted_field == "lfo_num":
-        assert e.name == "LFO"
-        e["LfoNum"] = value
-    elif e.name == "DrumPadEffect":
-        assert wanted_field in ("num", "parameter", "type")
-        e[wanted_field.capitalize()] = value
+        fh.write(f"{indent}<{tag}>{escape_xml(text)}</{tag}>\n")
+
+
+def write_collection(fh, item_cls: type, items: list, level: int):
+    indent = XML_INDENT * level
+    if not items:
+        fh.write(f"{indent}<{item_cls.collection_name}/>\n")
+        return
+    fh.write(f"{indent}<{item_cls.collection_name}>\n")
+    if isinstance(items, (SparseList, RawList)):
+        items.write_xml(fh, level + 1)
     else:
-        pascal_case_name = "".join(f.capitalize() for f in wanted_field.split("_"))
-        if wanted_field in PROPER_TAG_NAMES:
-            pascal_case_name = PROPER_TAG_NAMES[wanted_field]
-        if pascal_case_name in MAP_TAGS_CLASSES or pascal_case_name in POLYMORPHIC_TAGS:
-            tgtcls = None
-            # special case: programs, we gotta do some guess work
-            if context_hint == "drum" and pascal_case_name == "Program":
-                tgtcls = AkaiXPMDrumProgram
-            elif context_hint == "keygroup" and pascal_case_name == "Program":
-                tgtcls = AkaiXPMKeygroupProgram
-            # special case: AudioRoute.AudioRoute
-            elif pascal_case_name == "AudioRoute" and e.name == "AudioRoute":
-                return unjuice_normal_tag(e, "AudioRoute", value, soup)
-            elif context_hint == "drum" and pascal_case_name == "Instruments":
-                tgtcls = AkaiXPMDrumInstrument
-            elif context_hint == "keygroup" and pascal_case_name == "Instruments":
-                tgtcls = AkaiXPMKeygroupInstrument
-            else:
-                assert pascal_case_name in MAP_TAGS_CLASSES
-                tgtcls = MAP_TAGS_CLASSES[pascal_case_name]
-            if tgtcls.collection_name is not None:
-                # create a collection tag
-                coll = soup.new_tag(tgtcls.collection_name)
-                assert isinstance(value, list)
-                for item in value:
-                    coll.append(item.to_xml_element(soup, context_hint))
-                e.append(coll)
-            else:
-                # create the complex object is all
-                assert isinstance(value, XMLLoadable)
-                e.append(value.to_xml_element(soup, context_hint))
-        else:
-            return unjuice_normal_tag(e, pascal_case_name, value, soup)
+        for item in items:
+            item.write_xml_element(fh, level + 1)
+    fh.write(f"{indent}</{item_cls.collection_name}>\n")
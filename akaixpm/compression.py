@@ -0,0 +1,74 @@
+"""transparent gzip/zstd handling for XPM files
+
+XPM files are verbose XML and compress about a hundredfold, see notes.md.
+Reading detects the compression from the file's magic bytes, writing picks it
+from the file name suffix. zstd needs the optional `zstandard` package.
+"""
+import io
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+GZIP_SUFFIXES = (".gz", ".gzip")
+ZSTD_SUFFIXES = (".zst", ".zstd")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("zstd compressed XPM files need the zstandard package") from None
+    return zstandard
+
+
+def _gzip():
+    # only needed for compressed files, keep it out of the import time
+    import gzip
+    return gzip
+
+
+def compression_for_path(path: str) -> str:
+    """'gzip', 'zstd' or None depending on the file name"""
+    lower = str(path).lower()
+    if lower.endswith(GZIP_SUFFIXES):
+        return "gzip"
+    elif lower.endswith(ZSTD_SUFFIXES):
+        return "zstd"
+    return None
+
+
+def open_xpm_read(path: str):
+    """binary file object over the decompressed XPM data"""
+    fh = open(path, "rb")
+    magic = fh.read(4)
+    fh.seek(0)
+    if magic.startswith(GZIP_MAGIC):
+        fh.close()
+        return _gzip().open(path, "rb")
+    elif magic.startswith(ZSTD_MAGIC):
+        return _zstandard().ZstdDecompressor().stream_reader(fh)
+    return fh
+
+
+def open_xpm_bytes(data: bytes):
+    """binary file object over the decompressed contents of an XPM file already in memory"""
+    fh = io.BytesIO(data)
+    if data[:2] == GZIP_MAGIC:
+        return _gzip().GzipFile(fileobj=fh, mode="rb")
+    elif data[:4] == ZSTD_MAGIC:
+        return _zstandard().ZstdDecompressor().stream_reader(fh)
+    return fh
+
+
+def open_xpm_write(path: str, compression: str = None):
+    """text file object writing UTF-8 XPM data, compressed as the suffix (or compression) says"""
+    compression = compression or compression_for_path(path)
+    if compression == "gzip":
+        return _gzip().open(path, "wt", encoding="utf-8")
+    elif compression == "zstd":
+        raw = open(path, "wb")
+        writer = _zstandard().ZstdCompressor().stream_writer(raw)
+        return io.TextIOWrapper(writer, encoding="utf-8")
+    elif compression is not None:
+        raise ValueError(f"unknown compression {compression}")
+    return open(path, "w", encoding="utf-8")
@@ -0,0 +1,100 @@
+"""the ProgramPads JSON block of a program, decoded only when it is edited
+
+Every XPM carries a ProgramPads-v2.10 element of JSON text, nearly always the
+same default block, and few callers ever look inside it. ProgramPads keeps
+the text as it was read, interned so identical blocks of every loaded
+program share one string, and writes it back as it is. The JSON is only
+parsed when value is used and only dumped again once it has been.
+"""
+import sys
+
+# the default block laid out the way the MPC writes it, see ProgramPads.default
+_default_text = None
+
+
+class ProgramPads:
+    __slots__ = ("_text", "_value", "source")
+
+    def __init__(self, text: str, source: str = None):
+        """text is the JSON, source the escaped element text it was read from, if any"""
+        self._text = sys.intern(text)
+        self._value = None
+        # written back verbatim while the pads are not modified, see raw.py
+        self.source = source
+
+    @classmethod
+    def default(cls) -> "ProgramPads":
+        """the pads of a new program
+
+        constants.py keeps the block in its own layout; it is put in the 4-space
+        layout the MPC writes once, so new programs come out the same as saved ones.
+        """
+        global _default_text
+        if _default_text is None:
+            import json
+            from .constants import DEFAULT_PROGRAMPADS_JSON
+            _default_text = json.dumps(json.loads(DEFAULT_PROGRAMPADS_JSON), indent=4)
+        return cls(_default_text)
+
+    @classmethod
+    def from_value(cls, value) -> "ProgramPads":
+        pads = cls("")
+        pads.value = value
+        return pads
+
+    @property
+    def modified(self) -> bool:
+        return self._value is not None
+
+    @property
+    def value(self):
+        """the decoded JSON, for editing in place; the pads are written from it from now on"""
+        if self._value is None:
+            import json
+            self._value = json.loads(self._text)
+            self.source = None
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.source = None
+
+    def decode(self):
+        """a decoded copy of the JSON, for reading without marking the pads as modified"""
+        if self._value is not None:
+            import copy
+            return copy.deepcopy(self._value)
+        import json
+        return json.loads(self._text)
+
+    @property
+    def text(self) -> str:
+        """the JSON text as it is written to the XPM"""
+        if self._value is None:
+            return self._text
+        import json
+        return json.dumps(self._value, indent=4)
+
+    def __eq__(self, other):
+        if isinstance(other, ProgramPads):
+            if not self.modified and not other.modified:
+                return self._text == other._text
+            return self.decode() == other.decode()
+        if isinstance(other, str):
+            return self.text == other
+        if isinstance(other, dict):
+            return self.decode() == other
+        return NotImplemented
+
+    def __repr__(self):
+        state = "modified" if self.modified else f"{len(self._text)} chars"
+        return f"ProgramPads({state})"
+
+    def __getstate__(self):
+        return self._text, self._value, self.source
+
+    def __setstate__(self, state):
+        text, self._value, self.source = state
+        # shared again with the other programs loaded in this process
+        self._text = sys.intern(text)
@@ -0,0 +1,221 @@
+"""round-trip mode: XPM subtrees kept as the source text they were read from
+
+Changing one field of an XPM, say the program name, should not decode and
+encode again 128 instruments with their layers. In round-trip mode
+(AkaiXPMFile(path, lazy=True)) the collections of an element are cut out of
+its source text before the rest is parsed: each Instrument, PadNote and
+PadGroup stays a slice of the source in a RawList, is decoded when first
+accessed (its own Layers and DrumPadEffects again as RawLists), and is
+written back verbatim for as long as it is untouched. ProgramPads keeps its
+escaped source text the same way, see pads.py.
+
+The cutting relies on collection and item tags not nesting in themselves,
+which holds for every XPM; documents with comments, CDATA sections or a
+DOCTYPE are parsed the usual way instead.
+"""
+import re
+from collections.abc import MutableSequence
+
+from akaixpm.pads import ProgramPads
+from akaixpm.schema import COLLECTION, OBJECT, PROGRAM_PADS, PROGRAMPADS_TAG
+
+_open_tags = {}
+
+
+def _open_tag(tag: str) -> re.Pattern:
+    """an open tag of tag, quoted attribute values may hold '>'; group 1 is '/' when self-closing"""
+    pattern = _open_tags.get(tag)
+    if pattern is None:
+        pattern = _open_tags[tag] = re.compile(
+            r"<%s(?=[\s/>])(?:[^>\"']|\"[^\"]*\"|'[^']*')*?(/?)>" % re.escape(tag)
+        )
+    return pattern
+
+
+_HIDING_MARKUP = re.compile(r"<[!?]")
+
+
+def can_cut(text: str) -> bool:
+    """whether text has none of the markup that could hide tags from the cutting"""
+    start = text.find("?>") + 2 if text.startswith("<?xml") else 0
+    return _HIDING_MARKUP.search(text, start) is None
+
+
+def _find_open(text: str, tag: str, pos: int = 0):
+    """the match of the first open tag of tag at or after pos, or None"""
+    pattern = _open_tag(tag)
+    start = f"<{tag}"
+    while True:
+        # str.find gets to the candidates much faster than a regex search
+        pos = text.find(start, pos)
+        if pos < 0:
+            return None
+        m = pattern.match(text, pos)
+        if m is not None:
+            return m
+        pos += 1
+
+
+def _close(text: str, tag: str, start: int) -> int:
+    """offset of the close tag of tag at or after start"""
+    end = text.find(f"</{tag}>", start)
+    if end < 0:
+        raise ValueError(f"unterminated <{tag}>")
+    return end
+
+
+def _lines(text: str, start: int, end: int) -> tuple[int, int]:
+    """widen start:end to whole lines when the element sits on lines of its own"""
+    line_start = text.rfind("\n", 0, start) + 1
+    if not text[line_start:start].strip():
+        start = line_start
+    line_end = text.find("\n", end)
+    if line_end >= 0 and not text[end:line_end].strip():
+        end = line_end + 1
+    return start, end
+
+
+def split_items(text: str, tag: str) -> list[str]:
+    """the source of every tag element in the inside of a collection"""
+    items = []
+    pos = 0
+    while True:
+        m = _find_open(text, tag, pos)
+        if m is None:
+            return items
+        end = m.end() if m.group(1) else _close(text, tag, m.end()) + len(tag) + 3
+        start, stop = _lines(text, m.start(), end)
+        items.append(text[start:stop])
+        pos = end
+
+
+def cut_subtrees(text: str, collections: dict) -> tuple[str, dict, str]:
+    """(skeleton, {collection tag: item sources}, ProgramPads source or None)
+
+    collections maps collection tags to item tags; the skeleton is text with
+    those collections emptied and ProgramPads replaced by an empty object.
+    """
+    spans = []
+    for tag, item_tag in collections.items():
+        m = _find_open(text, tag)
+        if m is not None and not m.group(1):
+            spans.append((m.end(), _close(text, tag, m.end()), tag, item_tag))
+    m = _find_open(text, PROGRAMPADS_TAG)
+    if m is not None and not m.group(1):
+        spans.append((m.end(), _close(text, PROGRAMPADS_TAG, m.end()), PROGRAMPADS_TAG, None))
+    pieces = []
+    cut = {}
+    pads = None
+    pos = 0
+    for start, end, tag, item_tag in sorted(spans):
+        if start < pos:
+            raise ValueError(f"<{tag}> is nested in another collection")
+        pieces.append(text[pos:start])
+        if item_tag is None:
+            pads = text[start:end]
+            pieces.append("{}")
+        else:
+            cut[tag] = split_items(text[start:end], item_tag)
+        pos = end
+    pieces.append(text[pos:])
+    return "".join(pieces), cut, pads
+
+
+def _attach(obj, cut: dict, pads: str):
+    """put the cut collections and ProgramPads back into obj and its child objects"""
+    _, elements = obj.schema()
+    for fs in elements:
+        if fs.kind == COLLECTION and fs.tag in cut:
+            setattr(obj, fs.name, RawList(fs.cls, cut[fs.tag]))
+        elif fs.kind == PROGRAM_PADS and pads is not None:
+            setattr(obj, fs.name, ProgramPads(_unescape(pads), pads))
+        elif fs.kind == OBJECT:
+            _attach(getattr(obj, fs.name), cut, pads)
+
+
+def _unescape(source: str) -> str:
+    import xml.etree.ElementTree as ET
+    return ET.fromstring(f"<t>{source}</t>").text or ""
+
+
+def load_raw(cls, text: str, collections: dict = None):
+    """an object of cls from the source text of its element, leaving its collections as text
+
+    collections (collection tag -> item tag) defaults to those of cls itself;
+    the document passes the program's, which sit one object further down.
+    """
+    import xml.etree.ElementTree as ET
+    if not can_cut(text):
+        return cls.from_xml_element(ET.fromstring(text))
+    if collections is None:
+        collections = {fs.tag: fs.cls.tag_name for fs in cls.schema()[1] if fs.kind == COLLECTION}
+    skeleton, cut, pads = cut_subtrees(text, collections)
+    obj = cls.from_xml_element(ET.fromstring(skeleton))
+    _attach(obj, cut, pads)
+    return obj
+
+
+class RawList(MutableSequence):
+    """a collection whose items stay source text until they are accessed"""
+
+    __slots__ = ("_item_cls", "_entries")
+
+    def __init__(self, item_cls: type, sources: list[str]):
+        self._item_cls = item_cls
+        # the source of an untouched item, the decoded object once accessed
+        self._entries = list(sources)
+
+    def peek(self, idx: int):
+        # decoded items belong to this list alone, reading them needs no copy
+        return self[idx]
+
+    def iter_view(self):
+        return iter(self)
+
+    def decoded_count(self) -> int:
+        return sum(1 for entry in self._entries if not isinstance(entry, str))
+
+    def write_xml(self, fh, level: int):
+        """write every item, untouched ones exactly as they were read"""
+        for entry in self._entries:
+            if isinstance(entry, str):
+                fh.write(entry)
+            else:
+                entry.write_xml_element(fh, level)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self._entries)))]
+        entry = self._entries[idx]
+        if isinstance(entry, str):
+            # decoded on access, the caller may edit what it gets
+            entry = self._entries[idx] = load_raw(self._item_cls, entry)
+        return entry
+
+    def __setitem__(self, idx, value):
+        if isinstance(idx, slice):
+            value = list(value)
+        self._entries[idx] = value
+
+    def __delitem__(self, idx):
+        del self._entries[idx]
+
+    def insert(self, idx, value):
+        self._entries.insert(idx, value)
+
+    def __eq__(self, other):
+        if isinstance(other, (list, MutableSequence)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RawList({self.decoded_count()}/{len(self._entries)} decoded)"
+
+    def __getstate__(self):
+        return self._item_cls, self._entries
+
+    def __setstate__(self, state):
+        self._item_cls, self._entries = state
@@ -0,0 +1,187 @@
+"""per-class XML schema for the XPM dataclasses
+
+Every XMLLoadable class is compiled once into a FieldSchema per field: the
+tag or attribute holding it, where it goes, and typed converters from and
+to the text the MPC writes. Loading and writing then walk these tables
+instead of working out tag names and special cases for every field of every
+object.
+"""
+import functools
+import typing
+from dataclasses import dataclass, fields
+from typing import Callable
+
+from akaixpm.pads import ProgramPads
+
+PROGRAMPADS_TAG = "ProgramPads-v2.10"
+
+# how a field is stored
+ATTRIBUTE = "attribute"
+TEXT = "text"
+OBJECT = "object"
+COLLECTION = "collection"
+PROGRAM_PADS = "program_pads"
+
+# field names that do not PascalCase into their tag name
+PROPER_TAG_NAMES = {
+    "program_polyphony": "Program_Polyphony",
+    "program_xfader_route": "Program.Xfader.Route",
+    "lfo": "LFO",
+    "file_version": "File_Version",
+    "application_version": "Application_Version",
+}
+
+
+def _typed(convert: Callable) -> Callable:
+    def load(text: str):
+        try:
+            return convert(text)
+        except ValueError:
+            # not what the field says, keep the text so it is written back unchanged
+            return text
+    return load
+
+
+def _load_bool(text: str) -> bool:
+    if text in ("True", "true", "1"):
+        return True
+    elif text in ("False", "false", "0"):
+        return False
+    raise ValueError(text)
+
+
+def dump_str(value) -> str:
+    return "" if value is None else str(value)
+
+
+def dump_bool(value) -> str:
+    if isinstance(value, str):
+        return value
+    return "True" if value else "False"
+
+
+class SourceFloat(float):
+    """a float read from text the writer would format differently, e.g. "0.5" in an element
+
+    it is written back as that text; arithmetic gives plain floats, so an
+    edited value is formatted the MPC's way again.
+    """
+    __slots__ = ("text",)
+
+    def __new__(cls, text: str):
+        value = super().__new__(cls, text)
+        value.text = text
+        return value
+
+    def __reduce__(self):
+        return SourceFloat, (self.text,)
+
+
+def _load_float(dump: Callable) -> Callable:
+    # the same few float texts recur all over a file, format each one only once
+    @functools.lru_cache(maxsize=4096)
+    def load(text: str) -> float:
+        value = float(text)
+        if dump(value) == text:
+            return value
+        return SourceFloat(text)
+    return load
+
+
+def dump_float(value) -> str:
+    """an element float: six decimals, as the MPC writes them"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, SourceFloat):
+        return value.text
+    return f"{value:.6f}"
+
+
+def dump_attribute_float(value) -> str:
+    """an attribute float: repr, as the MPC writes them"""
+    if isinstance(value, SourceFloat):
+        return value.text
+    return dump_str(value)
+
+
+# (load, dump) per field type; a float read in another format than the MPC's is written back as read
+CONVERTERS = {
+    str: (dump_str, dump_str),
+    int: (_typed(int), dump_str),
+    float: (_typed(_load_float(dump_float)), dump_float),
+    bool: (_typed(_load_bool), dump_bool),
+}
+ATTRIBUTE_CONVERTERS = {**CONVERTERS, float: (_typed(_load_float(dump_attribute_float)), dump_attribute_float)}
+
+
+@dataclass
+class FieldSchema:
+    name: str
+    # the tag, or the attribute name for attributes
+    tag: str
+    kind: str
+    load: Callable = None
+    dump: Callable = None
+    # the XMLLoadable class of objects and collection items
+    cls: type = None
+    # shared default items of a sparse collection, see sparse.py
+    sparse: object = None
+
+
+def tag_name_for(field_name: str) -> str:
+    if field_name in PROPER_TAG_NAMES:
+        return PROPER_TAG_NAMES[field_name]
+    return "".join(f.capitalize() for f in field_name.split("_"))
+
+
+def attribute_name_for(tag_name: str, field_name: str) -> str:
+    """the attribute a field is stored in, None if it is a child element"""
+    if field_name == "program_type":
+        assert tag_name == "Program"
+        return "type"
+    elif field_name == "number":
+        return "number"
+    elif field_name == "lfo_num":
+        assert tag_name == "LFO"
+        return "LfoNum"
+    elif tag_name == "DrumPadEffect":
+        assert field_name in ("num", "parameter", "type")
+        return field_name.capitalize()
+    return None
+
+
+def compile_schema(cls) -> list[FieldSchema]:
+    """the FieldSchema of every field of an XMLLoadable dataclass, in field order"""
+    schema = []
+    for f in fields(cls):
+        attribute = attribute_name_for(cls.tag_name, f.name)
+        if attribute is not None:
+            load, dump = ATTRIBUTE_CONVERTERS.get(f.type, ATTRIBUTE_CONVERTERS[str])
+            schema.append(FieldSchema(f.name, attribute, ATTRIBUTE, load, dump))
+        elif f.name == "program_pads":
+            schema.append(FieldSchema(f.name, PROGRAMPADS_TAG, PROGRAM_PADS, load_program_pads, dump_program_pads))
+        elif typing.get_origin(f.type) is list:
+            (item_cls,) = typing.get_args(f.type)
+            schema.append(
+                FieldSchema(f.name, tag_name_for(f.name), COLLECTION, cls=item_cls, sparse=f.metadata.get("sparse"))
+            )
+        elif hasattr(f.type, "tag_name"):
+            schema.append(FieldSchema(f.name, tag_name_for(f.name), OBJECT, cls=f.type))
+        else:
+            load, dump = CONVERTERS.get(f.type, CONVERTERS[str])
+            schema.append(FieldSchema(f.name, tag_name_for(f.name), TEXT, load, dump))
+    return schema
+
+
+def load_program_pads(text: str) -> ProgramPads:
+    return ProgramPads(text)
+
+
+def dump_program_pads(value) -> str:
+    if isinstance(value, ProgramPads):
+        return value.text
+    if isinstance(value, str):
+        # plain JSON text, e.g. assigned by a caller, goes out as it is
+        return value
+    import json
+    return json.dumps(value, indent=4)
@@ -0,0 +1,179 @@
+"""sparse collections for the mostly-default lists of an XPM program
+
+A drum program always holds 128 instruments of 4 layers and 8 pad effects
+each, plus 128-entry pad maps, and most of them are untouched defaults.
+A SparseList keeps only the items that differ from the default list of the
+field; the defaults themselves are prototypes shared by every program and
+are written from a cached rendering.
+
+Indexing hands out items for editing: reading an untouched slot that way
+stores a private copy of its prototype first, so an edit never leaks into
+other programs. Code that only reads uses peek() and iter_view() instead,
+which return the shared prototypes as they are and copy nothing; what they
+return must not be modified.
+"""
+import copy
+import io
+from collections.abc import MutableSequence
+from dataclasses import field
+from typing import Callable
+
+_prototypes = {}
+
+
+class Prototypes:
+    """the default items of a sparse field, built on first use and shared"""
+
+    def __init__(self, name: str, factory: Callable[[], list]):
+        self.name = name
+        self._factory = factory
+        self._items = None
+        self._rendered = {}
+        _prototypes[name] = self
+
+    @property
+    def items(self) -> list:
+        if self._items is None:
+            self._items = self._factory()
+        return self._items
+
+    def rendered(self, idx: int, level: int) -> str:
+        """the XML of the default item at idx, indented for level"""
+        key = (idx, level)
+        text = self._rendered.get(key)
+        if text is None:
+            buf = io.StringIO()
+            self.items[idx].write_xml_element(buf, level)
+            text = self._rendered[key] = buf.getvalue()
+        return text
+
+    def __reduce__(self):
+        # pickled by name, the prototypes are part of the code
+        return _prototypes_by_name, (self.name,)
+
+
+def _prototypes_by_name(name: str) -> Prototypes:
+    return _prototypes[name]
+
+
+class SparseList(MutableSequence):
+    __slots__ = ("_prototypes", "_length", "_items")
+
+    def __init__(self, prototypes: Prototypes, length: int = None, items: dict = None):
+        self._prototypes = prototypes
+        self._length = len(prototypes.items) if length is None else length
+        # index -> item, for the items that are not (or no longer) shared defaults
+        self._items = items or {}
+
+    @classmethod
+    def from_list(cls, prototypes: Prototypes, items: list):
+        """a SparseList of items, dropping those equal to their default"""
+        defaults = prototypes.items
+        stored = {
+            idx: item for idx, item in enumerate(items)
+            if idx >= len(defaults) or item != defaults[idx]
+        }
+        return cls(prototypes, len(items), stored)
+
+    def entries(self):
+        """(index, stored item or None for an untouched default), without copying anything"""
+        for idx in range(self._length):
+            yield idx, self._items.get(idx)
+
+    def peek(self, idx: int):
+        """the item at idx for reading only, an untouched default is the shared prototype"""
+        idx = self._index(idx)
+        item = self._items.get(idx)
+        return self._prototypes.items[idx] if item is None else item
+
+    def iter_view(self):
+        """every item for reading only, see peek()"""
+        for idx in range(self._length):
+            yield self.peek(idx)
+
+    def compact(self):
+        """drop stored items that are equal to their default again"""
+        defaults = self._prototypes.items
+        for idx in [i for i, item in self._items.items() if i < len(defaults) and item == defaults[i]]:
+            del self._items[idx]
+
+    def write_xml(self, fh, level: int):
+        """write every item, untouched defaults from the cached rendering"""
+        for idx, item in self.entries():
+            if item is None:
+                fh.write(self._prototypes.rendered(idx, level))
+            else:
+                item.write_xml_element(fh, level)
+
+    def _index(self, idx: int) -> int:
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError("SparseList index out of range")
+        return idx
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(self._length))]
+        idx = self._index(idx)
+        item = self._items.get(idx)
+        if item is None:
+            # copy on access: the caller may edit what it gets
+            item = self._items[idx] = copy.deepcopy(self._prototypes.items[idx])
+        return item
+
+    def __setitem__(self, idx, value):
+        if isinstance(idx, slice):
+            items = list(self)
+            items[idx] = value
+            self._reset(items)
+            return
+        self._items[self._index(idx)] = value
+
+    def __delitem__(self, idx):
+        items = list(self)
+        del items[idx]
+        self._reset(items)
+
+    def insert(self, idx, value):
+        items = list(self)
+        items.insert(idx, value)
+        self._reset(items)
+
+    def _reset(self, items: list):
+        # indices moved, every item is now stored explicitly
+        self._length = len(items)
+        self._items = dict(enumerate(items))
+
+    def __eq__(self, other):
+        if isinstance(other, SparseList):
+            return len(self) == len(other) and all(
+                self.peek(i) == other.peek(i) for i in range(self._length)
+            )
+        if isinstance(other, list):
+            return len(self) == len(other) and all(self.peek(i) == o for i, o in enumerate(other))
+        return NotImplemented
+
+    def __repr__(self):
+        return f"SparseList({len(self._items)}/{self._length} stored)"
+
+    def __getstate__(self):
+        return self._prototypes, self._length, self._items
+
+    def __setstate__(self, state):
+        self._prototypes, self._length, self._items = state
+
+
+def iter_view(items):
+    """the items of any XPM collection for reading only, without copying shared defaults"""
+    view = getattr(items, "iter_view", None)
+    return iter(items) if view is None else view()
+
+
+def sparse_field(name: str, factory: Callable[[], list]):
+    """a dataclass list field held as a SparseList over the items of factory()"""
+    prototypes = Prototypes(name, factory)
+    return field(default_factory=lambda: SparseList(prototypes), metadata={"sparse": prototypes})
@@ -1,13 +1,66 @@
-from .akptoxpm import AkaiAKPToXPM
-
+import logging
 import sys
 
 def halp():
     print('Usage: akptoxpm <to_xpm|to_akp> <akp_file> <xpm_file>')
+    print('       akptoxpm batch [--dedup-samples] <akp_dir> <xpm_dir> [jobs]')
+    print('       akptoxpm validate <dir> [report.jsonl] [jobs]')
+    print('       akptoxpm catalog <db> scan <dir> [jobs]')
+    print('       akptoxpm catalog <db> sample <sample name>')
+    print('       akptoxpm catalog <db> programs <name> [min keygroups]')
 
 action = None
 f = None
+if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+    from .batch import BatchConverter
+    logging.basicConfig(level=logging.INFO)
+    args = [a for a in sys.argv[2:] if a != '--dedup-samples']
+    try:
+        jobs = int(args[2]) if len(args) > 2 else None
+        b = BatchConverter(args[0], args[1], jobs, dedup_samples='--dedup-samples' in sys.argv)
+    except Exception:
+        halp()
+        sys.exit(1)
+    stats = b.run()
+    sys.exit(1 if stats["error"] else 0)
+if len(sys.argv) > 1 and sys.argv[1] == 'validate':
+    from .validate import validate_tree
+    logging.basicConfig(level=logging.INFO)
+    try:
+        root = sys.argv[2]
+        jobs = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    except Exception:
+        halp()
+        sys.exit(1)
+    if len(sys.argv) > 3 and sys.argv[3] != '-':
+        with open(sys.argv[3], 'w', encoding='utf-8') as report:
+            stats = validate_tree(root, report, jobs)
+    else:
+        stats = validate_tree(root, sys.stdout, jobs)
+    sys.exit(1 if stats["invalid"] else 0)
+if len(sys.argv) > 1 and sys.argv[1] == 'catalog':
+    from .catalog import Catalog
+    logging.basicConfig(level=logging.INFO)
+    try:
+        db, command, arg = sys.argv[2:5]
+        extra = int(sys.argv[5]) if len(sys.argv) > 5 else None
+        assert command in ('scan', 'sample', 'programs')
+    except Exception:
+        halp()
+        sys.exit(1)
+    with Catalog(db) as catalog:
+        if command == 'scan':
+            stats = catalog.scan(arg, extra)
+            sys.exit(1 if stats["errors"] else 0)
+        elif command == 'sample':
+            rows = catalog.programs_using_sample(arg)
+        else:
+            rows = catalog.find_programs(name=arg, min_keygroups=extra)
+    for row in rows:
+        print("\t".join(str(v) for v in row))
+    sys.exit(0)
 try:
+    from .akptoxpm import AkaiAKPToXPM
     action = sys.argv[1]
     f = AkaiAKPToXPM(sys.argv[2], sys.argv[3])
 except Exception:
@@ -0,0 +1,73 @@
+"""asyncio bulk loading of AKP, S1000/S3000 and XPM programs
+
+On network storage the latency of every single read dominates, so
+load_many keeps up to `concurrency` files in flight: their bytes are read on
+a thread pool, then parsed from memory on an executor, and every result is
+handed out as soon as it is ready.
+
+    async for path, program, error in load_many(paths, concurrency=64):
+        ...
+"""
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from .cache import loader_for_path
+
+DEFAULT_CONCURRENCY = 32
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        return fh.read()
+
+
+def parse_bytes(path: str, data: bytes):
+    """parse a program from its file contents, picking the parser from the name"""
+    return loader_for_path(path)(path, data)
+
+
+async def load_one(path: str, read_executor: Executor, parse_executor: Executor = None):
+    """(path, program, error) for a single file; error is a string, as in batch.py"""
+    loop = asyncio.get_running_loop()
+    try:
+        data = await loop.run_in_executor(read_executor, read_file, path)
+        program = await loop.run_in_executor(parse_executor, parse_bytes, path, data)
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+    return path, program, None
+
+
+async def load_many(paths, concurrency: int = DEFAULT_CONCURRENCY, executor: Executor = None):
+    """async iterator of (path, program, error) in completion order
+
+    at most `concurrency` files are being read or parsed at any time, so
+    memory stays bounded however many paths there are. Parsing runs on
+    executor, the loop's default (a thread pool) unless given; pass a
+    ProcessPoolExecutor to parse on every core.
+    """
+    paths = iter(paths)
+    pending = set()
+    # not a with block: its shutdown(wait=True) would block the loop on an early break or a cancel
+    reader = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load_many")
+
+    def start_next() -> bool:
+        path = next(paths, None)
+        if path is None:
+            return False
+        pending.add(asyncio.ensure_future(load_one(path, reader, executor)))
+        return True
+
+    try:
+        while len(pending) < concurrency and start_next():
+            pass
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                start_next()
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        # reads already running finish in the background, queued ones are dropped
+        reader.shutdown(wait=False, cancel_futures=True)
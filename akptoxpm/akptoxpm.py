@@ -1,6 +1,14 @@
 from akaiakp import AkaiAKPFile
-from akaixpm import AkaiXPMMPCVObject
+from akaixpm import (
+    AkaiXPMFile,
+    AkaiXPMMPCVObject,
+    AkaiXPMKeygroupProgram,
+    AkaiXPMKeygroupInstrument,
+    AkaiXPMInstrumentLayer,
+)
 from dataclasses import dataclass
+import os
+
 
 @dataclass
 class AkaiUnifiedRepresentation:
@@ -10,13 +18,46 @@ class AkaiUnifiedRepresentation:
     match is not perfect but we aim to get a good-enough fit
     """
 
+
+def zone_sample_name(zone) -> str:
+    """the sample name of an AKP zone, empty if no sample is assigned"""
+    return bytes(zone.sample_name[: zone.sample_char_len]).rstrip(b"\0").decode("ascii", "replace")
+
+
 class AkaiAKPToXPM:
-    def __init__(self, akp_file=None, xpm_file=None):
+    def __init__(self, akp_file=None, xpm_file=None, sample_store=None, sample_index=None):
         self._akp_file = akp_file
         self._xpm_file = xpm_file
+        self._sample_store = sample_store
+        # resolves sample names across a whole library, see sampleindex.py
+        self._sample_index = sample_index
+        self._mpcvobj = None
 
     def parse_akp(self):
         """parse the AKP file to prepare for writing and set it to the unified representation"""
+        with AkaiAKPFile(self._akp_file, use_mmap=True) as akp:
+            akp.list_sections()
+            instruments = AkaiXPMKeygroupInstrument.default_list(128)
+            for instrument, kg in zip(instruments, akp.keygroups):
+                instrument.low_note = kg.kloc.low_note
+                instrument.high_note = kg.kloc.high_note
+                instrument.tune_coarse = kg.kloc.semitone_tune
+                instrument.tune_fine = kg.kloc.fine_tune
+                for layer, zone in zip(instrument.layers, kg.zones):
+                    layer.sample_name = zone_sample_name(zone)
+                    layer.vel_start = zone.low_velocity
+                    layer.vel_end = zone.high_velocity
+                    layer.tune_coarse = zone.semitone_tune
+                    layer.tune_fine = zone.fine_tune
+                    # -50 (L50) -> 50 (R50) to 0.0 -> 1.0
+                    layer.pan = 0.5 + zone.pan_balance / 100
+                    layer.key_track = bool(zone.keyboard_track)
+            program = AkaiXPMKeygroupProgram(
+                program_name=os.path.splitext(os.path.basename(self._akp_file))[0],
+                instruments=instruments,
+                keygroup_num_keygroups=len(akp.keygroups),
+            )
+        self._mpcvobj = AkaiXPMMPCVObject(program=program)
 
     def parse_xpm(self):
         """parse the XPM file to prepare for writing and set it to the unified representation"""
@@ -24,5 +65,35 @@ class AkaiAKPToXPM:
     def write_akp(self):
         """write the unified representation to the AKP file"""
 
+    def link_samples(self):
+        """put the samples of every layer next to the XPM file through the sample store
+
+        samples are looked up by name in the sample index when there is one,
+        else next to the AKP file; SampleFile is set to the linked file, layers
+        whose sample is missing are left as they are.
+        """
+        from akaixpm.sparse import iter_view
+        from .samples import find_sample
+        akp_dir = os.path.dirname(self._akp_file)
+        xpm_dir = os.path.dirname(self._xpm_file)
+        instruments = self._mpcvobj.program.instruments
+        # look through shared defaults without copying them, only layers with a sample get edited
+        for i, instrument in enumerate(iter_view(instruments)):
+            for j, layer in enumerate(iter_view(instrument.layers)):
+                if not layer.sample_name:
+                    continue
+                if self._sample_index is not None:
+                    src = self._sample_index.resolve(layer.sample_name, near=akp_dir)
+                else:
+                    src = find_sample(akp_dir, layer.sample_name)
+                if src is None:
+                    continue
+                # another sample of the same name may already sit there, place() then picks a new name
+                placed = self._sample_store.place(src, os.path.join(xpm_dir, layer.sample_name + ".wav"))
+                instruments[i].layers[j].sample_file = os.path.basename(placed)
+
     def write_xpm(self):
         """write the unified representation to the XPM file"""
+        if self._sample_store is not None:
+            self.link_samples()
+        AkaiXPMFile.from_mpcvobject(self._mpcvobj).write(self._xpm_file)
@@ -0,0 +1,146 @@
+"""akptoxpm batch mode: convert whole directory trees of AKP files over a process pool
+
+Every finished conversion is appended to a JSON-lines journal in the output
+directory, so an interrupted run picks up where it stopped.
+"""
+import json
+import logging
+import os
+import time
+from multiprocessing import Pool
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_NAME = ".akptoxpm-journal.jsonl"
+SAMPLE_STORE_NAME = ".samples"
+PROGRESS_INTERVAL = 5.0
+
+
+def find_akp_files(root: str) -> list[str]:
+    """every .akp file below root, in a stable order"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if fn.lower().endswith(".akp"):
+                found.append(os.path.join(dirpath, fn))
+    return found
+
+
+_sample_indexes = {}
+
+
+def sample_index(root: str):
+    """the sample index of root, loaded once per worker from the one the parent cached"""
+    index = _sample_indexes.get(root)
+    if index is None:
+        from .sampleindex import SampleIndex
+        index = _sample_indexes[root] = SampleIndex.cached(root)
+    return index
+
+
+def convert_one(job: tuple[str, str, str, str]) -> tuple[str, str, str]:
+    """convert a single (akp, xpm, sample store root, sample library root) job, returning (akp, status, error)
+
+    runs in the pool workers; the XPM is written under a temporary name and
+    renamed once complete so an interrupted run never leaves half a file.
+    The temporary name keeps the suffix so .xpm.gz outputs get compressed.
+    """
+    # the conversion stack is only needed in the workers
+    from .akptoxpm import AkaiAKPToXPM
+    from .samples import SampleStore
+    src, dst, store_root, library_root = job
+    tmp = os.path.join(os.path.dirname(dst), ".part-" + os.path.basename(dst))
+    try:
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        store = SampleStore(store_root) if store_root else None
+        index = sample_index(library_root) if library_root else None
+        conv = AkaiAKPToXPM(src, tmp, sample_store=store, sample_index=index)
+        conv.parse_akp()
+        conv.write_xpm()
+        os.replace(tmp, dst)
+    except Exception as e:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        return src, "error", f"{type(e).__name__}: {e}"
+    return src, "ok", None
+
+
+class BatchConverter:
+    def __init__(
+        self,
+        akp_root: str,
+        xpm_root: str,
+        jobs: int = None,
+        journal: str = None,
+        xpm_suffix: str = ".xpm",
+        dedup_samples: bool = False,
+    ):
+        self._akp_root = akp_root
+        self._xpm_root = xpm_root
+        self._xpm_suffix = xpm_suffix
+        self._jobs = jobs or os.cpu_count()
+        self._journal = journal or os.path.join(xpm_root, JOURNAL_NAME)
+        # samples shared between programs are stored once and linked into place
+        self._sample_store = os.path.join(xpm_root, SAMPLE_STORE_NAME) if dedup_samples else None
+
+    def xpm_path(self, akp_path: str) -> str:
+        rel = os.path.relpath(akp_path, self._akp_root)
+        return os.path.join(self._xpm_root, os.path.splitext(rel)[0] + self._xpm_suffix)
+
+    def done(self) -> set[str]:
+        """the AKP files the journal records as successfully converted"""
+        done = set()
+        if not os.path.exists(self._journal):
+            return done
+        with open(self._journal, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a torn last line from an interrupted run
+                    continue
+                if entry["status"] == "ok":
+                    done.add(entry["akp"])
+        return done
+
+    def pending(self) -> list[tuple[str, str, str, str]]:
+        done = self.done()
+        # samples are resolved across the whole AKP tree when they are linked
+        library_root = self._akp_root if self._sample_store else None
+        return [
+            (p, self.xpm_path(p), self._sample_store, library_root)
+            for p in find_akp_files(self._akp_root) if p not in done
+        ]
+
+    def run(self) -> dict:
+        jobs = self.pending()
+        stats = {"ok": 0, "error": 0, "total": len(jobs)}
+        logger.info("converting %s AKP files with %s workers", len(jobs), self._jobs)
+        if not jobs:
+            return stats
+        os.makedirs(self._xpm_root, exist_ok=True)
+        if self._sample_store:
+            # listed and cached once here, the workers only check it is current
+            sample_index(self._akp_root)
+        start = last_report = time.monotonic()
+        chunksize = max(1, min(32, len(jobs) // (self._jobs * 4)))
+        with open(self._journal, "a", encoding="utf-8") as journal, Pool(self._jobs) as pool:
+            for src, status, error in pool.imap_unordered(convert_one, jobs, chunksize):
+                stats[status] += 1
+                journal.write(json.dumps({"akp": src, "status": status, "error": error}) + "\n")
+                journal.flush()
+                if error:
+                    logger.error("%s: %s", src, error)
+                now = time.monotonic()
+                if now - last_report >= PROGRESS_INTERVAL:
+                    last_report = now
+                    done = stats["ok"] + stats["error"]
+                    logger.info("%s/%s done, %.1f files/s", done, len(jobs), done / (now - start))
+        elapsed = time.monotonic() - start
+        stats["seconds"] = elapsed
+        logger.info(
+            "converted %s, failed %s in %.1fs (%.1f files/s)",
+            stats["ok"], stats["error"], elapsed, len(jobs) / elapsed,
+        )
+        return stats
@@ -0,0 +1,236 @@
+"""opt-in on-disk cache of parsed AKP, S1000/S3000 and XPM programs
+
+Entries are pickles of the parsed objects, keyed on the source file's path,
+size and mtime_ns plus a digest of the parser sources, so an edited file or
+an upgraded library never gets a stale object back.
+
+Entries are written under a unique temporary name and renamed into place,
+which keeps concurrent writers, processes or threads, from ever exposing
+half an entry. A hit bumps the entry's mtime. Each ProgramCache keeps a
+running total of the cache size, seeded from one listing of the directory;
+once it passes max_bytes, or every RESCAN_INTERVAL puts to pick up what
+other processes wrote, the directory is listed again and the least
+recently used entries are evicted down to LOW_WATER of it.
+
+Loading an entry unpickles it, and unpickling runs whatever code the
+pickle names: only use a cache directory that nobody else can write to.
+The directories it creates are private to the user.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_ENV = "AKAI_PROGRAM_CACHE"
+ENTRY_SUFFIX = ".pickle"
+# puts between listings of the cache directory when the running size stays under max_bytes
+RESCAN_INTERVAL = 256
+# eviction goes below max_bytes so the next puts do not list the directory again right away
+LOW_WATER = 0.9
+
+# the modules whose classes end up in the cache
+_PARSER_MODULES = (
+    "akaiakp.akaiakp",
+    "akaiakp.data_maps",
+    "akairaw.akairaw",
+    "akairaw.arrays",
+    "akaixpm.akaixpm",
+    "akaixpm.pads",
+    "akaixpm.raw",
+    "akaixpm.schema",
+    "akaixpm.sparse",
+)
+_library_version = None
+
+
+def library_version() -> str:
+    """digest of the parser sources, any change to them invalidates the cache"""
+    global _library_version
+    if _library_version is None:
+        import importlib
+        h = hashlib.sha256()
+        for name in _PARSER_MODULES:
+            with open(importlib.import_module(name).__file__, "rb") as fh:
+                h.update(fh.read())
+        _library_version = h.hexdigest()[:16]
+    return _library_version
+
+
+# the loaders read path themselves unless its contents are passed as data
+def load_akp(path: str, data: bytes = None):
+    from akaiakp import AkaiAKPFile
+    akp = AkaiAKPFile(path, data=data)
+    akp.list_sections()
+    return akp
+
+
+def load_raw_program(path: str, data: bytes = None):
+    from akairaw import AkaiRAWProgramFile
+    prog = AkaiRAWProgramFile(path, data=data)
+    prog.parse_program()
+    return prog
+
+
+def load_xpm(path: str, data: bytes = None):
+    from akaixpm import AkaiXPMFile
+    return AkaiXPMFile(path, data=data)
+
+
+LOADERS = {
+    ".akp": load_akp,
+    ".p": load_raw_program,
+    ".xpm": load_xpm,
+}
+
+
+def loader_for_path(path: str):
+    lower = path.lower()
+    for suffix in (".gz", ".gzip", ".zst", ".zstd"):
+        if lower.endswith(suffix):
+            lower = lower[: -len(suffix)]
+    loader = LOADERS.get(os.path.splitext(lower)[1])
+    if loader is None:
+        raise ValueError(f"no parser for {path}")
+    return loader
+
+
+def default_cache_dir() -> str:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "akai-programs")
+
+
+class ProgramCache:
+    def __init__(self, root: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self._root = root or default_cache_dir()
+        self._max_bytes = max_bytes
+        os.makedirs(self._root, mode=0o700, exist_ok=True)
+        self._lock = threading.Lock()
+        # running total of the entry sizes, None until the directory is listed
+        self._size = None
+        self._puts = 0
+
+    @classmethod
+    def from_environment(cls):
+        """the cache named by $AKAI_PROGRAM_CACHE, or None when it is unset"""
+        root = os.environ.get(CACHE_ENV)
+        return cls(root) if root else None
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    def key(self, path: str) -> tuple:
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns, library_version())
+
+    def entry_path(self, key: tuple) -> str:
+        return os.path.join(self._root, hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + ENTRY_SUFFIX)
+
+    def get(self, path: str):
+        """the cached object for path, or None"""
+        key = self.key(path)
+        entry = self.entry_path(key)
+        try:
+            with open(entry, "rb") as fh:
+                stored_key, obj = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # torn or foreign entry, drop it
+            logger.warning("dropping unreadable cache entry %s: %s", entry, e)
+            self._unlink(entry)
+            return None
+        if stored_key != key:
+            return None
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return obj
+
+    def put(self, path: str, obj, key: tuple = None):
+        key = key or self.key(path)
+        entry = self.entry_path(key)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=ENTRY_SUFFIX, dir=self._root)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                pickle.dump((key, obj), fh, protocol=pickle.HIGHEST_PROTOCOL)
+                size = fh.tell()
+            try:
+                replaced = os.stat(entry).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp, entry)
+        finally:
+            self._unlink(tmp)
+        with self._lock:
+            self._puts += 1
+            if self._size is not None:
+                self._size += size - replaced
+            due = self._size is None or self._size > self._max_bytes or self._puts % RESCAN_INTERVAL == 0
+        if due:
+            self.evict()
+
+    def load(self, path: str, loader=None):
+        """the parsed program at path, from the cache when it is unchanged"""
+        obj = self.get(path)
+        if obj is not None:
+            return obj
+        # take the key before parsing so a file changed meanwhile is not cached as new
+        key = self.key(path)
+        obj = (loader or loader_for_path(path))(path)
+        self.put(path, obj, key)
+        return obj
+
+    def evict(self):
+        """remove least recently used entries once the cache is past max_bytes, down to LOW_WATER of it"""
+        entries = []
+        total = 0
+        with os.scandir(self._root) as it:
+            for de in it:
+                if not de.name.endswith(ENTRY_SUFFIX) or de.name.startswith(".tmp-"):
+                    continue
+                try:
+                    st = de.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, de.path))
+                total += st.st_size
+        if total > self._max_bytes:
+            target = int(self._max_bytes * LOW_WATER)
+            entries.sort()
+            for _, size, entry in entries:
+                if total <= target:
+                    break
+                self._unlink(entry)
+                total -= size
+        with self._lock:
+            self._size = total
+
+    def clear(self):
+        with os.scandir(self._root) as it:
+            for de in it:
+                if de.name.endswith(ENTRY_SUFFIX) and not de.name.startswith(".tmp-"):
+                    self._unlink(de.path)
+        with self._lock:
+            self._size = 0
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def load_program(path: str, cache: ProgramCache = None):
+    """parse the AKP, .p or XPM at path, through the cache if one is given or configured"""
+    cache = cache or ProgramCache.from_environment()
+    if cache is None:
+        return loader_for_path(path)(path)
+    return cache.load(path)
@@ -0,0 +1,263 @@
+"""SQLite catalog of the programs, keygroups and sample references in a library
+
+scan() walks a library of AKP, S1000/S3000 and XPM programs, parses the
+new and changed files over a process pool and records for every program its
+name, its keygroups' key ranges and, per zone or layer, the sample name and
+velocity range. Files whose size and mtime are unchanged are not parsed
+again, files that are gone are dropped. Questions about the library are then
+plain indexed queries:
+
+    catalog = Catalog("library.sqlite")
+    catalog.scan("/samples")
+    catalog.programs_using_sample("ME PA G3  SA")
+    catalog.find_programs(name="bass", min_keygroups=9)
+"""
+import logging
+import os
+import sqlite3
+import time
+from multiprocessing import Pool
+
+from .cache import loader_for_path
+from .validate import format_for_path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    format TEXT,
+    program_name TEXT COLLATE NOCASE,
+    keygroup_count INTEGER,
+    error TEXT
+);
+CREATE TABLE keygroups (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    keygroup INTEGER NOT NULL,
+    low_note INTEGER,
+    high_note INTEGER,
+    PRIMARY KEY (file_id, keygroup)
+);
+CREATE TABLE zones (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    keygroup INTEGER NOT NULL,
+    zone INTEGER NOT NULL,
+    sample_name TEXT NOT NULL COLLATE NOCASE,
+    low_velocity INTEGER,
+    high_velocity INTEGER
+);
+CREATE INDEX files_program_name ON files(program_name);
+CREATE INDEX files_keygroup_count ON files(keygroup_count);
+CREATE INDEX zones_sample_name ON zones(sample_name);
+CREATE INDEX zones_file_id ON zones(file_id);
+"""
+
+
+def akp_keygroups(akp) -> list:
+    from .akptoxpm import zone_sample_name
+    return [
+        (kg.kloc.low_note, kg.kloc.high_note,
+         [(zone_sample_name(zone), zone.low_velocity, zone.high_velocity) for zone in kg.zones])
+        for kg in akp.keygroups
+    ]
+
+
+def raw_program_keygroups(prog) -> list:
+    # the Akai charset is decoded, names are padded with spaces
+    return [
+        (kg.keyrange_low, kg.keyrange_high,
+         [(vlz.ascii_sample_name, vlz.velocity_range_low, vlz.velocity_range_high) for vlz in kg.velocity_zones])
+        for kg in prog.keygroups
+    ]
+
+
+def xpm_keygroups(xpm) -> list:
+    from akaixpm.sparse import iter_view
+    keygroups = []
+    # read-only views, the default instruments and layers are not copied
+    for instrument in iter_view(xpm.program.instruments):
+        layers = [
+            (layer.sample_name, layer.vel_start, layer.vel_end)
+            for layer in iter_view(instrument.layers) if layer.sample_name
+        ]
+        # drum programs always hold 128 instruments, only the ones with samples count
+        if layers:
+            keygroups.append((instrument.low_note, instrument.high_note, layers))
+    return keygroups
+
+
+def program_name(path: str, program) -> str:
+    from akairaw import AkaiRAWProgramFile
+    from akaixpm import AkaiXPMFile
+    if isinstance(program, AkaiXPMFile):
+        return program.program.program_name
+    elif isinstance(program, AkaiRAWProgramFile):
+        return program.program_name.rstrip()
+    # AKP programs are named after their file
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+KEYGROUP_EXTRACTORS = {
+    "akp": akp_keygroups,
+    "s3000": raw_program_keygroups,
+    "xpm": xpm_keygroups,
+}
+
+
+def extract(job: tuple[str, int, int]) -> dict:
+    """the catalog record of a single (path, size, mtime_ns) job; runs in the pool workers"""
+    path, size, mtime_ns = job
+    fmt = format_for_path(path)
+    record = {"path": path, "size": size, "mtime_ns": mtime_ns, "format": fmt,
+              "program_name": None, "keygroups": [], "error": None}
+    try:
+        program = loader_for_path(path)(path)
+        record["program_name"] = program_name(path, program)
+        record["keygroups"] = [
+            (low, high, [(name.rstrip(), vlow, vhigh) for name, vlow, vhigh in zones if name.strip()])
+            for low, high, zones in KEYGROUP_EXTRACTORS[fmt](program)
+        ]
+        close = getattr(program, "close", None)
+        if close is not None:
+            close()
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    return record
+
+
+class Catalog:
+    def __init__(self, path: str):
+        self._path = path
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._db.execute("PRAGMA journal_mode = WAL")
+        if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self._create()
+
+    def _create(self):
+        with self._db:
+            for table in ("zones", "keygroups", "files"):
+                self._db.execute(f"DROP TABLE IF EXISTS {table}")
+            self._db.executescript(SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def stale(self, root: str) -> tuple[list[tuple[str, int, int]], list[str]]:
+        """(jobs for the new and changed programs below root, cataloged paths that are gone)"""
+        root = os.path.abspath(root)
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in self._db.execute("SELECT path, size, mtime_ns FROM files")
+        }
+        jobs = []
+        seen = set()
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for fn in sorted(filenames):
+                if format_for_path(fn) is None:
+                    continue
+                path = os.path.join(dirpath, fn)
+                st = os.stat(path)
+                seen.add(path)
+                if known.get(path) != (st.st_size, st.st_mtime_ns):
+                    jobs.append((path, st.st_size, st.st_mtime_ns))
+        prefix = os.path.join(root, "")
+        gone = [path for path in known if path.startswith(prefix) and path not in seen]
+        return jobs, gone
+
+    def scan(self, root: str, jobs: int = None) -> dict:
+        """bring the catalog up to date with the programs below root"""
+        pending, gone = self.stale(root)
+        workers = jobs or os.cpu_count()
+        stats = {"parsed": len(pending), "removed": len(gone), "errors": 0}
+        start = time.monotonic()
+        with self._db:
+            self._db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in gone])
+        if pending:
+            chunksize = max(1, min(64, len(pending) // (workers * 4)))
+            with Pool(workers) as pool:
+                for record in pool.imap_unordered(extract, pending, chunksize):
+                    if record["error"]:
+                        stats["errors"] += 1
+                        logger.error("%s: %s", record["path"], record["error"])
+                    self._store(record)
+            self._db.commit()
+        stats["seconds"] = time.monotonic() - start
+        logger.info(
+            "cataloged %s programs, removed %s, %s errors in %.1fs",
+            stats["parsed"], stats["removed"], stats["errors"], stats["seconds"],
+        )
+        return stats
+
+    def _store(self, record: dict):
+        db = self._db
+        db.execute("DELETE FROM files WHERE path = ?", (record["path"],))
+        cur = db.execute(
+            "INSERT INTO files (path, size, mtime_ns, format, program_name, keygroup_count, error)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (record["path"], record["size"], record["mtime_ns"], record["format"],
+             record["program_name"], len(record["keygroups"]), record["error"]),
+        )
+        file_id = cur.lastrowid
+        db.executemany(
+            "INSERT INTO keygroups (file_id, keygroup, low_note, high_note) VALUES (?, ?, ?, ?)",
+            [(file_id, idx, low, high) for idx, (low, high, _) in enumerate(record["keygroups"])],
+        )
+        db.executemany(
+            "INSERT INTO zones (file_id, keygroup, zone, sample_name, low_velocity, high_velocity)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (file_id, idx, zone, name, vlow, vhigh)
+                for idx, (_, _, zones) in enumerate(record["keygroups"])
+                for zone, (name, vlow, vhigh) in enumerate(zones)
+            ],
+        )
+
+    def programs_using_sample(self, sample_name: str) -> list[tuple[str, str]]:
+        """(path, program name) of every program with a zone playing sample_name, ignoring case"""
+        return self._db.execute(
+            "SELECT DISTINCT f.path, f.program_name FROM zones z JOIN files f ON f.id = z.file_id"
+            " WHERE z.sample_name = ? ORDER BY f.path",
+            (sample_name.rstrip(),),
+        ).fetchall()
+
+    def find_programs(self, name: str = None, min_keygroups: int = None, fmt: str = None) -> list[tuple]:
+        """(path, program name, keygroup count) of the programs whose name contains name"""
+        where = ["error IS NULL"]
+        args = []
+        if name is not None:
+            where.append("program_name LIKE ?")
+            args.append(f"%{name}%")
+        if min_keygroups is not None:
+            where.append("keygroup_count >= ?")
+            args.append(min_keygroups)
+        if fmt is not None:
+            where.append("format = ?")
+            args.append(fmt)
+        return self._db.execute(
+            "SELECT path, program_name, keygroup_count FROM files"
+            f" WHERE {' AND '.join(where)} ORDER BY path",
+            args,
+        ).fetchall()
+
+    def keygroups(self, path: str) -> list[tuple]:
+        """(keygroup, low note, high note, sample name, low velocity, high velocity) of a program"""
+        return self._db.execute(
+            "SELECT k.keygroup, k.low_note, k.high_note, z.sample_name, z.low_velocity, z.high_velocity"
+            " FROM files f JOIN keygroups k ON k.file_id = f.id"
+            " LEFT JOIN zones z ON z.file_id = f.id AND z.keygroup = k.keygroup"
+            " WHERE f.path = ? ORDER BY k.keygroup, z.zone",
+            (path,),
+        ).fetchall()
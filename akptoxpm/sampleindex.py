@@ -0,0 +1,214 @@
+"""index of the sample files below a library root, by normalized sample name
+
+AKP zones name their sample with up to 20 characters, S1000/S3000 velocity
+zones with 12 characters of the Akai charset, and neither name matches the
+file on disk exactly: case differs, names are padded, characters the Akai
+charset lacks were replaced by spaces, long file names were cut to 12
+characters and stereo samples carry a -L/-R suffix. SampleIndex lists the
+library once and files every .wav/.s sample under a normalized key, so each
+zone resolves with a dict lookup instead of a directory scan:
+
+    index = SampleIndex.cached("/samples")
+    index.resolve("MO PA G3  SA", near="/samples/ANAPAD")
+
+The index is pickled to the cache directory together with the mtime of every
+directory it listed. A later run only stats those directories and lists
+again the ones that changed, since adding, removing or renaming a file or a
+subdirectory changes the mtime of the directory holding it.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import re
+
+from akairaw.akairaw import AKAI_CHARS
+
+from .samples import SAMPLE_SUFFIXES
+
+logger = logging.getLogger(__name__)
+
+# bumped whenever the key or the pickled layout changes
+INDEX_VERSION = 2
+AKAI_NAME_LENGTH = 12
+
+# "PIANO C3-L", "PIANO C3 -R", "piano c3_l"; split off before the name is keyed,
+# so the '-' of the suffix never reaches the key while a '-' inside the name does
+_STEREO_SUFFIX = re.compile(r"\s*[-_]([LR])$", re.IGNORECASE)
+# everything outside the Akai charset ends up as a space on the sampler, and
+# runs of those and of padding spaces count as one
+_NOT_AKAI = re.compile("[^%s]+" % re.escape(AKAI_CHARS.replace(b" ", b"").decode("ascii")))
+
+
+def split_stereo(name: str) -> tuple[str, str]:
+    """(name without its -L/-R suffix, "L", "R" or None)"""
+    name = name.rstrip(" \0")
+    m = _STEREO_SUFFIX.search(name)
+    if m is None:
+        return name, None
+    return name[: m.start()], m.group(1).upper()
+
+
+def sample_key(name: str) -> str:
+    """name as the sampler shows it, with every run of padding and substitutes as one space"""
+    return _NOT_AKAI.sub(" ", name.upper()).strip()
+
+
+def _sample_suffix(fn: str) -> str:
+    lower = fn.lower()
+    for suffix in SAMPLE_SUFFIXES:
+        if lower.endswith(suffix):
+            return suffix
+    return None
+
+
+class SampleIndex:
+    def __init__(self, root: str):
+        self._root = os.path.abspath(root)
+        # directory -> (mtime_ns, sample file names, subdirectory names)
+        self._dirs = {}
+        # key -> side ("L", "R" or None) -> paths
+        self._index = {}
+        # keys of the names cut to AKAI_NAME_LENGTH characters
+        self._short = {}
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    def __len__(self):
+        return sum(len(files) for _, files, _ in self._dirs.values())
+
+    def scan(self) -> int:
+        """list the directories that are new or changed since the last scan
+
+        returns the number of directories listed or dropped, 0 when the index
+        was already up to date.
+        """
+        listed = 0
+        seen = set()
+        pending = [self._root]
+        while pending:
+            directory = pending.pop()
+            seen.add(directory)
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            entry = self._dirs.get(directory)
+            if entry is None or entry[0] != mtime_ns:
+                entry = self._dirs[directory] = self._list(directory, mtime_ns)
+                listed += 1
+            pending.extend(os.path.join(directory, d) for d in entry[2])
+        gone = self._dirs.keys() - seen
+        for directory in gone:
+            del self._dirs[directory]
+        if listed or gone:
+            self._build()
+        return listed + len(gone)
+
+    @staticmethod
+    def _list(directory: str, mtime_ns: int) -> tuple[int, list[str], list[str]]:
+        files = []
+        subdirs = []
+        with os.scandir(directory) as it:
+            for de in it:
+                if de.is_dir(follow_symlinks=False):
+                    subdirs.append(de.name)
+                elif _sample_suffix(de.name) is not None and de.is_file():
+                    files.append(de.name)
+        files.sort()
+        subdirs.sort()
+        return mtime_ns, files, subdirs
+
+    def _build(self):
+        index = {}
+        short = {}
+        for directory in sorted(self._dirs):
+            for fn in self._dirs[directory][1]:
+                path = os.path.join(directory, fn)
+                stem = fn[: -len(_sample_suffix(fn))]
+                base, side = split_stereo(stem)
+                index.setdefault(sample_key(base), {}).setdefault(side, []).append(path)
+                if len(stem) > AKAI_NAME_LENGTH:
+                    # named on a computer, the sampler only kept the first 12 characters
+                    cut, side = split_stereo(stem[:AKAI_NAME_LENGTH])
+                    short.setdefault(sample_key(cut), {}).setdefault(side, []).append(path)
+        for sides in (*index.values(), *short.values()):
+            for paths in sides.values():
+                # .wav before .s, as find_sample does
+                paths.sort(key=lambda p: SAMPLE_SUFFIXES.index(_sample_suffix(p)))
+        self._index = index
+        self._short = short
+
+    def _tiers(self, sample_name: str) -> list[list[str]]:
+        """the files that could hold sample_name, in groups from the best match down"""
+        base, side = split_stereo(sample_name)
+        key = sample_key(base)
+        tiers = []
+        for table in (self._index, self._short):
+            sides = table.get(key)
+            if not sides:
+                continue
+            tiers.append(sides.get(side, []))
+            if side is not None:
+                # one side of a sample exported as a single stereo file
+                tiers.append(sides.get(None, []))
+        return tiers
+
+    def candidates(self, sample_name: str) -> list[str]:
+        """every file that could hold sample_name, best matches first"""
+        return [path for tier in self._tiers(sample_name) for path in tier]
+
+    def resolve(self, sample_name: str, near: str = None) -> str:
+        """the file holding sample_name, preferring one in or below near; None if there is none"""
+        for found in self._tiers(sample_name):
+            if not found:
+                continue
+            if near is not None and len(found) > 1:
+                near = os.path.join(os.path.abspath(near), "")
+                # the same name in several programs' folders, take the closest one
+                return max(found, key=lambda p: len(os.path.commonprefix([near, p])))
+            return found[0]
+        return None
+
+    # persistence
+
+    @staticmethod
+    def cache_path(root: str, cache_dir: str = None) -> str:
+        from .cache import default_cache_dir
+        digest = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(cache_dir or default_cache_dir(), f"sample-index-{digest}.pickle")
+
+    @classmethod
+    def cached(cls, root: str, cache_dir: str = None) -> "SampleIndex":
+        """the index of root, brought up to date from the cache of an earlier run"""
+        path = cls.cache_path(root, cache_dir)
+        index = cls(root)
+        try:
+            with open(path, "rb") as fh:
+                version, stored_root, index._dirs, index._index, index._short = pickle.load(fh)
+            if version != INDEX_VERSION or stored_root != index._root:
+                index = cls(root)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("dropping unreadable sample index %s: %s", path, e)
+            index = cls(root)
+        if index.scan():
+            index.save(path)
+        return index
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(path), f".tmp-{os.getpid()}-{os.path.basename(path)}")
+        try:
+            with open(tmp, "wb") as fh:
+                pickle.dump(
+                    (INDEX_VERSION, self._root, self._dirs, self._index, self._short),
+                    fh, protocol=pickle.HIGHEST_PROTOCOL,
+                )
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
@@ -0,0 +1,208 @@
+"""content-addressed sample store shared by the programs of a converted library
+
+Akai CD libraries reuse the same sample in many programs. Every sample body
+is hashed and stored once under <root>/<digest[:2]>/<digest>.wav; each
+program directory then gets a hard link (or a reflink, or as a last resort
+a copy) to the stored object under the sample's own name, or under that name
+suffixed with the digest when a different sample already took it.
+
+Objects and links are created under temporary names and renamed into place,
+so several converter processes can share one store.
+"""
+import errno
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+
+# from linux/fs.h, clone a whole file on btrfs/xfs
+FICLONE = 0x40049409
+
+SAMPLE_SUFFIXES = (".wav", ".s")
+
+LINK_MODES = ("hardlink", "reflink", "copy")
+
+RIFF_HEADER = struct.Struct("<4sI4s")
+CHUNK_HEADER = struct.Struct("<4sI")
+FMT_CHUNK = struct.Struct("<HHIIHH")
+
+
+def _digest(sample_rate: int, channels: int, bits: int, pcm) -> str:
+    h = hashlib.sha256(struct.pack("<IHH", sample_rate, channels, bits))
+    h.update(pcm)
+    return h.hexdigest()
+
+
+def wav_digest(path: str) -> str:
+    with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        buf = memoryview(mm)
+        riff, _, wave = RIFF_HEADER.unpack_from(buf, 0)
+        if riff != b"RIFF" or wave != b"WAVE":
+            raise ValueError(f"{path} is not a WAV file")
+        offset = RIFF_HEADER.size
+        fmt = None
+        try:
+            while offset + CHUNK_HEADER.size <= len(buf):
+                name, length = CHUNK_HEADER.unpack_from(buf, offset)
+                offset += CHUNK_HEADER.size
+                if name == b"fmt ":
+                    _, channels, sample_rate, _, _, bits = FMT_CHUNK.unpack_from(buf, offset)
+                    fmt = (sample_rate, channels, bits)
+                elif name == b"data" and fmt is not None:
+                    return _digest(*fmt, buf[offset : offset + length])
+                # chunks are padded to an even length
+                offset += length + (length & 1)
+        finally:
+            buf.release()
+    raise ValueError(f"{path} has no sample data")
+
+
+def sample_digest(path: str) -> str:
+    """sha256 of a sample's format and PCM body
+
+    Headers are left out, so a WAV file and the raw .s sample it was exported
+    from, or two copies with different metadata chunks, share one digest.
+    """
+    if path.lower().endswith(".s"):
+        from akairaw import AkaiRAWSampleFile
+        with AkaiRAWSampleFile(path) as sample:
+            pcm = sample.pcm_bytes
+            try:
+                return _digest(sample.sample_rate, 1, 16, pcm)
+            finally:
+                pcm.release()
+    return wav_digest(path)
+
+
+def reflink(src: str, dst: str):
+    import fcntl
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+def find_sample(directory: str, sample_name: str) -> str:
+    """the file holding sample_name in directory, or None"""
+    for suffix in SAMPLE_SUFFIXES:
+        for candidate in (sample_name + suffix, sample_name + suffix.upper()):
+            path = os.path.join(directory, candidate)
+            if os.path.isfile(path):
+                return path
+    return None
+
+
+class SampleStore:
+    def __init__(self, root: str, link_mode: str = "hardlink"):
+        if link_mode not in LINK_MODES:
+            raise ValueError(f"unknown link mode {link_mode}")
+        self._root = root
+        self._link_mode = link_mode
+        # digests of source files seen by this process
+        self._digests = {}
+
+    @property
+    def root(self) -> str:
+        return self._root
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self._root, digest[:2], digest + ".wav")
+
+    def _temp_path(self, path: str) -> str:
+        return os.path.join(os.path.dirname(path), f".tmp-{os.getpid()}-{os.path.basename(path)}")
+
+    def digest(self, path: str) -> str:
+        """sample_digest of path, computed once per version of the file"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = self._digests[key] = sample_digest(path)
+        return digest
+
+    def add(self, src: str) -> str:
+        """store src once, returning the path of its object"""
+        obj = self.object_path(self.digest(src))
+        if os.path.exists(obj):
+            return obj
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        tmp = self._temp_path(obj)
+        try:
+            if src.lower().endswith(".s"):
+                from akairaw import AkaiRAWSampleFile
+                from akairaw.wav import export_wav
+                with AkaiRAWSampleFile(src) as sample:
+                    export_wav(sample, tmp)
+            else:
+                self._link_or_copy(src, tmp, allow_hardlink=False)
+            os.replace(tmp, obj)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return obj
+
+    def _link_or_copy(self, src: str, dst: str, allow_hardlink: bool = True):
+        modes = LINK_MODES[LINK_MODES.index(self._link_mode):]
+        for mode in modes:
+            try:
+                if mode == "hardlink":
+                    if allow_hardlink:
+                        os.link(src, dst)
+                        return
+                elif mode == "reflink":
+                    reflink(src, dst)
+                    return
+                else:
+                    shutil.copyfile(src, dst)
+                    return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EMLINK, errno.EPERM, errno.ENOTTY,
+                                   errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+                    raise
+                if os.path.exists(dst):
+                    os.unlink(dst)
+
+    def place(self, src: str, dst: str) -> str:
+        """store src and link its object to dst, returning the path the sample was placed at
+
+        a dst that already holds other sample data, say a different sample of
+        the same name used by another program, is left alone: the sample goes
+        next to it under a name suffixed with its digest instead.
+        """
+        obj = self.add(src)
+        digest = os.path.splitext(os.path.basename(obj))[0]
+        stem, ext = os.path.splitext(dst)
+        os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+        for candidate in (dst, f"{stem}-{digest[:12]}{ext}"):
+            if self._holds(candidate, obj, digest) or self._create(obj, candidate):
+                return candidate
+            # created meanwhile, by a writer that may have placed the same sample
+            if self._holds(candidate, obj, digest):
+                return candidate
+        raise FileExistsError(f"{dst} and its digest-suffixed name hold other sample data")
+
+    def _holds(self, path: str, obj: str, digest: str) -> bool:
+        """whether path holds the sample data of obj"""
+        try:
+            return os.path.samefile(obj, path) or self.digest(path) == digest
+        except FileNotFoundError:
+            return False
+
+    def _create(self, obj: str, dst: str) -> bool:
+        """link obj to dst unless dst exists, return whether it was created"""
+        tmp = self._temp_path(dst)
+        try:
+            self._link_or_copy(obj, tmp)
+            try:
+                # unlike a rename, a link never replaces what another writer put at dst
+                os.link(tmp, dst)
+            except FileExistsError:
+                return False
+            except OSError:
+                # no hard links on this file system
+                if os.path.exists(dst):
+                    return False
+                os.replace(tmp, dst)
+            return True
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
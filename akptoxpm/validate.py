@@ -0,0 +1,305 @@
+"""structural validation of AKP, S1000/S3000 .p and XPM files
+
+The checks work on the raw bytes, or on a streaming XML parse, without
+building any program object, and report every problem instead of stopping
+at the first: chunk framing and lengths, the RIFF/APRG header, keygroup
+counts and the ranges of the values that matter for a conversion.
+
+validate_tree runs them over a process pool and writes one JSON object per
+file:
+
+    {"path": "...", "format": "akp", "ok": false,
+     "issues": [{"offset": 1234, "message": "zone chunk is 46 bytes, expected 48"}]}
+"""
+import json
+import logging
+import os
+import struct
+import time
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+
+from akaiakp.akaiakp import KEYGROUP_SECTION_LENGTHS
+from akaiakp.data_maps import FilterClass, KLocClass, LFO1Class, ModsClass, OutClass, PrgClass, TuneClass, ZoneClass
+from akairaw.arrays import HEADER_LENGTH as S3000_HEADER_LENGTH
+from akairaw.arrays import KEYGROUP_COUNT as S3000_KEYGROUP_COUNT
+from akairaw.arrays import KEYGROUP_LENGTH as S3000_KEYGROUP_LENGTH
+from akairaw.arrays import consecutive_offsets, walk_keygroup_chain
+
+logger = logging.getLogger(__name__)
+
+CHUNK_HEADER = struct.Struct("<4sI")
+
+AKP_SECTION_LENGTHS = {
+    "prg ": PrgClass.LENGTH,
+    "out ": OutClass.LENGTH,
+    "tune": TuneClass.LENGTH,
+    "lfo ": LFO1Class.LENGTH,
+    "mods": ModsClass.LENGTH,
+}
+# (section class, field) -> allowed range, from refs.md
+AKP_FIELD_RANGES = {
+    (PrgClass, "number_of_keygroups"): (1, 99),
+    (TuneClass, "semitone_tune"): (-36, 36),
+    (TuneClass, "fine_tune"): (-50, 50),
+    (KLocClass, "low_note"): (0, 127),
+    (KLocClass, "high_note"): (0, 127),
+    (KLocClass, "semitone_tune"): (-36, 36),
+    (KLocClass, "fine_tune"): (-50, 50),
+    (FilterClass, "cutoff_freq"): (0, 100),
+    (ZoneClass, "low_velocity"): (0, 127),
+    (ZoneClass, "high_velocity"): (0, 127),
+    (ZoneClass, "semitone_tune"): (-36, 36),
+    (ZoneClass, "fine_tune"): (-50, 50),
+    (ZoneClass, "pan_balance"): (-50, 50),
+}
+
+S3000_KEYRANGE = 0x03
+S3000_ZONES = 0x22
+S3000_ZONE_LENGTH = 0x18
+S3000_ZONE_VELOCITY = 0x0c
+
+XPM_PROGRAM_TYPES = ("Drum", "Keygroup", "MIDI", "Plugin")
+XPM_MIDI_RANGE_TAGS = ("LowNote", "HighNote", "RootNote", "VelStart", "VelEnd")
+
+
+def issue(offset, message: str) -> dict:
+    return {"offset": offset, "message": message}
+
+
+_FIELDS = {}
+
+
+def _field_value(cls, data, base: int, name: str) -> int:
+    """a single attribute of a section straight from the buffer"""
+    key = (cls, name)
+    if key not in _FIELDS:
+        formats = dict(cls.field_formats())
+        for field_name, offset, _ in cls.field_layout():
+            _FIELDS[(cls, field_name)] = (offset, struct.Struct("<" + formats[field_name]))
+    offset, st = _FIELDS[key]
+    return st.unpack_from(data, base + offset)[0]
+
+
+def _check_ranges(cls, data, base: int, issues: list):
+    for (range_cls, name), (low, high) in AKP_FIELD_RANGES.items():
+        if range_cls is cls:
+            value = _field_value(cls, data, base, name)
+            if not low <= value <= high:
+                issues.append(issue(base, f"{cls.SECTION_NAME.decode()} {name} is {value}, not in {low}..{high}"))
+
+
+def _check_akp_keygroup(data, start: int, end: int, issues: list):
+    offset = start
+    zones = 0
+    while offset < end:
+        if offset + CHUNK_HEADER.size > end:
+            issues.append(issue(offset, "truncated sub-chunk header in kgrp"))
+            return
+        name, length = CHUNK_HEADER.unpack_from(data, offset)
+        name = name.decode("ascii", "replace")
+        payload = offset + CHUNK_HEADER.size
+        if payload + length > end:
+            issues.append(issue(offset, f"{name} sub-chunk runs past its kgrp"))
+            return
+        expected = KEYGROUP_SECTION_LENGTHS.get(name)
+        if expected is None:
+            issues.append(issue(offset, f"unknown kgrp sub-chunk {name!r}"))
+        elif length != expected:
+            issues.append(issue(offset, f"{name} sub-chunk is {length} bytes, expected {expected}"))
+        elif name == "kloc":
+            _check_ranges(KLocClass, data, payload, issues)
+            low = _field_value(KLocClass, data, payload, "low_note")
+            high = _field_value(KLocClass, data, payload, "high_note")
+            if low > high:
+                issues.append(issue(payload, f"kloc low note {low} above high note {high}"))
+        elif name == "filt":
+            _check_ranges(FilterClass, data, payload, issues)
+        elif name == "zone":
+            zones += 1
+            _check_ranges(ZoneClass, data, payload, issues)
+            low = _field_value(ZoneClass, data, payload, "low_velocity")
+            high = _field_value(ZoneClass, data, payload, "high_velocity")
+            if low > high:
+                issues.append(issue(payload, f"zone low velocity {low} above high velocity {high}"))
+        offset = payload + length
+    if zones != 4:
+        issues.append(issue(start, f"kgrp has {zones} zones, expected 4"))
+
+
+def validate_akp(data) -> list[dict]:
+    issues = []
+    if len(data) < 12:
+        return [issue(0, f"{len(data)} bytes is too short for an AKP file")]
+    riff, riff_length = CHUNK_HEADER.unpack_from(data, 0)
+    if riff != b"RIFF":
+        issues.append(issue(0, f"starts with {riff!r} instead of RIFF"))
+    # the sampler itself always writes 0 there, see refs.md
+    if riff_length not in (0, len(data) - 8):
+        issues.append(issue(4, f"RIFF length {riff_length} does not match the file size {len(data)}"))
+    if bytes(data[8:12]) != b"APRG":
+        issues.append(issue(8, f"form type {bytes(data[8:12])!r} instead of APRG"))
+    offset = 12
+    counts = {}
+    declared_keygroups = None
+    while offset < len(data):
+        if offset + CHUNK_HEADER.size > len(data):
+            issues.append(issue(offset, "truncated chunk header"))
+            break
+        name, length = CHUNK_HEADER.unpack_from(data, offset)
+        name = name.decode("ascii", "replace")
+        payload = offset + CHUNK_HEADER.size
+        if length % 2:
+            issues.append(issue(offset, f"{name} chunk has odd length {length}"))
+        if payload + length > len(data):
+            issues.append(issue(offset, f"{name} chunk runs past the end of the file"))
+            break
+        counts[name] = counts.get(name, 0) + 1
+        if name == "kgrp":
+            _check_akp_keygroup(data, payload, payload + length, issues)
+        elif name not in AKP_SECTION_LENGTHS:
+            issues.append(issue(offset, f"unknown chunk {name!r}"))
+        elif length != AKP_SECTION_LENGTHS[name]:
+            issues.append(issue(offset, f"{name} chunk is {length} bytes, expected {AKP_SECTION_LENGTHS[name]}"))
+        elif name == "prg ":
+            _check_ranges(PrgClass, data, payload, issues)
+            declared_keygroups = _field_value(PrgClass, data, payload, "number_of_keygroups")
+        elif name == "tune":
+            _check_ranges(TuneClass, data, payload, issues)
+        offset = payload + length
+    for name, expected in (("prg ", 1), ("out ", 1), ("tune", 1), ("lfo ", 2), ("mods", 1)):
+        if counts.get(name, 0) != expected:
+            issues.append(issue(None, f"{counts.get(name, 0)} {name.strip()} chunks, expected {expected}"))
+    keygroups = counts.get("kgrp", 0)
+    if declared_keygroups is not None and declared_keygroups != keygroups:
+        issues.append(issue(None, f"prg declares {declared_keygroups} keygroups, the file has {keygroups}"))
+    return issues
+
+
+def validate_s3000_program(data) -> list[dict]:
+    if len(data) < S3000_HEADER_LENGTH:
+        return [issue(0, f"{len(data)} bytes is too short for a program header")]
+    issues = []
+    if data[0] != 1:
+        issues.append(issue(0, f"program header id is {data[0]}, expected 1"))
+    count = data[S3000_KEYGROUP_COUNT]
+    if not 1 <= count <= 99:
+        issues.append(issue(S3000_KEYGROUP_COUNT, f"{count} keygroups, not in 1..99"))
+    present = (len(data) - S3000_HEADER_LENGTH) // S3000_KEYGROUP_LENGTH
+    if present < count:
+        issues.append(issue(None, f"header declares {count} keygroups, the file holds {present}"))
+    # the keygroups are where the chain of addresses puts them, as the reader finds them
+    offsets, problem = walk_keygroup_chain(data)
+    if problem is not None:
+        issues.append(issue(*problem))
+        # what the reader falls back to
+        offsets = consecutive_offsets(data, count)
+    for idx, base in enumerate(offsets):
+        if data[base] != 2:
+            issues.append(issue(base, f"keygroup {idx + 1} block id is {data[base]}, expected 2"))
+        low, high = data[base + S3000_KEYRANGE], data[base + S3000_KEYRANGE + 1]
+        if low > high or high > 127:
+            issues.append(issue(base + S3000_KEYRANGE, f"keygroup {idx + 1} key range {low}..{high}"))
+        for zone in range(4):
+            at = base + S3000_ZONES + zone * S3000_ZONE_LENGTH + S3000_ZONE_VELOCITY
+            vlow, vhigh = data[at], data[at + 1]
+            if vhigh > 127 or (vlow > vhigh and vhigh != 0):
+                issues.append(issue(at, f"keygroup {idx + 1} zone {zone + 1} velocity range {vlow}..{vhigh}"))
+    return issues
+
+
+def validate_xpm(fh) -> list[dict]:
+    """stream through the XML, the offsets reported are line numbers"""
+    issues = []
+    stack = []
+    program_type = None
+    instruments = 0
+    try:
+        for event, elem in ET.iterparse(fh, events=("start", "end")):
+            if event == "start":
+                if not stack and elem.tag != "MPCVObject":
+                    issues.append(issue(None, f"root element is {elem.tag}, expected MPCVObject"))
+                if elem.tag == "Program" and len(stack) == 1:
+                    program_type = elem.get("type")
+                    if program_type not in XPM_PROGRAM_TYPES:
+                        issues.append(issue(None, f"unknown program type {program_type!r}"))
+                stack.append(elem.tag)
+                continue
+            stack.pop()
+            if elem.tag == "Instrument" and stack and stack[-1] == "Instruments":
+                instruments += 1
+            elif elem.tag in XPM_MIDI_RANGE_TAGS:
+                try:
+                    value = int(elem.text or "")
+                except ValueError:
+                    issues.append(issue(None, f"{elem.tag} is {elem.text!r}, not an integer"))
+                else:
+                    if not 0 <= value <= 127:
+                        issues.append(issue(None, f"{elem.tag} is {value}, not in 0..127"))
+            elif elem.tag.startswith("ProgramPads"):
+                try:
+                    json.loads(elem.text or "")
+                except ValueError as e:
+                    issues.append(issue(None, f"{elem.tag} is not valid JSON: {e}"))
+            if len(stack) > 2:
+                # only the current path is needed, drop finished subtrees
+                elem.clear()
+    except ET.ParseError as e:
+        issues.append(issue(e.position[0], f"malformed XML: {e}"))
+        return issues
+    if program_type is None:
+        issues.append(issue(None, "no Program element"))
+    elif program_type == "Drum" and instruments != 128:
+        issues.append(issue(None, f"drum program has {instruments} instruments, expected 128"))
+    return issues
+
+
+def format_for_path(path: str) -> str:
+    lower = path.lower()
+    for suffix in (".gz", ".gzip", ".zst", ".zstd"):
+        if lower.endswith(suffix):
+            lower = lower[: -len(suffix)]
+    return {".akp": "akp", ".p": "s3000", ".xpm": "xpm"}.get(os.path.splitext(lower)[1])
+
+
+def validate_file(path: str) -> dict:
+    """the report entry of a single file; runs in the pool workers"""
+    fmt = format_for_path(path)
+    try:
+        if fmt == "xpm":
+            from akaixpm.compression import open_xpm_read
+            with open_xpm_read(path) as fh:
+                issues = validate_xpm(fh)
+        else:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            issues = validate_akp(data) if fmt == "akp" else validate_s3000_program(data)
+    except Exception as e:
+        issues = [issue(None, f"{type(e).__name__}: {e}")]
+    return {"path": path, "format": fmt, "ok": not issues, "issues": issues}
+
+
+def find_program_files(root: str) -> list[str]:
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for fn in sorted(filenames):
+            if format_for_path(fn) is not None:
+                found.append(os.path.join(dirpath, fn))
+    return found
+
+
+def validate_tree(root: str, report, jobs: int = None) -> dict:
+    """validate every program below root, writing JSON lines to the report file object"""
+    paths = find_program_files(root)
+    jobs = jobs or os.cpu_count()
+    stats = {"ok": 0, "invalid": 0, "total": len(paths)}
+    start = time.monotonic()
+    chunksize = max(1, min(64, len(paths) // (jobs * 4)))
+    with Pool(jobs) as pool:
+        for entry in pool.imap_unordered(validate_file, paths, chunksize):
+            stats["ok" if entry["ok"] else "invalid"] += 1
+            report.write(json.dumps(entry) + "\n")
+    stats["seconds"] = time.monotonic() - start
+    logger.info("validated %s files, %s invalid, in %.1fs", len(paths), stats["invalid"], stats["seconds"])
+    return stats
@@ -0,0 +1,4 @@
+"""benchmarks: parse/serialize timings and peak memory for the Akai formats
+
+Run with `python -m benchmarks`, see `python -m benchmarks --help`.
+"""
@@ -0,0 +1,174 @@
+"""timing and peak-memory harness over examples/ and the synthetic programs"""
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from akaiakp import AkaiAKPFile
+from akairaw import AkaiRAWProgramFile
+
+from . import synthetic
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "examples")
+
+AKP_SIZES = [1, 8, 33, 66, 99]
+S3000_SIZES = [1, 8, 33, 66, 99]
+XPM_SIZES = [1, 16, 64, 128]
+
+
+def parse_akp(path):
+    akp = AkaiAKPFile(path)
+    akp.list_sections()
+    # decode every keygroup, like a full conversion does
+    akp.keygroups[:]
+    return akp
+
+
+def serialize_akp(akp):
+    return akp.to_bytes()
+
+
+def parse_s3000(path):
+    prog = AkaiRAWProgramFile(path)
+    prog.parse_program()
+    for kg in prog.keygroups:
+        kg.velocity_zones
+    return prog
+
+
+def parse_xpm(path):
+    from akaixpm import AkaiXPMFile
+    return AkaiXPMFile(path)
+
+
+def serialize_xpm(xpm):
+    return xpm.to_xml()
+
+
+# format -> (parser, serializer or None)
+FORMATS = {
+    "akp": (parse_akp, serialize_akp),
+    "s3000": (parse_s3000, None),
+    "xpm": (parse_xpm, serialize_xpm),
+}
+
+
+def measure(fn, repeat: int) -> dict:
+    """best/mean wall time over `repeat` runs, then peak traced memory of one more"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "best_ms": min(times) * 1000,
+        "mean_ms": sum(times) / len(times) * 1000,
+        "peak_kib": peak / 1024,
+        "result": result,
+    }
+
+
+def bench_file(fmt: str, name: str, path: str, repeat: int) -> list[dict]:
+    parser, serializer = FORMATS[fmt]
+    rows = []
+    parsed = measure(lambda: parser(path), repeat)
+    rows.append({"case": f"{fmt}:{name}", "op": "parse", "bytes": os.path.getsize(path), **parsed})
+    if serializer is not None:
+        obj = parsed["result"]
+        rows.append({"case": f"{fmt}:{name}", "op": "serialize", "bytes": os.path.getsize(path),
+                     **measure(lambda: serializer(obj), repeat)})
+    for row in rows:
+        del row["result"]
+    return rows
+
+
+def example_cases():
+    for pattern, fmt in (("*.akp", "akp"), ("*.p", "s3000"), ("*.xpm", "xpm")):
+        for path in sorted(glob.glob(os.path.join(EXAMPLES_DIR, pattern))):
+            yield fmt, os.path.basename(path), path
+
+
+def synthetic_cases(workdir: str):
+    for n in AKP_SIZES:
+        path = os.path.join(workdir, f"synthetic-{n}.akp")
+        synthetic.write_akp(path, n)
+        yield "akp", f"synthetic-{n}kg", path
+    for n in S3000_SIZES:
+        path = os.path.join(workdir, f"synthetic-{n}.p")
+        synthetic.write_s3000_program(path, n)
+        yield "s3000", f"synthetic-{n}kg", path
+    for n in XPM_SIZES:
+        path = os.path.join(workdir, f"synthetic-kg-{n}.xpm")
+        synthetic.write_keygroup_xpm(path, n)
+        yield "xpm", f"synthetic-{n}kg", path
+    path = os.path.join(workdir, "synthetic-drum-128.xpm")
+    synthetic.write_drum_xpm(path, 128)
+    yield "xpm", "synthetic-drum-128", path
+
+
+def run(repeat: int = 5, examples: bool = True, synthetic_programs: bool = True) -> list[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = []
+        if examples:
+            cases.extend(example_cases())
+        if synthetic_programs:
+            cases.extend(synthetic_cases(workdir))
+        for fmt, name, path in cases:
+            try:
+                rows.extend(bench_file(fmt, name, path, repeat))
+            except NotImplementedError as e:
+                logging.warning("skipping %s: %s", name, e)
+    return rows
+
+
+def print_rows(rows: list[dict], fh=sys.stdout):
+    fh.write(f"{'case':<40} {'op':<10} {'bytes':>9} {'best ms':>9} {'mean ms':>9} {'peak KiB':>9}\n")
+    for r in rows:
+        fh.write(f"{r['case']:<40} {r['op']:<10} {r['bytes']:>9} {r['best_ms']:>9.2f} {r['mean_ms']:>9.2f} {r['peak_kib']:>9.1f}\n")
+
+
+def compare(rows: list[dict], baseline: list[dict], tolerance: float) -> list[str]:
+    """cases whose best time regressed by more than tolerance against the baseline"""
+    base = {(r["case"], r["op"]): r for r in baseline}
+    regressions = []
+    for r in rows:
+        b = base.get((r["case"], r["op"]))
+        if b is not None and r["best_ms"] > b["best_ms"] * (1 + tolerance):
+            regressions.append(f"{r['case']} {r['op']}: {b['best_ms']:.2f}ms -> {r['best_ms']:.2f}ms")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="benchmarks", description=__doc__)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--no-examples", action="store_true")
+    ap.add_argument("--no-synthetic", action="store_true")
+    ap.add_argument("--json", help="write the results to this file")
+    ap.add_argument("--baseline", help="results of an earlier --json run to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    rows = run(args.repeat, not args.no_examples, not args.no_synthetic)
+    print_rows(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(rows, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(rows, json.load(fh), args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        return 1 if regressions else 0
+    return 0
@@ -0,0 +1,102 @@
+"""import-time budget for the package entry points
+
+Every CLI is started from shell loops and build systems, often thousands of
+times, so what `python -m <package>` imports before doing any work matters.
+Each entry point is imported in a fresh interpreter under `-X importtime` and
+the cumulative time of the imports it triggers is checked against its budget.
+Bytecode is cached under a private pycache prefix, warmed before measuring, so
+compiling the sources is not counted even where PYTHONDONTWRITEBYTECODE is set:
+
+    python -m benchmarks.startup [--repeat 5] [--json startup.json]
+
+exits 1 when an entry point goes over its budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# entry point -> (modules imported before the CLI does any work, budget in ms)
+# most of what is left is the dataclass machinery building the section and
+# XPM classes; the budgets leave about 50% headroom for noisy machines
+ENTRY_POINTS = {
+    "akaiakp": (["akaiakp.akaiakp"], 90),
+    "akaixpm": (["akaixpm", "json"], 110),
+    "akairaw": (["akairaw"], 60),
+    "akptoxpm": (["akptoxpm.akptoxpm"], 150),
+    "akptoxpm batch": (["akptoxpm.batch"], 60),
+    "akptoxpm validate": (["akptoxpm.validate"], 120),
+    "akptoxpm catalog": (["akptoxpm.catalog", "sqlite3"], 140),
+}
+
+
+def import_times(statement: str, pycache: str) -> tuple[dict, float]:
+    """{top-level module: cumulative µs} reported by -X importtime, and the wall time in ms"""
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    cmd = [sys.executable, "-X", "importtime", "-X", "pycache_prefix=" + pycache, "-c", statement]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env)
+    wall_ms = (time.perf_counter() - start) * 1000
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times, wall_ms
+
+
+def measure(modules: list[str], repeat: int, pycache: str) -> dict:
+    """best import and wall time of the modules over repeat fresh interpreters"""
+    # the interpreter's own startup imports (site, encodings...) are not ours
+    interpreter, _ = import_times("pass", pycache)
+    statement = "import " + ", ".join(modules)
+    # writes the bytecode
+    import_times(statement, pycache)
+    best_import = best_wall = None
+    for _ in range(repeat):
+        times, wall_ms = import_times(statement, pycache)
+        import_ms = sum(us for name, us in times.items() if name not in interpreter) / 1000
+        best_import = import_ms if best_import is None else min(best_import, import_ms)
+        best_wall = wall_ms if best_wall is None else min(best_wall, wall_ms)
+    return {"import_ms": best_import, "wall_ms": best_wall}
+
+
+def run(repeat: int = 5) -> list[dict]:
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="startup-pycache-") as pycache:
+        for name, (modules, budget_ms) in ENTRY_POINTS.items():
+            row = {"entry_point": name, "budget_ms": budget_ms}
+            row.update(measure(modules, repeat, pycache))
+            rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="benchmarks.startup", description=__doc__)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--json", help="write the results to this file")
+    args = ap.parse_args(argv)
+
+    rows = run(args.repeat)
+    over = 0
+    print(f"{'entry point':<20} {'import ms':>9} {'budget ms':>9} {'wall ms':>9}")
+    for r in rows:
+        flag = ""
+        if r["import_ms"] > r["budget_ms"]:
+            over += 1
+            flag = "  OVER BUDGET"
+        print(f"{r['entry_point']:<20} {r['import_ms']:>9.1f} {r['budget_ms']:>9} {r['wall_ms']:>9.1f}{flag}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(rows, fh, indent=2)
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""generators for synthetic worst-case programs
+
+Every generator writes a file that the matching reader accepts, sized by the
+number of keygroups/instruments so that runs over increasing sizes give
+scaling curves.
+"""
+import struct
+
+from akaiakp.data_maps import (
+    AuxEnvelopeClass,
+    EnvelopeClass,
+    FilterClass,
+    KeygroupClass,
+    KLocClass,
+    LFO1Class,
+    LFO2Class,
+    ModsClass,
+    OutClass,
+    PrgClass,
+    RIFFClass,
+    TuneClass,
+    ZoneClass,
+)
+from akairaw.akairaw import AKAI_CHARS
+
+
+def encode_akai_string(s: str, length: int = 12) -> bytes:
+    """inverse of akairaw.decode_akai_string, padded with spaces"""
+    s = s.upper()[:length].ljust(length)
+    return bytes(AKAI_CHARS.index(c) if c in AKAI_CHARS else 10 for c in s.encode("ascii"))
+
+
+def sample_name(idx: int, zone: int) -> str:
+    return f"SYN {idx:03d} Z{zone}"
+
+
+def akp_bytes(keygroups: int) -> bytes:
+    """an AKP program with the given number of keygroups, 4 zones each"""
+    body = bytearray()
+    body += PrgClass(number_of_keygroups=keygroups).as_riff_bytes()
+    for section in (OutClass(), TuneClass(), LFO1Class(), LFO2Class(), ModsClass()):
+        body += section.as_riff_bytes()
+    for idx in range(keygroups):
+        zones = []
+        for z in range(4):
+            name = sample_name(idx, z + 1).encode("ascii")
+            zones.append(ZoneClass(sample_char_len=len(name), sample_name=name.ljust(20, b"\0")))
+        note = 21 + idx % 107
+        kg = KeygroupClass(
+            kloc=KLocClass(low_note=note, high_note=note),
+            amp_envelope=EnvelopeClass(),
+            filter_envelope=EnvelopeClass(),
+            aux_envelope=AuxEnvelopeClass(),
+            filter=FilterClass(),
+            zone1=zones[0],
+            zone2=zones[1],
+            zone3=zones[2],
+            zone4=zones[3],
+        )
+        body += kg.as_riff_bytes()
+    return RIFFClass(LENGTH=len(body) + 4).as_riff_bytes() + bytes(body)
+
+
+def write_akp(path: str, keygroups: int = 99):
+    with open(path, "wb") as fh:
+        fh.write(akp_bytes(keygroups))
+
+
+# S3000 programs live at this (internal) block address, keygroups follow every 0xc0 bytes
+S3000_BASE_ADDRESS = 0x6000
+S3000_BLOCK = 0xc0
+
+
+def s3000_program_bytes(keygroups: int) -> bytes:
+    """an S3000 program with a chain of keygroups, each with 4 velocity zones"""
+    data = bytearray(S3000_BLOCK * (keygroups + 1))
+    data[0x00] = 1
+    struct.pack_into("<H", data, 0x01, S3000_BASE_ADDRESS + S3000_BLOCK // 16)
+    data[0x03:0x0f] = encode_akai_string("SYNTHETIC")
+    data[0x11] = 31
+    data[0x12] = 1
+    data[0x13] = 24
+    data[0x14] = 127
+    data[0x16] = 0xff
+    data[0x17] = 99
+    data[0x19] = 80
+    data[0x2a] = keygroups & 0xff
+    for idx in range(keygroups):
+        base = S3000_BLOCK * (idx + 1)
+        data[base + 0x00] = 2
+        next_address = S3000_BASE_ADDRESS + (idx + 2) * S3000_BLOCK // 16 if idx + 1 < keygroups else 0
+        struct.pack_into("<H", data, base + 0x01, next_address)
+        data[base + 0x03] = 24 + idx % 104
+        data[base + 0x04] = 24 + idx % 104
+        data[base + 0x07] = 99
+        data[base + 0x0c:base + 0x10] = bytes([25, 50, 99, 45])
+        data[base + 0x1f] = 4
+        for z in range(4):
+            zone = base + 0x22 + z * 0x18
+            data[zone:zone + 12] = encode_akai_string(sample_name(idx, z + 1))
+            data[zone + 0x0c] = z * 32
+            data[zone + 0x0d] = z * 32 + 31
+    return bytes(data)
+
+
+def write_s3000_program(path: str, keygroups: int = 99):
+    with open(path, "wb") as fh:
+        fh.write(s3000_program_bytes(keygroups))
+
+
+def _fill_layers(instrument, idx: int):
+    for layer in instrument.layers:
+        layer.sample_name = sample_name(idx, layer.number)
+        layer.root_note = 60
+
+
+def write_drum_xpm(path: str, instruments: int = 128):
+    """a drum program with every layer of the first `instruments` pads assigned"""
+    from akaixpm import AkaiXPMDrumProgram, AkaiXPMFile, AkaiXPMMPCVObject
+
+    program = AkaiXPMDrumProgram(program_name="SYNTHETIC DRUMS")
+    for idx, instrument in enumerate(program.instruments[:instruments]):
+        _fill_layers(instrument, idx)
+    AkaiXPMFile.from_mpcvobject(AkaiXPMMPCVObject(program=program)).write(path)
+
+
+def write_keygroup_xpm(path: str, keygroups: int = 128):
+    """a keygroup program with `keygroups` instruments, every layer assigned"""
+    from akaixpm import AkaiXPMFile, AkaiXPMKeygroupInstrument, AkaiXPMKeygroupProgram, AkaiXPMMPCVObject
+
+    instruments = AkaiXPMKeygroupInstrument.default_list(keygroups)
+    for idx, instrument in enumerate(instruments):
+        instrument.low_note = instrument.high_note = idx
+        _fill_layers(instrument, idx)
+    program = AkaiXPMKeygroupProgram(
+        program_name="SYNTHETIC KEYGROUPS",
+        instruments=instruments,
+        keygroup_num_keygroups=keygroups,
+    )
+    AkaiXPMFile.from_mpcvobject(AkaiXPMMPCVObject(program=program)).write(path)
+
+
+def disk_image_bytes(files: list[tuple[str, int, bytes]], scatter: bool = False) -> bytes:
+    """a single-partition S3000 disk image holding one volume with the given (name, type, data) files
+
+    with scatter every file is stored on every other block, so block chains
+    have to be followed rather than read as one run.
+    """
+    from akairaw import disk
+
+    block = disk.BLOCK_SIZE
+    # disk information and FAT, then the two directory blocks of the volume
+    fat = {0: 0x4000, 1: 0x4000, 2: 0x4000, 3: 0x4000, 4: 0x8000}
+    volume_start = 3
+    next_block = 5
+    placed = []
+    for name, file_type, data in files:
+        count = max(1, -(-len(data) // block))
+        step = 2 if scatter else 1
+        chain = [next_block + i * step for i in range(count)]
+        next_block = chain[-1] + 1
+        for a, b in zip(chain, chain[1:] + [0xc000]):
+            fat[a] = b
+        placed.append((name, file_type, data, chain))
+    blocks = next_block
+    image = bytearray(blocks * block)
+    struct.pack_into("<H", image, 0, blocks)
+    disk.VOLUME_ENTRY.pack_into(image, disk.VOLUME_TABLE_OFFSET, encode_akai_string("SYNTH"), disk.VOLUME_S3000, volume_start)
+    for idx, value in fat.items():
+        disk.FAT_ENTRY.pack_into(image, disk.FAT_OFFSET + 2 * idx, value)
+    for idx, (name, file_type, data, chain) in enumerate(placed):
+        disk.FILE_ENTRY.pack_into(
+            image, volume_start * block + idx * disk.FILE_ENTRY.size,
+            encode_akai_string(name), b"\0" * 4, file_type, len(data).to_bytes(3, "little"), chain[0], b"\0\0",
+        )
+        for i, b in enumerate(chain):
+            chunk = data[i * block : (i + 1) * block]
+            image[b * block : b * block + len(chunk)] = chunk
+    return bytes(image)
+
+
+def write_disk_image(path: str, files: list[tuple[str, int, bytes]], scatter: bool = False):
+    with open(path, "wb") as fh:
+        fh.write(disk_image_bytes(files, scatter))
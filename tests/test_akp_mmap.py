@@ -0,0 +1,36 @@
+"""a memory-mapped AKP file after close(): decoded keygroups stay, the rest is a clear error"""
+import os
+
+import pytest
+
+from akaiakp import AkaiAKPFile
+
+M_BASS = os.path.join(os.path.dirname(__file__), os.pardir, "examples", "M.BASS.akp")
+
+
+def test_undecoded_keygroup_after_close():
+    with AkaiAKPFile(M_BASS, use_mmap=True) as akp:
+        akp.list_sections()
+        first = akp.keygroups[0]
+    assert akp.keygroups[0] is first
+    with pytest.raises(ValueError, match="is closed"):
+        akp.keygroups[7]
+    with pytest.raises(ValueError, match="is closed"):
+        akp.buffer
+
+
+def test_writable_copy_outlives_the_map():
+    with AkaiAKPFile(M_BASS, use_mmap=True) as akp:
+        akp.list_sections()
+        akp.make_writable()
+    eager = AkaiAKPFile(M_BASS)
+    eager.list_sections()
+    assert akp.keygroups[7] == eager.keygroups[7]
+
+
+def test_read_mode_is_unaffected_by_close():
+    akp = AkaiAKPFile(M_BASS)
+    akp.list_sections()
+    akp.close()
+    assert len(akp.buffer) == os.path.getsize(M_BASS)
+    assert akp.keygroups[7].kloc is not None
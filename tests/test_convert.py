@@ -0,0 +1,61 @@
+"""an AKP keygroup program converts into the matching XPM keygroup values"""
+from akaiakp.data_maps import (
+    AuxEnvelopeClass,
+    EnvelopeClass,
+    FilterClass,
+    KeygroupClass,
+    KLocClass,
+    LFO1Class,
+    LFO2Class,
+    ModsClass,
+    OutClass,
+    PrgClass,
+    RIFFClass,
+    TuneClass,
+    ZoneClass,
+)
+from akaixpm import AkaiXPMFile
+from akptoxpm.akptoxpm import AkaiAKPToXPM
+
+
+def akp_bytes(kloc: KLocClass, zone: ZoneClass) -> bytes:
+    body = bytearray(PrgClass(number_of_keygroups=1).as_riff_bytes())
+    for section in (OutClass(), TuneClass(), LFO1Class(), LFO2Class(), ModsClass()):
+        body += section.as_riff_bytes()
+    body += KeygroupClass(
+        kloc=kloc,
+        amp_envelope=EnvelopeClass(),
+        filter_envelope=EnvelopeClass(),
+        aux_envelope=AuxEnvelopeClass(),
+        filter=FilterClass(),
+        zone1=zone,
+        zone2=ZoneClass(),
+        zone3=ZoneClass(),
+        zone4=ZoneClass(),
+    ).as_riff_bytes()
+    return RIFFClass(LENGTH=len(body) + 4).as_riff_bytes() + bytes(body)
+
+
+def test_zone_tuning_is_mapped_once(tmp_path):
+    name = b"PNO C3"
+    zone = ZoneClass(
+        sample_char_len=len(name), sample_name=name.ljust(20, b"\0"),
+        low_velocity=10, high_velocity=100, semitone_tune=-5, fine_tune=30, pan_balance=-50,
+    )
+    akp = tmp_path / "PIANO.akp"
+    akp.write_bytes(akp_bytes(KLocClass(low_note=48, high_note=72, semitone_tune=2, fine_tune=-10), zone))
+    xpm = tmp_path / "PIANO.xpm"
+    converter = AkaiAKPToXPM(str(akp), str(xpm))
+    converter.parse_akp()
+    converter.write_xpm()
+
+    instrument = AkaiXPMFile(str(xpm)).program.instruments[0]
+    assert (instrument.low_note, instrument.high_note) == (48, 72)
+    assert (instrument.tune_coarse, instrument.tune_fine) == (2, -10)
+    layer = instrument.layers[0]
+    assert layer.sample_name == "PNO C3"
+    assert (layer.vel_start, layer.vel_end) == (10, 100)
+    assert (layer.tune_coarse, layer.tune_fine) == (-5, 30)
+    # the MPC adds Pitch to TuneCoarse/TuneFine, so it stays at its default
+    assert layer.pitch == 0.0
+    assert layer.pan == 0.0
@@ -0,0 +1,133 @@
+"""disk.py against an image laid out byte by byte from S3000-format.html
+
+The image is written from the documented offsets, not from the constants in
+disk.py, so a wrong constant there shows up here. It is a 1x2 disk: two
+partitions of 0x80 blocks, the first with an S3000 volume holding a sample
+whose blocks are scattered, the second with an S1000 volume holding a program.
+"""
+import struct
+
+import pytest
+
+from akairaw.disk import AkaiDiskImage
+
+BLOCK = 0x2000
+PARTITION_BLOCKS = 0x80
+AKAI_CHARS = "0123456789 ABCDEFGHIJKLMNOPQRSTUVWXYZ#+-."
+
+
+def akai_name(name: str) -> bytes:
+    return bytes(AKAI_CHARS.index(c) for c in name.ljust(12))
+
+
+def partition(volume_name: str, volume_type: int, files, fat) -> bytearray:
+    """one partition: disk information, volume 1 at block 3, FAT and file entries"""
+    part = bytearray(PARTITION_BLOCKS * BLOCK)
+    struct.pack_into("<H", part, 0x00, PARTITION_BLOCKS)
+    part[0xc8:0xca] = b"\x2f\x00"
+    struct.pack_into("<12sHH", part, 0xca, akai_name(volume_name), volume_type, 3)
+    # blocks 0-2 disk information, 3 the file entries, 4 their second block on an S3000
+    fat = {0: 0x4000, 1: 0x4000, 2: 0x4000, 3: 0x4000, **({4: 0x8000} if volume_type == 3 else {}), **fat}
+    for block, value in fat.items():
+        struct.pack_into("<H", part, 0x70a + 2 * block, value)
+    for idx, (name, file_type, data, start) in enumerate(files):
+        entry = 3 * BLOCK + 24 * idx
+        part[entry:entry + 12] = akai_name(name)
+        part[entry + 0x10] = file_type
+        part[entry + 0x11:entry + 0x14] = len(data).to_bytes(3, "little")
+        struct.pack_into("<H", part, entry + 0x14, start)
+    return part
+
+
+def sample_bytes(name: str, frames: int) -> bytes:
+    data = bytearray(0xc0 + 2 * frames)
+    data[0x00] = 3
+    data[0x02] = 60
+    data[0x03:0x0f] = akai_name(name)
+    struct.pack_into("<I", data, 0x1a, frames)
+    struct.pack_into("<H", data, 0x8a, 44100)
+    struct.pack_into(f"<{frames}h", data, 0xc0, *(i % 1000 - 500 for i in range(frames)))
+    return bytes(data)
+
+
+def program_bytes(name: str) -> bytes:
+    data = bytearray(2 * 0xc0)
+    data[0x00] = 1
+    # the single keygroup at internal address 0x6000 + 0xc0 / 16
+    struct.pack_into("<H", data, 0x01, 0x600c)
+    data[0x03:0x0f] = akai_name(name)
+    data[0x2a] = 1
+    data[0xc0] = 2
+    data[0xc0 + 0x03] = 36
+    data[0xc0 + 0x04] = 96
+    return bytes(data)
+
+
+SAMPLE = sample_bytes("PNO C3 L", 10000)
+PROGRAM = program_bytes("MIX PNO")
+# the sample takes three blocks, every other one from block 5
+SAMPLE_BLOCKS = [5, 7, 9]
+
+
+@pytest.fixture
+def image(tmp_path):
+    first = partition(
+        "PIANOS", 3, [("PNO C3 L", 0xf3, SAMPLE, SAMPLE_BLOCKS[0])], {5: 7, 7: 9, 9: 0xc000},
+    )
+    for idx, block in enumerate(SAMPLE_BLOCKS):
+        chunk = SAMPLE[idx * BLOCK:(idx + 1) * BLOCK]
+        first[block * BLOCK:block * BLOCK + len(chunk)] = chunk
+    # the partition table of a 1x2 disk
+    first[0x4500:0x4508] = bytes([0x02, 0x01, 0x80, 0x00, 0x80, 0x00, 0x00, 0x01])
+    second = partition("S1000 PROGS", 1, [("MIX PNO", 0x70, PROGRAM, 4)], {4: 0xc000})
+    second[4 * BLOCK:4 * BLOCK + len(PROGRAM)] = PROGRAM
+    path = tmp_path / "disk.img"
+    path.write_bytes(bytes(first + second))
+    with AkaiDiskImage(str(path)) as img:
+        yield img
+
+
+def test_partitions(image):
+    assert [(p.number, p.offset, p.blocks) for p in image.partitions] == [
+        (1, 0, PARTITION_BLOCKS),
+        (2, PARTITION_BLOCKS * BLOCK, PARTITION_BLOCKS),
+    ]
+
+
+def test_volumes(image):
+    volumes = image.volumes()
+    assert [(v.partition.number, v.number, v.name, v.volume_type, v.start_block) for v in volumes] == [
+        (1, 1, "PIANOS", 3, 3),
+        (2, 1, "S1000 PROGS", 1, 3),
+    ]
+
+
+def test_files(image):
+    files = image.files()
+    assert [(f.volume.partition.number, f.name, f.type_name, f.size, f.start_block) for f in files] == [
+        (1, "PNO C3 L", "S3000-sample", len(SAMPLE), 5),
+        (2, "MIX PNO", "S1000-program", len(PROGRAM), 4),
+    ]
+
+
+def test_scattered_sample(image):
+    entry = image.files()[0]
+    assert image.block_chain(entry) == SAMPLE_BLOCKS
+    data, offset = image.read(entry)
+    assert offset is None
+    assert bytes(data) == SAMPLE
+    sample = image.open(entry)
+    assert sample.sample_name.rstrip() == "PNO C3 L"
+    assert sample.sample_rate == 44100
+    assert sample.samples()[:3].tolist() == [-500, -499, -498]
+
+
+def test_program_in_second_partition(image):
+    entry = image.files()[1]
+    data, offset = image.read(entry)
+    assert offset == PARTITION_BLOCKS * BLOCK + 4 * BLOCK
+    assert bytes(data) == PROGRAM
+    program = image.open(entry)
+    program.parse_program()
+    assert program.program_name.rstrip() == "MIX PNO"
+    assert [(k.keyrange_low, k.keyrange_high) for k in program.keygroups] == [(36, 96)]
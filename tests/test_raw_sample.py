@@ -0,0 +1,44 @@
+"""S1000 and S3000 .s samples: the PCM body follows a header of 0x96 and 0xc0 bytes"""
+import struct
+
+import pytest
+
+from akairaw import AkaiRAWSampleFile
+
+FRAMES = [0, 1, -1, 32767, -32768]
+
+
+def sample_bytes(header_id: int, header_length: int) -> bytes:
+    data = bytearray(header_length)
+    data[0x00] = header_id
+    data[0x02] = 60
+    data[0x03:0x0f] = bytes([0x1a, 0x18, 0x19] + [0x0a] * 9)
+    struct.pack_into("<I", data, 0x1a, len(FRAMES))
+    struct.pack_into("<H", data, 0x8a, 22050)
+    return bytes(data) + struct.pack(f"<{len(FRAMES)}h", *FRAMES)
+
+
+@pytest.mark.parametrize("header_id, header_length", [(1, 0x96), (3, 0xc0)])
+def test_sample(tmp_path, header_id, header_length):
+    path = tmp_path / "PNO.s"
+    path.write_bytes(sample_bytes(header_id, header_length))
+    with AkaiRAWSampleFile(str(path)) as sample:
+        assert sample.pcm_offset == header_length
+        assert sample.sample_name.rstrip() == "PNO"
+        assert sample.sample_rate == 22050
+        assert len(sample.header.remainder) == header_length - 0x8d
+        assert sample.samples().tolist() == FRAMES
+
+
+def test_short_s1000_sample_from_buffer():
+    # shorter than an S3000 header altogether
+    data = sample_bytes(1, 0x96)
+    assert len(data) < 0xc0
+    sample = AkaiRAWSampleFile(None, data)
+    assert sample.samples().tolist() == FRAMES
+
+
+@pytest.mark.parametrize("data", [b"", b"\x02" + bytes(0xc0), bytes([3]) + bytes(0x90)])
+def test_not_a_sample(data):
+    with pytest.raises(ValueError):
+        AkaiRAWSampleFile(None, data)
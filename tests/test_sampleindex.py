@@ -0,0 +1,61 @@
+"""sample names with the non-alphanumeric Akai characters # + - . key as the sampler shows them"""
+import pytest
+
+from akairaw.akairaw import AKAI_CHARS, decode_akai_string
+from akptoxpm.sampleindex import SampleIndex, sample_key, split_stereo
+
+
+def test_decode_punctuation():
+    assert decode_akai_string(bytes([0x25, 0x26, 0x27, 0x28])) == b"#+-."
+    assert len(AKAI_CHARS) == 0x29
+
+
+@pytest.mark.parametrize("name, key", [
+    ("PNO-C3", "PNO-C3"),
+    ("pno-c3", "PNO-C3"),
+    ("F#3 STR+", "F#3 STR+"),
+    ("VOX.AH  C4", "VOX.AH C4"),
+    # characters the sampler lacks become a space
+    ("PNO_C3", "PNO C3"),
+    ("Pno (C3)", "PNO C3"),
+])
+def test_sample_key(name, key):
+    assert sample_key(name) == key
+
+
+def test_dash_is_not_a_space():
+    assert sample_key("PNO-C3") != sample_key("PNO C3")
+
+
+@pytest.mark.parametrize("name, split", [
+    ("PNO-C3-L", ("PNO-C3", "L")),
+    ("PNO-C3 -R", ("PNO-C3", "R")),
+    ("PNO-C3", ("PNO-C3", None)),
+    ("F#3-L", ("F#3", "L")),
+])
+def test_split_stereo(name, split):
+    assert split_stereo(name) == split
+
+
+@pytest.fixture
+def index(tmp_path):
+    for fn in ("PNO-C3.wav", "PNO C3.wav", "F#3 STR+-L.wav", "F#3 STR+-R.wav", "VOX.AH C4.s"):
+        (tmp_path / fn).write_bytes(b"")
+    index = SampleIndex(str(tmp_path))
+    index.scan()
+    return index
+
+
+@pytest.mark.parametrize("zone, fn", [
+    ("PNO-C3", "PNO-C3.wav"),
+    ("PNO C3", "PNO C3.wav"),
+    ("F#3 STR+-L", "F#3 STR+-L.wav"),
+    ("F#3 STR+ -R", "F#3 STR+-R.wav"),
+    ("VOX.AH  C4", "VOX.AH C4.s"),
+])
+def test_resolve(index, tmp_path, zone, fn):
+    assert index.resolve(zone) == str(tmp_path / fn)
+
+
+def test_unknown(index):
+    assert index.resolve("PNO.C3") is None
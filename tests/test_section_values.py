@@ -0,0 +1,50 @@
+"""AKP section attributes that do not fit their byte are reported by name"""
+import pytest
+
+from akaiakp.data_maps import KLocClass, ZoneClass
+
+
+def test_in_range():
+    kloc = KLocClass(low_note=0, high_note=255, semitone_tune=-128, fine_tune=127)
+    assert KLocClass.from_bytes(kloc.attrs_as_bytes()) == kloc
+
+
+# unsigned fields take 0..255 and signed ones -128..127; the raw bytes
+# -1 or 200 are no longer taken for either kind
+@pytest.mark.parametrize("name, value, fits", [
+    ("high_note", 0, True),
+    ("high_note", 255, True),
+    ("high_note", -1, False),
+    ("high_note", 256, False),
+    ("semitone_tune", -128, True),
+    ("semitone_tune", 127, True),
+    ("semitone_tune", -129, False),
+    ("semitone_tune", 128, False),
+    ("semitone_tune", 200, False),
+])
+def test_boundaries(name, value, fits):
+    kloc = KLocClass(**{name: value})
+    if fits:
+        assert getattr(KLocClass.from_bytes(kloc.attrs_as_bytes()), name) == value
+    else:
+        with pytest.raises(ValueError, match=name):
+            kloc.attrs_as_bytes()
+
+
+@pytest.mark.parametrize("name, value, allowed", [
+    ("high_note", 256, "0..255"),
+    ("low_note", -1, "0..255"),
+    ("semitone_tune", 128, "-128..127"),
+    ("fine_tune", -129, "-128..127"),
+    ("mute_group", 1.5, "0..255"),
+])
+def test_out_of_range(name, value, allowed):
+    kloc = KLocClass(**{name: value})
+    for pack in (kloc.attrs_as_bytes, kloc.as_riff_bytes, lambda: kloc.pack_into(bytearray(64), 0)):
+        with pytest.raises(ValueError, match=rf"KLocClass\.{name} is .*, must be an int in {allowed}$"):
+            pack()
+
+
+def test_signed_zone_field():
+    with pytest.raises(ValueError, match=r"ZoneClass\.pan_balance .* -128\.\.127"):
+        ZoneClass(pan_balance=200).as_riff_bytes()
@@ -0,0 +1,26 @@
+"""the AKP validator accepts the RIFF length the sampler writes"""
+import os
+
+from akptoxpm.validate import validate_akp
+
+M_BASS = os.path.join(os.path.dirname(__file__), os.pardir, "examples", "M.BASS.akp")
+
+
+def akp_with_riff_length(length: int) -> bytes:
+    data = bytearray(open(M_BASS, "rb").read())
+    data[4:8] = length.to_bytes(4, "little")
+    return bytes(data)
+
+
+def test_real_length():
+    data = open(M_BASS, "rb").read()
+    assert validate_akp(akp_with_riff_length(len(data) - 8)) == []
+
+
+def test_zero_length_as_written_by_the_sampler():
+    assert validate_akp(akp_with_riff_length(0)) == []
+
+
+def test_wrong_length():
+    issues = validate_akp(akp_with_riff_length(12))
+    assert [i["offset"] for i in issues] == [4]
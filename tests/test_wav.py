@@ -0,0 +1,59 @@
+"""WAV export of .s samples, straight copies and converted bodies"""
+import struct
+import wave
+
+import pytest
+
+from akairaw import AkaiRAWSampleFile
+from akairaw.wav import export_wav
+
+
+def sample_file(tmp_path, body: bytes, frames: int) -> str:
+    header = bytearray(0xc0)
+    header[0x00] = 3
+    struct.pack_into("<I", header, 0x1a, frames)
+    struct.pack_into("<H", header, 0x8a, 22050)
+    path = tmp_path / "SAMPLE.s"
+    # the header sizes the body in 16 bit frames
+    path.write_bytes(bytes(header) + body.ljust(2 * frames, b"\0"))
+    return str(path)
+
+
+def wav_frames(path) -> list[int]:
+    with wave.open(str(path), "rb") as w:
+        assert (w.getnchannels(), w.getsampwidth(), w.getframerate()) == (1, 2, 22050)
+        data = w.readframes(w.getnframes())
+    return list(struct.unpack(f"<{len(data) // 2}h", data))
+
+
+def test_16_bit_body_is_copied(tmp_path):
+    frames = [0, 1, -1, 32767, -32768]
+    path = sample_file(tmp_path, struct.pack("<5h", *frames), 5)
+    with AkaiRAWSampleFile(path) as sample:
+        export_wav(sample, tmp_path / "out.wav")
+    assert wav_frames(tmp_path / "out.wav") == frames
+
+
+@pytest.mark.parametrize("dtype, body", [
+    ("u1", bytes([128, 0, 255, 192])),
+    ("i1", struct.pack("<4b", 0, -128, 127, 64)),
+])
+def test_8_bit_body_is_centred_and_scaled(tmp_path, dtype, body):
+    path = sample_file(tmp_path, body, 4)
+    with AkaiRAWSampleFile(path) as sample:
+        export_wav(sample, tmp_path / "out.wav", pcm_dtype=dtype)
+    assert wav_frames(tmp_path / "out.wav") == [0, -32768, 32512, 16384]
+
+
+def test_unsigned_16_bit_body(tmp_path):
+    path = sample_file(tmp_path, struct.pack("<3H", 32768, 0, 65535), 3)
+    with AkaiRAWSampleFile(path) as sample:
+        export_wav(sample, tmp_path / "out.wav", pcm_dtype="<u2")
+    assert wav_frames(tmp_path / "out.wav") == [0, -32768, 32767]
+
+
+def test_wider_body_is_rejected(tmp_path):
+    path = sample_file(tmp_path, b"", 4)
+    with AkaiRAWSampleFile(path) as sample, pytest.raises(ValueError, match="at most 16 bits"):
+        export_wav(sample, tmp_path / "out.wav", pcm_dtype="<i4")
+    assert not (tmp_path / "out.wav").exists()
@@ -0,0 +1,38 @@
+"""floats an XPM holds in another format than the MPC's six decimals are written back as read"""
+import os
+
+from akaixpm import AkaiXPMFile
+
+EMPTY_KEYGROUP = os.path.join(os.path.dirname(__file__), os.pardir, "examples", "EmptyKeygroupProgram.xpm")
+
+
+def load(tmp_path, replace: dict) -> tuple[str, AkaiXPMFile]:
+    with open(EMPTY_KEYGROUP, encoding="utf-8") as fh:
+        text = fh.read()
+    for old, new in replace.items():
+        assert old in text
+        text = text.replace(old, new, 1)
+    path = tmp_path / "program.xpm"
+    path.write_text(text, encoding="utf-8")
+    return text, AkaiXPMFile(str(path))
+
+
+def test_mpc_format_round_trips(tmp_path):
+    text, xpm = load(tmp_path, {})
+    assert xpm.to_xml() == text
+
+
+def test_other_format_is_kept(tmp_path):
+    text, xpm = load(tmp_path, {"<Volume>0.707946</Volume>": "<Volume>0.7</Volume>", "<Pan>0.500000</Pan>": "<Pan>.5</Pan>"})
+    assert xpm.program.volume == 0.7
+    assert xpm.program.pan == 0.5
+    assert xpm.to_xml() == text
+
+
+def test_edited_value_is_written_the_mpc_way(tmp_path):
+    text, xpm = load(tmp_path, {"<Volume>0.707946</Volume>": "<Volume>0.7</Volume>"})
+    xpm.program.volume += 0.1
+    xpm.program.pan = 0.25
+    out = xpm.to_xml()
+    assert "<Volume>0.800000</Volume>" in out
+    assert "<Pan>0.250000</Pan>" in out
@@ -0,0 +1,59 @@
+"""the AKP zone chunk decodes at the offsets of the documented layout"""
+import os
+
+from akaiakp import AkaiAKPFile
+from akaiakp.data_maps import ZoneClass
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), os.pardir, "examples")
+
+# attribute offsets of the 48-byte zone chunk
+ZONE_OFFSETS = {
+    "sample_char_len": 1,
+    "low_velocity": 34,
+    "high_velocity": 35,
+    "fine_tune": 36,
+    "semitone_tune": 37,
+    "filter": 38,
+    "pan_balance": 39,
+    "playback": 40,
+    "output": 41,
+    "zone_level": 42,
+    "keyboard_track": 43,
+    "velocity_start_lsb": 44,
+    "velocity_start_msb": 45,
+}
+
+
+def zone_bytes(**values) -> bytes:
+    data = bytearray(ZoneClass.LENGTH)
+    data[2:22] = b"PIANO C3".ljust(20, b"\0")
+    for name, value in values.items():
+        data[ZONE_OFFSETS[name]] = value & 0xFF
+    return bytes(data)
+
+
+def test_zone_fields_sit_at_their_documented_offsets():
+    values = {name: 10 + idx for idx, name in enumerate(ZONE_OFFSETS)}
+    zone = ZoneClass.from_bytes(zone_bytes(**values))
+    for name, value in values.items():
+        assert getattr(zone, name) == value, name
+    assert zone.sample_name.rstrip(b"\0") == b"PIANO C3"
+
+
+def test_signed_zone_fields():
+    zone = ZoneClass.from_bytes(zone_bytes(semitone_tune=-12, fine_tune=-50, pan_balance=-50))
+    assert (zone.semitone_tune, zone.fine_tune, zone.pan_balance) == (-12, -50, -50)
+
+
+def test_zone_round_trips_unchanged():
+    data = zone_bytes(low_velocity=1, high_velocity=100, playback=2, keyboard_track=1)
+    assert ZoneClass.from_bytes(data).attrs_as_bytes() == data
+
+
+def test_example_zone_velocity_ranges():
+    akp = AkaiAKPFile(os.path.join(EXAMPLES, "M.BASS.akp"))
+    akp.list_sections()
+    zone = akp.keygroups[0].zones[0]
+    assert zone.sample_name.rstrip(b"\0") == b"M.BASS 1 F1"
+    assert (zone.low_velocity, zone.high_velocity) == (0, 127)
+    assert zone.keyboard_track == 1